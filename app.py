@@ -3,6 +3,9 @@ import logging
 from flask import Flask
 from werkzeug.middleware.proxy_fix import ProxyFix
 
+from utils.serialization import NumpyJSONProvider
+from utils.image_utils import resolve_encode_options
+
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -12,10 +15,40 @@ app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "cv-app-secret-key-2025")
 app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
+# Serialize numpy arrays, enums, keypoints and feature results in every JSON response
+app.json = NumpyJSONProvider(app)
+
 # Configure upload settings
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 app.config['UPLOAD_FOLDER'] = os.path.join(os.getcwd(), 'static', 'uploads')
 
+# Configure the per-worker session store
+app.config['SESSION_MAX_BYTES'] = int(os.environ.get('CV_SESSION_MAX_BYTES', 1024 * 1024 * 1024))  # 1GB
+app.config['SESSION_TTL_SECONDS'] = int(os.environ.get('CV_SESSION_TTL_SECONDS', 60 * 60))
+# 'memory' keeps sessions per worker, 'shared' lets any gunicorn worker serve any image_id
+app.config['SESSION_BACKEND'] = os.environ.get('CV_SESSION_BACKEND', 'memory')
+app.config['SESSION_SHARED_DIR'] = os.environ.get('CV_SESSION_SHARED_DIR')  # defaults to /dev/shm/cv_sessions
+
+# Default encoding for result images; requests may override it (see utils/responses.py)
+app.config['IMAGE_OUTPUT'] = {
+    'format': os.environ.get('CV_OUTPUT_FORMAT', 'png'),
+    'preset': os.environ.get('CV_OUTPUT_PRESET'),  # lossless-fast, lossless-small, preview or photo
+    'quality': os.environ.get('CV_OUTPUT_QUALITY'),  # JPEG/WebP quality 1-100
+    'compression': os.environ.get('CV_OUTPUT_COMPRESSION')  # PNG compression 0-9
+}
+# Fail at startup rather than on every request that returns an image
+try:
+    resolve_encode_options(defaults=app.config['IMAGE_OUTPUT'])
+except ValueError as e:
+    raise ValueError(f"Invalid CV_OUTPUT_* setting: {str(e)}") from e
+
+# Results and encoded bytes of identical operation chains, per worker
+app.config['RESULT_CACHE_MAX_BYTES'] = int(os.environ.get('CV_RESULT_CACHE_MAX_BYTES', 256 * 1024 * 1024))  # 256MB
+
+# Size of the downscaled proxy that preview requests are applied to
+app.config['PREVIEW_MAX_WIDTH'] = int(os.environ.get('CV_PREVIEW_MAX_WIDTH', 1024))
+app.config['PREVIEW_MAX_HEIGHT'] = int(os.environ.get('CV_PREVIEW_MAX_HEIGHT', 768))
+
 # Ensure upload directory exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
@@ -0,0 +1,91 @@
+"""Speed and error of the approximate Gaussian and bilateral modes against the exact filters.
+
+Run from the repository root:
+
+    python benchmarks/approximate_filters.py [--sizes 640x480 1920x1080 4000x3000] [--repeat 3]
+
+The test images are synthetic (smooth gradients, hard-edged discs and
+sensor-like noise) so the numbers are reproducible without sample data.
+Error is reported as PSNR and maximum absolute difference in 8-bit levels.
+"""
+import os
+import sys
+import time
+import argparse
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cv_modules.image_filters import AdvancedImageProcessor  # noqa: E402
+
+CASES = [
+    ('gaussian_blur', {'ksize': 31}),
+    ('gaussian_blur', {'ksize': 61, 'sigma': 10}),
+    ('gaussian_blur', {'ksize': 193, 'sigma': 32}),
+    ('bilateral_filter', {'d': 15, 'sigma_color': 75, 'sigma_space': 75}),
+    ('bilateral_filter', {'d': 25, 'sigma_color': 75, 'sigma_space': 75}),
+    ('bilateral_filter', {'d': 31, 'sigma_color': 75, 'sigma_space': 100}),
+]
+
+
+def synthetic_image(width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    image = np.dstack([
+        128 + 100 * np.sin(x / width * 6 + channel) * np.cos(y / height * 4 - channel)
+        for channel in range(3)
+    ])
+    for _ in range(40):
+        color = tuple(int(value) for value in rng.integers(0, 255, 3))
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        cv2.circle(image, center, int(rng.integers(height // 40, height // 6)), color, -1)
+    image += rng.normal(0, 8, image.shape)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def psnr(reference, approximation):
+    mse = np.mean((reference.astype(np.float64) - approximation) ** 2)
+    return float('inf') if mse == 0 else 10 * np.log10(255 ** 2 / mse)
+
+
+def timed(image, filter_type, parameters, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        processor = AdvancedImageProcessor(image)
+        processor.set_tiling(False)
+        start = time.perf_counter()
+        result = processor.apply_filter(filter_type, **parameters)
+        best = min(best, time.perf_counter() - start)
+    metadata = getattr(processor.get_history()[-1], 'metadata', {})
+    return result, best, metadata
+
+
+def parse_size(value):
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', type=parse_size,
+                        default=[(640, 480), (1920, 1080), (4000, 3000)])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'size':>10} {'filter':>16} {'parameters':>44} {'exact ms':>9} {'approx ms':>9} "
+          f"{'speedup':>7} {'factor':>6} {'PSNR dB':>7} {'max err':>7}")
+    for width, height in args.sizes:
+        image = synthetic_image(width, height)
+        for filter_type, parameters in CASES:
+            exact, exact_time, _ = timed(image, filter_type, parameters, args.repeat)
+            approx, approx_time, metadata = timed(image, filter_type, dict(parameters, approximate=True), args.repeat)
+            error = np.abs(exact.astype(np.int16) - approx).max()
+            print(f"{width}x{height:<5} {filter_type:>16} {str(parameters):>44} {exact_time * 1000:9.1f} "
+                  f"{approx_time * 1000:9.1f} {exact_time / approx_time:6.1f}x {metadata.get('factor', 1):>6} "
+                  f"{psnr(exact, approx):7.1f} {error:7d}")
+
+
+if __name__ == '__main__':
+    main()
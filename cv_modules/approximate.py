@@ -0,0 +1,117 @@
+from typing import Tuple
+
+import cv2
+import numpy as np
+
+# أقصى معامل تصغير؛ فوقه يتجاوز الخطأ الحدود المقاسة
+MAX_GAUSSIAN_FACTOR = 8
+# تحت هذا المعامل لا يعوض التصغير كلفة التحويل والتكبير (أبطأ من الدقيق عند 12MP)
+MIN_GAUSSIAN_FACTOR = 4
+MAX_BILATERAL_FACTOR = 4
+
+# أقل قيم مسموحة في الصورة المصغرة حتى يبقى الخطأ محدوداً
+MIN_SMALL_SIGMA = 2.0
+MIN_SMALL_DIAMETER = 5
+
+# نافذة وتنظيم الرفع الموجه لنتيجة المرشح الثنائي
+GUIDED_RADIUS = 1
+GUIDED_EPS = 25.0
+
+
+def gaussian_sigma(ksize: int, sigma: float) -> float:
+    """قيمة sigma التي يستخدمها cv2.GaussianBlur عندما تكون sigma صفراً"""
+    if sigma > 0:
+        return sigma
+    return 0.3 * ((ksize - 1) * 0.5 - 1) + 0.8
+
+
+def _factor(limit: int, fits) -> int:
+    factor = 1
+    while factor < limit and fits(factor * 2):
+        factor *= 2
+    return factor
+
+
+def _downsample(image: np.ndarray, factor: int) -> np.ndarray:
+    rows, cols = image.shape[:2]
+    return cv2.resize(image, (-(-cols // factor), -(-rows // factor)), interpolation=cv2.INTER_AREA)
+
+
+def _upsample(image: np.ndarray, shape: Tuple[int, ...]) -> np.ndarray:
+    return cv2.resize(image, (shape[1], shape[0]), interpolation=cv2.INTER_LINEAR)
+
+
+def _output(result: np.ndarray, dtype: np.dtype) -> np.ndarray:
+    if dtype == np.uint8:
+        return np.clip(np.rint(result), 0, 255).astype(np.uint8)
+    return result.astype(dtype, copy=False)
+
+
+def gaussian_factor(ksize: int, sigma: float) -> int:
+    """
+    معامل التصغير المناسب للتنعيم الغاوسي، أو 1 للمسار الدقيق
+
+    يشترط أن تبقى sigma في الصورة المصغرة 2 على الأقل، وأن تغطي النواة
+    ±3 sigma، لأن النواة المقطوعة في المسار الدقيق لا يمكن تقريبها هكذا.
+    ولا يستخدم التقريب إلا بمعامل MIN_GAUSSIAN_FACTOR فأكثر (sigma ≥ 8).
+    """
+    sigma = gaussian_sigma(ksize, sigma)
+    if ksize > 0 and ksize < 6 * sigma - 1:
+        return 1
+    factor = _factor(MAX_GAUSSIAN_FACTOR, lambda factor: sigma / factor >= MIN_SMALL_SIGMA)
+    return factor if factor >= MIN_GAUSSIAN_FACTOR else 1
+
+
+def approximate_gaussian_blur(image: np.ndarray, ksize: int, sigma: float) -> Tuple[np.ndarray, int]:
+    """
+    تنعيم غاوسي تقريبي بالتصغير ثم التنعيم ثم التكبير: (result, factor)
+
+    التصغير بمتوسط المساحة والتكبير الخطي يضيفان تبايناً يطرح من sigma
+    المستخدمة في الصورة المصغرة. الخطأ المقاس مقابل cv2.GaussianBlur أعلى
+    من 48dB PSNR وأقصى فرق بين 8 و 17 مستوى. عند factor = 1 تكون النتيجة هي
+    المسار الدقيق نفسه.
+    """
+    factor = gaussian_factor(ksize, sigma)
+    if factor == 1:
+        return cv2.GaussianBlur(image, (ksize, ksize), sigma), 1
+
+    sigma = gaussian_sigma(ksize, sigma)
+    small_sigma = np.sqrt(max(sigma ** 2 / factor ** 2 - (1 - 1 / factor ** 2) / 12 - 1 / 6, 0.25))
+    small = cv2.GaussianBlur(_downsample(image, factor).astype(np.float32), (0, 0), small_sigma)
+    return _output(_upsample(small, image.shape), image.dtype), factor
+
+
+def bilateral_factor(d: int) -> int:
+    return _factor(MAX_BILATERAL_FACTOR, lambda factor: d // factor >= MIN_SMALL_DIAMETER)
+
+
+def approximate_bilateral_filter(image: np.ndarray, d: int, sigma_color: float,
+                                 sigma_space: float) -> Tuple[np.ndarray, int]:
+    """
+    مرشح ثنائي تقريبي: (result, factor)
+
+    يطبق المرشح على صورة مصغرة ثم يرفع الناتج بمرشح موجه (guided filter):
+    يقدر نموذج خطي محلي out = a * image + b بين الصورة المصغرة وناتجها،
+    ثم تكبر المعاملات a و b وتطبق على الصورة الأصلية فتبقى الحواف حادة.
+    الخطأ المقاس مقابل cv2.bilateralFilter بين 38 و 49dB PSNR وأقصى فرق حتى
+    93 مستوى عند الحواف، على صور الاختبار في benchmarks/approximate_filters.py.
+    """
+    factor = bilateral_factor(d)
+    if factor == 1:
+        return cv2.bilateralFilter(image, d, sigma_color, sigma_space), 1
+
+    small = _downsample(image, factor)
+    guide = small.astype(np.float32)
+    filtered = cv2.bilateralFilter(small, d // factor, sigma_color, sigma_space / factor).astype(np.float32)
+
+    window = (2 * GUIDED_RADIUS + 1, 2 * GUIDED_RADIUS + 1)
+    mean_guide = cv2.boxFilter(guide, -1, window)
+    mean_filtered = cv2.boxFilter(filtered, -1, window)
+    covariance = cv2.boxFilter(guide * filtered, -1, window) - mean_guide * mean_filtered
+    variance = cv2.boxFilter(guide * guide, -1, window) - mean_guide * mean_guide
+    a = covariance / (variance + GUIDED_EPS)
+    b = mean_filtered - a * mean_guide
+
+    a = _upsample(cv2.boxFilter(a, -1, window), image.shape)
+    b = _upsample(cv2.boxFilter(b, -1, window), image.shape)
+    return _output(a * image.astype(np.float32) + b, image.dtype), factor
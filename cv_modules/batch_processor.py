@@ -1,16 +1,20 @@
 import cv2
 import numpy as np
-from typing import List, Dict, Any, Union, Optional, Tuple
+from typing import List, Dict, Any, Union, Optional, Tuple, Iterable
 from enum import Enum
 import logging
 from dataclasses import dataclass
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
+import itertools
 
 from .feature_extraction import AdvancedFeatureExtractor, FeatureType, FeatureResult
 from .image_filters import AdvancedImageProcessor, FilterType
 from .geometric_transforms import GeometricTransformation, GeometricTransformationType
 from .feature_matching import FeatureMatching, MatchingMethod
+from .shared_buffer import as_readonly
+from .chain_memo import ChainMemo
+from .transform_sequence import TransformSequence, SequenceResult
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -53,16 +57,18 @@ class BatchProcessor:
         max_workers : int
             عدد الخيوط للمعالجة المتوازية
         """
-        self.original_image = image.copy()
-        self.current_image = image.copy()
+        self.original_image = as_readonly(image)
+        self.current_image = self.original_image
         self.max_workers = max_workers
         self.processing_history = []
         self.batch_results = {}
+        # نتائج كل خطوة من السلاسل، لإعادة تنفيذ ما بعد الخطوة المعدلة فقط
+        self.chain_memo = ChainMemo()
         
-        # إنشاء معالجات للأنواع المختلفة
-        self.feature_extractor = AdvancedFeatureExtractor(image)
-        self.image_processor = AdvancedImageProcessor(image)
-        self.geometric_transformer = GeometricTransformation(image)
+        # إنشاء معالجات للأنواع المختلفة (تشارك نفس المخزن دون نسخ)
+        self.feature_extractor = AdvancedFeatureExtractor(self.original_image)
+        self.image_processor = AdvancedImageProcessor(self.original_image)
+        self.geometric_transformer = GeometricTransformation(self.original_image)
         
     def process_multiple_features(self, feature_tasks: List[Dict[str, Any]]) -> Dict[str, FeatureResult]:
         """
@@ -205,7 +211,49 @@ class BatchProcessor:
         
         return results
     
-    def process_filter_chain(self, filter_chain: List[Dict[str, Any]], apply_to_current: bool = True) -> np.ndarray:
+    @staticmethod
+    def process_transformation_sequence(images: Iterable[np.ndarray], transform_chain: List[Dict[str, Any]],
+                                        backend: str = 'thread', max_workers: Optional[int] = None,
+                                        max_in_flight: Optional[int] = None) -> SequenceResult:
+        """
+        تطبيق نفس سلسلة التحويلات على سلسلة صور بنفس الأبعاد
+        
+        عكس process_multiple_transformations: وصفة واحدة لآلاف الصور. تتحقق
+        الوصفة وتجهز (المصفوفة المركبة وجداول remap) مرة واحدة بأبعاد أول
+        صورة، ثم تمر الصور عبر مجمع العمال بذاكرة محدودة.
+        
+        Parameters:
+        -----------
+        images : Iterable[np.ndarray]
+            الصور، وتقرأ تدريجياً فيمكن تمرير مولد
+        transform_chain : List[Dict[str, Any]]
+            سلسلة التحويلات المطلوب تطبيقها
+        backend : str
+            'serial' أو 'thread' أو 'process'
+        max_workers : int
+            عدد العمال (افتراضياً عدد المعالجات المتاحة)
+        max_in_flight : int
+            أقصى عدد من الصور قيد المعالجة في نفس الوقت
+            
+        Returns:
+        --------
+        SequenceResult
+            نتيجة لكل صورة بترتيب الإدخال وأرقام الإنتاجية (صور/ثانية، ميغابكسل/ثانية)
+        """
+        images = iter(images)
+        first = next(images, None)
+        if first is None:
+            raise ValueError("سلسلة الصور فارغة")
+        if not isinstance(first, np.ndarray):
+            raise TypeError(f"نوع الصورة يجب أن يكون numpy.ndarray، لكن تم إدخال: {type(first)}")
+        
+        sequence = TransformSequence(transform_chain, first.shape, first.dtype)
+        logger.info(f"تم تجهيز وصفة التحويلات ({', '.join(stage.name for stage in sequence.stages)}) "
+                    f"في {sequence.compile_time * 1000:.1f} ms")
+        return sequence.run(itertools.chain([first], images), backend, max_workers, max_in_flight)
+    
+    def process_filter_chain(self, filter_chain: List[Dict[str, Any]], apply_to_current: bool = True,
+                             precision: str = 'uint8') -> np.ndarray:
         """
         تطبيق سلسلة من المرشحات بالتتابع
         
@@ -215,21 +263,29 @@ class BatchProcessor:
             سلسلة المرشحات المطلوب تطبيقها
         apply_to_current : bool
             هل نطبق على الصورة الحالية أم نحافظ على الأصلية
+        precision : str
+            'uint8' أو 'float32' لإبقاء النتائج الوسيطة بدقة float32 والتقريب
+            إلى uint8 مرة واحدة في النهاية
             
         Returns:
         --------
         np.ndarray
             الصورة بعد تطبيق سلسلة المرشحات
         """
-        if apply_to_current:
-            processor = AdvancedImageProcessor(self.current_image)
-        else:
-            processor = AdvancedImageProcessor(self.original_image)
-        
-        for filter_config in filter_chain:
-            filter_type = filter_config.get('filter_type')
-            parameters = filter_config.get('parameters', {})
-            processor.apply_filter(filter_type, **parameters)
+        source_image = self.current_image if apply_to_current else self.original_image
+        keys = self.chain_memo.prefix_keys(source_image, f'filter:{precision}', [
+            (step.get('filter_type'), step.get('parameters', {})) for step in filter_chain
+        ])
+        # تستأنف السلسلة من آخر خطوة محفوظة نتيجتها لنفس البادئة
+        start, memo_image = self.chain_memo.longest_prefix(keys)
+        processor = AdvancedImageProcessor(memo_image if memo_image is not None else source_image)
+        
+        # المرشحات النقطية المتتالية تدمج في تمريرة LUT واحدة
+        processor.apply_filter_chain(
+            filter_chain[start:],
+            on_step=lambda index, image: self.chain_memo.put(keys[start + index], image),
+            precision=precision
+        )
         
         result_image = processor.get_current_image()
         
@@ -238,7 +294,8 @@ class BatchProcessor:
         
         return result_image
     
-    def process_transformation_chain(self, transform_chain: List[Dict[str, Any]], apply_to_current: bool = True) -> np.ndarray:
+    def process_transformation_chain(self, transform_chain: List[Dict[str, Any]], apply_to_current: bool = True,
+                                     precision: str = 'uint8', deferred: bool = False) -> np.ndarray:
         """
         تطبيق سلسلة من التحويلات الهندسية بالتتابع
         
@@ -248,28 +305,33 @@ class BatchProcessor:
             سلسلة التحويلات المطلوب تطبيقها
         apply_to_current : bool
             هل نطبق على الصورة الحالية أم نحافظ على الأصلية
+        precision : str
+            'uint8' أو 'float32' لإبقاء النتائج الوسيطة بدقة float32 والتقريب
+            إلى uint8 مرة واحدة في النهاية
+        deferred : bool
+            دمج التحويلات الهندسية المتتالية وتنفيذها بعملية warp واحدة
             
         Returns:
         --------
         np.ndarray
             الصورة بعد تطبيق سلسلة التحويلات
         """
-        if apply_to_current:
-            transformer = GeometricTransformation(self.current_image)
-        else:
-            transformer = GeometricTransformation(self.original_image)
-        
-        for transform_config in transform_chain:
-            transformation_type = transform_config.get('transformation_type')
-            parameters = transform_config.get('parameters', {})
-            
-            if transformation_type == 'color_adjustment':
-                transformer.adjust_color_channel(**parameters)
-            else:
-                transformer.apply_transformation(
-                    GeometricTransformationType(transformation_type), 
-                    **parameters
-                )
+        source_image = self.current_image if apply_to_current else self.original_image
+        # نتائج الوضع المؤجل تختلف قليلاً عن التنفيذ المتتالي، فلها مفاتيح مستقلة
+        kind = f'transform:{precision}:deferred' if deferred else f'transform:{precision}'
+        keys = self.chain_memo.prefix_keys(source_image, kind, [
+            (step.get('transformation_type'), step.get('parameters', {})) for step in transform_chain
+        ])
+        start, memo_image = self.chain_memo.longest_prefix(keys)
+        transformer = GeometricTransformation(memo_image if memo_image is not None else source_image)
+        
+        # عمليات ضبط الألوان المتتالية تدمج في تمريرة LUT واحدة
+        transformer.apply_transformation_chain(
+            transform_chain[start:],
+            on_step=lambda index, image: self.chain_memo.put(keys[start + index], image),
+            precision=precision,
+            deferred=deferred
+        )
         
         result_image = transformer.get_current_image()
         
@@ -386,8 +448,9 @@ class BatchProcessor:
     
     def reset_to_original(self) -> None:
         """إعادة تعيين الصورة إلى الحالة الأصلية"""
-        self.current_image = self.original_image.copy()
+        self.current_image = self.original_image
         self.processing_history.clear()
+        self.chain_memo.clear()
         
         # إعادة تعيين المعالجات
         self.feature_extractor = AdvancedFeatureExtractor(self.original_image)
@@ -395,12 +458,12 @@ class BatchProcessor:
         self.geometric_transformer = GeometricTransformation(self.original_image)
     
     def get_current_image(self) -> np.ndarray:
-        """الحصول على الصورة الحالية"""
-        return self.current_image.copy()
+        """الحصول على الصورة الحالية (للقراءة فقط)"""
+        return self.current_image
     
     def update_current_image(self, new_image: np.ndarray) -> None:
         """تحديث الصورة الحالية"""
-        self.current_image = new_image.copy()
+        self.current_image = as_readonly(new_image)
         
         # تحديث المعالجات
         self.feature_extractor = AdvancedFeatureExtractor(self.current_image)
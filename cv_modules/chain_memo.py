@@ -0,0 +1,120 @@
+import json
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+from enum import Enum
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024  # لكل معالج
+DEFAULT_MAX_ROOTS = 2
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.name
+    if isinstance(value, np.ndarray):
+        return [value.dtype.str, value.tolist()]
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def step_key(parent_key: str, index: int, operation: Any, parameters: Dict[str, Any]) -> str:
+    """مفتاح الحالة بعد الخطوة index، مشتق من مفتاح الحالة التي قبلها"""
+    payload = json.dumps([index, operation, parameters], sort_keys=True, default=_normalize)
+    return hashlib.blake2b(f'{parent_key}|{payload}'.encode('utf-8'), digest_size=20).hexdigest()
+
+
+class ChainMemo:
+    """
+    ذاكرة لنتيجة كل خطوة من سلاسل المرشحات والتحويلات
+
+    مفتاح كل نتيجة هو بادئة السلسلة حتى تلك الخطوة (رقم الخطوة ونوع العملية
+    ومعاملاتها لكل ما قبلها) بدءاً من صورة الإدخال، فعند تغيير معامل في
+    الخطوة k تستعاد نتيجة الخطوة k-1 ويعاد تنفيذ الخطوات من k فقط.
+
+    تعرف صورة الإدخال بهويتها (نفس المصفوفة)، ويحتفظ بآخر max_roots صور
+    إدخال فقط. تحذف النتائج الأقل استخداماً عند تجاوز max_bytes.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, max_roots: int = DEFAULT_MAX_ROOTS):
+        self.max_bytes = max_bytes
+        self.max_roots = max_roots
+        self._roots: List[Tuple[np.ndarray, str]] = []
+        self._entries: 'OrderedDict[str, np.ndarray]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._current_bytes = 0
+        self._hits = 0
+        self._misses = 0
+
+    def prefix_keys(self, root: np.ndarray, kind: str, chain: List[Tuple[Any, Dict[str, Any]]]) -> List[str]:
+        """مفاتيح الحالات بعد كل خطوة من chain، حيث عناصرها (operation, parameters)"""
+        token = self._root_token(root)
+        parent_key = kind
+        keys = []
+        for index, (operation, parameters) in enumerate(chain):
+            parent_key = step_key(parent_key, index, operation, parameters)
+            keys.append(f'{token}:{parent_key}')
+        return keys
+
+    def longest_prefix(self, keys: List[str]) -> Tuple[int, Optional[np.ndarray]]:
+        """عدد الخطوات المحفوظة من البداية ونتيجة آخرها، أو (0, None)"""
+        with self._lock:
+            for count in range(len(keys), 0, -1):
+                image = self._entries.get(keys[count - 1])
+                if image is not None:
+                    self._entries.move_to_end(keys[count - 1])
+                    self._hits += 1
+                    return count, image
+            self._misses += 1
+            return 0, None
+
+    def put(self, key: str, image: np.ndarray) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = image
+            self._current_bytes += image.nbytes
+            self._enforce_budget()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._roots.clear()
+            self._entries.clear()
+            self._current_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'current_bytes': self._current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses
+            }
+
+    def _root_token(self, root: np.ndarray) -> str:
+        with self._lock:
+            for position, (image, token) in enumerate(self._roots):
+                if image is root:
+                    self._roots.append(self._roots.pop(position))
+                    return token
+            token = uuid.uuid4().hex
+            self._roots.append((root, token))
+            while len(self._roots) > self.max_roots:
+                _, dropped = self._roots.pop(0)
+                self._drop_root(dropped)
+            return token
+
+    def _drop_root(self, token: str) -> None:
+        for key in [key for key in self._entries if key.startswith(f'{token}:')]:
+            self._current_bytes -= self._entries.pop(key).nbytes
+
+    def _enforce_budget(self) -> None:
+        while self._entries and self._current_bytes > self.max_bytes:
+            _, image = self._entries.popitem(last=False)
+            self._current_bytes -= image.nbytes
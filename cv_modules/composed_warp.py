@@ -0,0 +1,182 @@
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .remap_cache import PERSPECTIVE_MIN_USES, remap_perspective
+
+# الاستيفاءات التي تدعمها warpAffine و warpPerspective؛ غيرها (مثل INTER_AREA) ينفذ مباشرة
+WARP_INTERPOLATIONS = {cv2.INTER_NEAREST, cv2.INTER_LINEAR, cv2.INTER_CUBIC, cv2.INTER_LANCZOS4}
+
+
+def as_homography(matrix: np.ndarray) -> np.ndarray:
+    """مصفوفة 2x3 أو 3x3 كمصفوفة تجانسية 3x3 بدقة float64"""
+    matrix = np.asarray(matrix, dtype=np.float64)
+    if matrix.shape == (2, 3):
+        matrix = np.vstack([matrix, [0, 0, 1]])
+    return matrix
+
+
+def resize_matrix(cols: int, rows: int, new_cols: int, new_rows: int) -> np.ndarray:
+    # نفس محاذاة مراكز البكسلات في cv2.resize: x_src = (x + 0.5) / sx - 0.5
+    sx, sy = new_cols / cols, new_rows / rows
+    return np.array([[sx, 0, 0.5 * sx - 0.5], [0, sy, 0.5 * sy - 0.5], [0, 0, 1]])
+
+
+def flip_matrix(cols: int, rows: int, flip_code: int) -> np.ndarray:
+    sx = -1 if flip_code in (1, -1) else 1
+    sy = -1 if flip_code in (0, -1) else 1
+    return np.array([[sx, 0, cols - 1 if sx < 0 else 0], [0, sy, rows - 1 if sy < 0 else 0], [0, 0, 1]], np.float64)
+
+
+def crop_matrix(x: int, y: int) -> np.ndarray:
+    return np.array([[1, 0, -x], [0, 1, -y], [0, 0, 1]], np.float64)
+
+
+def warp_image(source: np.ndarray, matrix: np.ndarray, size: Tuple[int, int], interpolation: Optional[int] = None,
+               border_value: Optional[Tuple] = None, mask: Optional[np.ndarray] = None,
+               min_uses: int = PERSPECTIVE_MIN_USES) -> np.ndarray:
+    """
+    تنفيذ تحويل مركب على source بعملية warp واحدة
+
+    mask هي البكسلات الواقعة داخل كل اللوحات الوسيطة (ComposedWarp._canvas_mask)،
+    وما خارجها يملأ بقيمة الحدود. تعتمد على الأبعاد فقط، فتحسب مرة واحدة
+    لكل الصور التي تمر بنفس التحويل.
+    """
+    cols, rows = size
+    flags = cv2.INTER_LINEAR if interpolation is None else interpolation
+    if border_value is None:
+        # القلب والقص والتحجيم فقط: تكرار الحافة يطابق cv2.resize عند الأطراف
+        border_mode, border_value = cv2.BORDER_REPLICATE, 0
+    else:
+        border_mode = cv2.BORDER_CONSTANT
+
+    if np.allclose(matrix[2], [0, 0, 1]):
+        result = cv2.warpAffine(source, matrix[:2], (cols, rows), flags=flags,
+                                borderMode=border_mode, borderValue=border_value)
+    else:
+        result = remap_perspective(source, matrix, (cols, rows), flags, border_mode, border_value, min_uses)
+
+    if mask is not None:
+        channels = result.shape[2] if result.ndim == 3 else 1
+        fill = np.float64(border_value).ravel()
+        result[mask == 0] = fill[:channels] if result.ndim == 3 else fill[0]
+    return result
+
+
+class ComposedWarp:
+    """
+    سلسلة تحويلات هندسية معلقة تنفذ بعملية warp واحدة
+
+    تجمع المصفوفات بالضرب فتنتقل الصورة المصدر مباشرة إلى الناتج النهائي
+    باستيفاء واحد بدلاً من استيفاء لكل تحويل، وهذا أسرع وأحد. تبقى حدود
+    كل لوحة وسيطة محفوظة، فما قصته لوحة وسيطة (بالقص أو بالإزاحة خارجها)
+    يملأ بقيمة الحدود كما في التنفيذ المتتالي.
+
+    لا تدمج إلا التحويلات المتوافقة: نفس الاستيفاء، ونفس قيمة الحدود
+    الثابتة (BORDER_CONSTANT). التحويلات بلا حدود (القلب، القص، التحجيم)
+    واستيفاء None (إزاحات صحيحة) متوافقة مع أي سلسلة.
+    """
+
+    def __init__(self, source: np.ndarray):
+        self.source = source
+        self.matrix = np.eye(3)
+        self.size = (source.shape[1], source.shape[0])
+        self.interpolation: Optional[int] = None
+        self.border_value: Optional[Tuple] = None
+        # (مصفوفة المصدر إلى اللوحة، حجم اللوحة) لكل لوحة وسيطة
+        self.canvases: List[Tuple[np.ndarray, Tuple[int, int]]] = []
+        self.steps = 0
+
+    def accepts(self, interpolation: Optional[int], border_mode: Optional[int],
+                border_value: Optional[Tuple]) -> bool:
+        if interpolation is not None:
+            if interpolation not in WARP_INTERPOLATIONS:
+                return False
+            if self.interpolation is not None and interpolation != self.interpolation:
+                return False
+        if border_mode is not None:
+            if border_mode != cv2.BORDER_CONSTANT:
+                return False
+            if self.border_value is not None and tuple(border_value) != self.border_value:
+                return False
+        return True
+
+    def extend(self, matrix: np.ndarray, size: Tuple[int, int], interpolation: Optional[int] = None,
+               border_mode: Optional[int] = None, border_value: Optional[Tuple] = None) -> None:
+        if self.steps:
+            self.canvases.append((self.matrix, self.size))
+        self.matrix = as_homography(matrix) @ self.matrix
+        self.size = (int(size[0]), int(size[1]))
+        if interpolation is not None:
+            self.interpolation = interpolation
+        if border_mode is not None:
+            self.border_value = tuple(border_value)
+        self.steps += 1
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return (self.size[1], self.size[0]) + self.source.shape[2:]
+
+    def render(self) -> np.ndarray:
+        return warp_image(self.source, self.matrix, self.size, self.interpolation, self.border_value,
+                          self._canvas_mask())
+
+    def _canvas_mask(self) -> Optional[np.ndarray]:
+        """
+        البكسلات التي تقع مراكزها داخل كل اللوحات الوسيطة، أو None إذا لم تقص أي لوحة شيئاً
+
+        البكسل صالح إذا وقع مركزه، بعد إرجاعه إلى إحداثيات اللوحة، داخل مساحة
+        بكسلات اللوحة (من -0.5 إلى الطول - 0.5) دون حدودها، فالبكسلات التي
+        تخرج من اللوحة بالإزاحة ثم تعود تبقى حدوداً كما في التنفيذ المتتالي.
+        """
+        cols, rows = self.size
+        corners = np.float64([[0, 0], [cols - 1, 0], [cols - 1, rows - 1], [0, rows - 1]])
+        spans = None
+        for matrix, (canvas_cols, canvas_rows) in self.canvases:
+            # من إحداثيات الناتج إلى إحداثيات اللوحة الوسيطة
+            to_canvas = matrix @ np.linalg.inv(self.matrix)
+            mapped = cv2.perspectiveTransform(corners[None], to_canvas)[0]
+            if _inside(mapped[:, 0], canvas_cols).all() and _inside(mapped[:, 1], canvas_rows).all():
+                continue
+            first, last = _row_spans(to_canvas, canvas_cols, canvas_rows, rows)
+            if spans is not None:
+                first, last = np.maximum(spans[0], first), np.minimum(spans[1], last)
+            spans = first, last
+        if spans is None:
+            return None
+        x = np.arange(cols)[None]
+        return ((x >= spans[0][:, None]) & (x <= spans[1][:, None])).astype(np.uint8) * 255
+
+
+def _inside(coordinate: np.ndarray, length: int) -> np.ndarray:
+    return (coordinate > -0.5) & (coordinate < length - 0.5)
+
+
+def _row_spans(to_canvas: np.ndarray, canvas_cols: int, canvas_rows: int,
+               rows: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    أول وآخر عمود في كل صف من الناتج يقع مركزه داخل اللوحة
+
+    بعد الضرب في المقام الموجب (w) يصبح كل شرط من شروط _inside خطياً في x
+    على الصف الواحد، فتقاطعها فترة واحدة تحسب لكل صف دون المرور على البكسلات.
+    """
+    if to_canvas[2, 2] < 0:
+        # نفس التحويل بمقام موجب في منطقة الناتج
+        to_canvas = -to_canvas
+    u, v, w = to_canvas
+    # كل شرط بالشكل p . (x, y, 1) > 0
+    constraints = [u + 0.5 * w, (canvas_cols - 0.5) * w - u, v + 0.5 * w, (canvas_rows - 0.5) * w - v, w]
+    y = np.arange(rows, dtype=np.float64)
+    low = np.full(rows, -np.inf)
+    high = np.full(rows, np.inf)
+    for p in constraints:
+        offset = p[1] * y + p[2]
+        if p[0] > 0:
+            low = np.maximum(low, -offset / p[0])
+        elif p[0] < 0:
+            high = np.minimum(high, -offset / p[0])
+        else:
+            high = np.where(offset > 0, high, -np.inf)
+    # الشروط صارمة: أول عمود أكبر من low وآخر عمود أصغر من high
+    return np.floor(low) + 1, np.ceil(high) - 1
@@ -0,0 +1,140 @@
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict
+
+import cv2
+import numpy as np
+
+from .shared_buffer import as_result
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def _owner(image: np.ndarray) -> np.ndarray:
+    while isinstance(image.base, np.ndarray):
+        image = image.base
+    return image
+
+
+def _to_gray(image: np.ndarray) -> np.ndarray:
+    if image.ndim == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return image
+
+
+def _to_hsv(image: np.ndarray) -> np.ndarray:
+    return cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+
+
+def _to_float32(image: np.ndarray) -> np.ndarray:
+    return image.astype(np.float32)
+
+
+CONVERSIONS = {
+    'gray': _to_gray,
+    'hsv': _to_hsv,
+    'float32': _to_float32
+}
+
+
+class DerivedPlanes:
+    """
+    ذاكرة مشتركة للمستويات المشتقة من الصور (رمادي، HSV، float32)
+
+    الصور التي تتداولها المعالجات للقراءة فقط، وكل عملية تنتج مصفوفة جديدة،
+    لذلك يحدد المخزن نفسه (مع الإزاحة والشكل) نسخة الصورة: ما دام المخزن
+    موجوداً لا يتغير محتواه، وعند تحريره تحذف مستوياته من الذاكرة. لا تخزن
+    المستويات إلا إذا كان المخزن نفسه للقراءة فقط (نتائج المعالجات المجمدة
+    بـ as_result والصور المجمدة بـ freeze)؛ العرض للقراءة فقط على مخزن قابل
+    للكتابة لا يكفي لأن المستخدم قد يعدل المخزن من خلال مرجعه إليه.
+
+    المستويات المعادة للقراءة فقط، وتحذف الأقل استخداماً عند تجاوز max_bytes.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[tuple, np.ndarray]' = OrderedDict()
+        self._owners: Dict[int, Any] = {}
+        # قفل قابل لإعادة الدخول: قد يستدعى إنهاء مخزن محرر أثناء الإمساك بالقفل
+        self._lock = threading.RLock()
+        self._current_bytes = 0
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, image: np.ndarray, kind: str) -> np.ndarray:
+        convert = CONVERSIONS[kind]
+        # عرض للقراءة فقط على مخزن قابل للكتابة (صورة المستخدم) قد يتغير محتواه
+        if image.flags.writeable or _owner(image).flags.writeable:
+            return as_result(convert(image))
+
+        owner = _owner(image)
+        key = (id(owner), image.__array_interface__['data'][0], image.shape, image.strides, image.dtype.str, kind)
+        with self._lock:
+            plane = self._entries.get(key)
+            if plane is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return plane
+            self._misses += 1
+
+        plane = convert(image)
+        # المستوى الرمادي لصورة رمادية هو الصورة نفسها
+        if plane is image:
+            return image
+        plane = as_result(plane)
+
+        with self._lock:
+            if key not in self._entries:
+                if id(owner) not in self._owners:
+                    self._owners[id(owner)] = weakref.finalize(owner, self._release, id(owner))
+                self._entries[key] = plane
+                self._current_bytes += plane.nbytes
+                self._enforce_budget()
+        return plane
+
+    def gray(self, image: np.ndarray) -> np.ndarray:
+        return self.get(image, 'gray')
+
+    def hsv(self, image: np.ndarray) -> np.ndarray:
+        return self.get(image, 'hsv')
+
+    def float32(self, image: np.ndarray) -> np.ndarray:
+        return self.get(image, 'float32')
+
+    def forget(self, owner: np.ndarray) -> None:
+        """حذف مستويات مخزن سيعاد استخدامه بمحتوى جديد (انظر OutputBuffers)"""
+        with self._lock:
+            finalizer = self._owners.get(id(owner))
+            if finalizer is not None:
+                finalizer.detach()
+            self._release(id(owner))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._current_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'current_bytes': self._current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses
+            }
+
+    def _release(self, owner_id: int) -> None:
+        with self._lock:
+            self._owners.pop(owner_id, None)
+            for key in [key for key in self._entries if key[0] == owner_id]:
+                self._current_bytes -= self._entries.pop(key).nbytes
+
+    def _enforce_budget(self) -> None:
+        while self._entries and self._current_bytes > self.max_bytes:
+            _, plane = self._entries.popitem(last=False)
+            self._current_bytes -= plane.nbytes
+
+
+derived_planes = DerivedPlanes()
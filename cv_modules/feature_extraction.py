@@ -5,6 +5,9 @@ from enum import Enum
 import logging
 from dataclasses import dataclass
 
+from .shared_buffer import as_readonly
+from .derived_planes import derived_planes
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -38,8 +41,8 @@ class FeatureResult:
 class AdvancedFeatureExtractor:
     def __init__(self, image: np.ndarray):
         self._validate_image(image)
-        self.original_image = image.copy()
-        self.current_image = image.copy()
+        self.original_image = as_readonly(image)
+        self.current_image = self.original_image
         self.feature_history = []
         self.extractor_configs = {}
         
@@ -65,9 +68,8 @@ class AdvancedFeatureExtractor:
                 raise InvalidParameterException(f"معلمة مطلوبة مفقودة: {param}")
 
     def _convert_to_grayscale(self, image: np.ndarray) -> np.ndarray:
-        if len(image.shape) == 3:
-            return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        return image
+        # يحسب المستوى الرمادي مرة واحدة لكل نسخة من الصورة ويشارك بين الوحدات
+        return derived_planes.gray(image)
 
     def _draw_keypoints(self, keypoints: List[cv2.KeyPoint]) -> np.ndarray:
         return cv2.drawKeypoints(self.current_image, keypoints, None, 
@@ -276,8 +278,8 @@ class AdvancedFeatureExtractor:
         return self.feature_history.copy()
     
     def reset_image(self) -> None:
-        self.current_image = self.original_image.copy()
+        self.current_image = self.original_image
         self.feature_history.clear()
     
     def get_current_image(self) -> np.ndarray:
-        return self.current_image.copy()
+        return self.current_image
@@ -3,6 +3,9 @@ import numpy as np
 from enum import Enum
 from typing import Tuple, List, Dict, Any, Optional, Union
 
+from .shared_buffer import as_readonly
+from .derived_planes import derived_planes
+
 class MatchingMethod(Enum):
     """طرق مطابقة الميزات المتاحة"""
     FLANN = "FLANN"
@@ -42,16 +45,10 @@ class FeatureMatching:
         if image1.size == 0 or image2.size == 0:
             raise ValueError("الصور المدخلة فارغة")
         
-        # تحويل إلى تدرج الرمادي إذا لزم الأمر
-        if len(image1.shape) == 3:
-            self.image1 = cv2.cvtColor(image1, cv2.COLOR_BGR2GRAY)
-        else:
-            self.image1 = image1.copy()
-            
-        if len(image2.shape) == 3:
-            self.image2 = cv2.cvtColor(image2, cv2.COLOR_BGR2GRAY)
-        else:
-            self.image2 = image2.copy()
+        # تحويل إلى تدرج الرمادي إذا لزم الأمر (مشترك ومخزن لكل نسخة من الصورة)،
+        # والصور الرمادية تشارك كعرض للقراءة فقط بدلاً من نسخها
+        self.image1 = as_readonly(derived_planes.gray(image1))
+        self.image2 = as_readonly(derived_planes.gray(image2))
             
         self.keypoints1 = None
         self.keypoints2 = None
@@ -1,7 +1,18 @@
+import time
 import cv2
 import numpy as np
 from enum import Enum
 
+from .shared_buffer import OutputBuffers, as_readonly, as_result, roi_of
+from .pointwise import color_lut, apply_lut, apply_fused, quantize
+from .history import CheckpointHistory
+from .derived_planes import derived_planes
+from .composed_warp import ComposedWarp, resize_matrix, flip_matrix, crop_matrix
+from .remap_cache import remap_perspective, remap_polar
+
+# مخازن إخراج عمليات القنوات اللونية، يعاد استخدامها حين لا يبقى مرجع إلى النتيجة السابقة
+color_buffers = OutputBuffers(on_reuse=derived_planes.forget)
+
 class GeometricTransformationType(Enum):
     TRANSLATION = "translation"
     ROTATION = "rotation"
@@ -33,23 +44,177 @@ class GeometricTransformation:
         if image.size == 0:
             raise ValueError("الصورة المدخلة فارغة")
         
-        self.original_image = image.copy()
-        self.current_image = image.copy()
+        self.original_image = as_readonly(image)
+        self.current_image = self.original_image
         self.transformation_history = []
+        self.checkpoints = CheckpointHistory(self.original_image)
+        # دقة الصورة الحالية: 'float32' داخل سلسلة بدقة عائمة فقط
+        self.precision = 'uint8'
+        # في الوضع المؤجل تدمج التحويلات الهندسية المتتالية وتنفذ بعملية warp واحدة
+        self.deferred = False
+        
+    @property
+    def current_image(self):
+        # التحويلات المعلقة تنفذ عند أول حاجة فعلية للبكسلات
+        if self._pending is not None:
+            self._materialize()
+        return self._current_image
+    
+    @current_image.setter
+    def current_image(self, image):
+        self._pending = None
+        self._current_image = image
+    
+    def set_deferred(self, enabled=True):
+        self.deferred = enabled
+    
+    def _shape(self):
+        # أبعاد الصورة الحالية دون تنفيذ التحويلات المعلقة
+        if self._pending is not None:
+            return self._pending.shape
+        return self._current_image.shape
+    
+    def _defer(self, matrix, size, interpolation=None, border_mode=None, border_value=None):
+        """
+        دمج تحويل مصفوفي مع التحويلات المعلقة بدلاً من تنفيذه
+        
+        Returns:
+        --------
+        bool
+            False إذا لم يكن الوضع المؤجل مفعلاً أو كان التحويل غير متوافق؛
+            عندها تكون التحويلات المعلقة قد نفذت وعلى المستدعي التنفيذ مباشرة
+        """
+        if not self.deferred:
+            return False
+        pending = self._pending
+        if pending is None or not pending.accepts(interpolation, border_mode, border_value):
+            pending = ComposedWarp(self.current_image)
+            if not pending.accepts(interpolation, border_mode, border_value):
+                return False
+        pending.extend(matrix, size, interpolation, border_mode, border_value)
+        self._pending = pending
+        return True
+    
+    def _defer_resize(self, cols, rows, new_cols, new_rows, interpolation):
+        """
+        دمج تغيير الحجم مع التحويلات المعلقة إذا لم يكن تصغيراً
+
+        التصغير في warp مدمج يأخذ عينات من الصورة دون متوسطها كما يفعل
+        cv2.resize، فتظهر فروق تصل إلى عشرات المستويات في الصور المشوشة؛
+        لذلك ينفذ التصغير مباشرة (كما ينفذ INTER_AREA) بعد تنفيذ المعلق.
+        """
+        if new_cols < cols or new_rows < rows:
+            return False
+        return self._defer(resize_matrix(cols, rows, new_cols, new_rows), (new_cols, new_rows), interpolation)
+    
+    def _materialize(self):
+        pending = self._pending
+        start = time.perf_counter()
+        self._pending = None
+        self._current_image = as_result(pending.render())
+        self._checkpoint(start)
         
     def reset(self):
-        self.current_image = self.original_image.copy()
+        self.current_image = self.original_image
         self.transformation_history.clear()
+        self.checkpoints.clear()
         
     def get_current_image(self):
-        return self.current_image.copy()
+        return self.current_image
     
     def get_original_image(self):
-        return self.original_image.copy()
+        return self.original_image
+    
+    def get_roi(self):
+        """
+        منطقة الصورة الحالية داخل الصورة الأصلية (x, y, width, height)
+        
+        بعد القص (أو سلسلة قصوص) تبقى الصورة الحالية نافذة على مخزن الصورة
+        الأصلية دون نسخ، وتقرأ العمليات اللاحقة بكسلات المنطقة فقط. يعيد
+        None إذا كانت هناك تحويلات معلقة أو كانت الصورة الحالية نتيجة مستقلة.
+        """
+        if self._pending is not None:
+            return None
+        return roi_of(self._current_image, self.original_image)
     
     def get_history(self):
         return self.transformation_history.copy()
     
+    def undo_last_transformation(self):
+        if not self.transformation_history:
+            return None
+        return self.jump_to_step(len(self.transformation_history) - 1)
+    
+    def jump_to_step(self, step):
+        """
+        العودة إلى الحالة بعد أول step تحويلات وحذف ما بعدها من السجل
+        
+        تستعاد أقرب لقطة محفوظة عند step أو قبلها ثم يعاد تطبيق التحويلات
+        بينها وبين step فقط.
+        
+        Parameters:
+        -----------
+        step : int
+            عدد التحويلات التي تبقى في السجل
+            
+        Returns:
+        --------
+        self : GeometricTransformation
+        """
+        if not isinstance(step, int) or not 0 <= step <= len(self.transformation_history):
+            raise ValueError(f"رقم الخطوة يجب أن يكون بين 0 و {len(self.transformation_history)}")
+        
+        index, image = self.checkpoints.restore_point(self.transformation_history, step)
+        replay = self.transformation_history[index:step]
+        del self.transformation_history[index:]
+        self.current_image = image
+        
+        for item in replay:
+            self._replay(item)
+        
+        return self
+    
+    def _replay(self, item):
+        parameters = dict(item['parameters'])
+        # السجل المستعاد من جلسة مشتركة يحمل القنوات بأسمائها والنقاط كقوائم
+        channel = parameters.get('channel')
+        if isinstance(channel, str):
+            parameters['channel'] = ColorChannel[channel.upper()]
+        elif channel is not None and not isinstance(channel, ColorChannel):
+            parameters['channel'] = ColorChannel(channel)
+        for name in ('src_points', 'dst_points'):
+            if name in parameters and not isinstance(parameters[name], np.ndarray):
+                parameters[name] = np.float32(parameters[name])
+        
+        transformation_type = GeometricTransformationType(item['type'])
+        if transformation_type == GeometricTransformationType.COLOR_ADJUSTMENT:
+            if 'set_value' in parameters:
+                return self.set_color_channel(parameters['channel'], parameters['set_value'])
+            if 'multiply_factor' in parameters:
+                return self.multiply_color_channel(parameters['channel'], parameters['multiply_factor'])
+        return self.apply_transformation(transformation_type, **parameters)
+    
+    def _checkpoint(self, start):
+        # النتائج الوسيطة بدقة float32 والتحويلات المعلقة لا تحفظ كلقطات
+        if self.precision != 'uint8' or self._pending is not None:
+            return
+        self.checkpoints.record(self.transformation_history, self.current_image, time.perf_counter() - start)
+    
+    def _output_buffer(self):
+        # مخزن بأبعاد الصورة الحالية ونوعها من color_buffers
+        image = self.current_image
+        return color_buffers.empty(image.shape, image.dtype)
+    
+    def _channel_scalar(self, channel, value, neutral):
+        # قيمة OpenCV رباعية تطبق value على القناة المحددة (أو على الكل) و neutral على غيرها
+        if channel == ColorChannel.ALL:
+            return (value,) * 4
+        if self._shape()[2:] == () or channel.value >= self._shape()[2]:
+            raise ValueError("القناة اللونية غير موجودة في الصورة")
+        scalar = [neutral] * 4
+        scalar[channel.value] = value
+        return tuple(scalar)
+    
     def _validate_points(self, points, expected_count, name):
         if points is None:
             raise ValueError(f"النقاط {name} لا يمكن أن تكون None")
@@ -70,13 +235,22 @@ class GeometricTransformation:
 
     def adjust_color_channel(self, channel: ColorChannel, value: int):
         try:
+            start = time.perf_counter()
             if not isinstance(channel, ColorChannel):
                 raise ValueError("القناة اللونية يجب أن تكون من نوع ColorChannel")
             
             if value < -255 or value > 255:
                 raise ValueError("قيمة الضبط يجب أن تكون بين -255 و 255")
             
-            if channel == ColorChannel.ALL:
+            # صور uint8: جدول LUT بتمريرة واحدة دون مصفوفات وسيطة
+            lut = color_lut('adjust_color_channel', {'channel': channel, 'value': value}, self.current_image)
+            if lut is not None:
+                adjusted_image = apply_lut(self.current_image, lut, self._output_buffer())
+            elif self.precision == 'float32':
+                # بدون قص: القيم خارج [0, 255] تقص مرة واحدة عند الإخراج
+                adjusted_image = cv2.add(self.current_image, self._channel_scalar(channel, value, 0),
+                                         dst=self._output_buffer())
+            elif channel == ColorChannel.ALL:
                 adjusted_image = self.current_image.astype(np.int16) + value
                 adjusted_image = np.clip(adjusted_image, 0, 255).astype(np.uint8)
             else:
@@ -86,11 +260,12 @@ class GeometricTransformation:
                     adjusted_image[:, :, channel_idx].astype(np.int16) + value, 0, 255
                 ).astype(np.uint8)
             
-            self.current_image = adjusted_image
+            self.current_image = as_result(adjusted_image)
             self.transformation_history.append({
                 'type': GeometricTransformationType.COLOR_ADJUSTMENT,
                 'parameters': {'channel': channel, 'value': value}
             })
+            self._checkpoint(start)
             
             return self
             
@@ -99,24 +274,28 @@ class GeometricTransformation:
 
     def set_color_channel(self, channel: ColorChannel, value: int):
         try:
+            start = time.perf_counter()
             if not isinstance(channel, ColorChannel):
                 raise ValueError("القناة اللونية يجب أن تكون من نوع ColorChannel")
             
             if value < 0 or value > 255:
                 raise ValueError("قيمة القناة يجب أن تكون بين 0 و 255")
             
+            # القيمة تكتب مباشرة في مخزن معاد استخدامه دون حجز صورة جديدة
+            adjusted_image = self._output_buffer()
             if channel == ColorChannel.ALL:
-                adjusted_image = np.full_like(self.current_image, value)
+                adjusted_image.fill(value)
             else:
                 channel_idx = channel.value
-                adjusted_image = self.current_image.copy()
+                np.copyto(adjusted_image, self.current_image)
                 adjusted_image[:, :, channel_idx] = value
             
-            self.current_image = adjusted_image
+            self.current_image = as_result(adjusted_image)
             self.transformation_history.append({
                 'type': GeometricTransformationType.COLOR_ADJUSTMENT,
                 'parameters': {'channel': channel, 'set_value': value}
             })
+            self._checkpoint(start)
             
             return self
             
@@ -125,14 +304,24 @@ class GeometricTransformation:
 
     def multiply_color_channel(self, channel: ColorChannel, factor: float):
         try:
+            start = time.perf_counter()
             if not isinstance(channel, ColorChannel):
                 raise ValueError("القناة اللونية يجب أن تكون من نوع ColorChannel")
             
             if factor <= 0:
                 raise ValueError("معامل الضرب يجب أن يكون قيمة موجبة")
             
-            if channel == ColorChannel.ALL:
-                adjusted_image = (self.current_image.astype(np.float32) * factor)
+            lut = color_lut('multiply_color_channel', {'channel': channel, 'factor': factor}, self.current_image)
+            if lut is not None:
+                adjusted_image = apply_lut(self.current_image, lut, self._output_buffer())
+            elif self.precision == 'float32':
+                # المعامل بدقة float32 كما في ضرب مصفوفة float32 بعدد
+                adjusted_image = cv2.multiply(
+                    self.current_image, self._channel_scalar(channel, float(np.float32(factor)), 1),
+                    dst=self._output_buffer()
+                )
+            elif channel == ColorChannel.ALL:
+                adjusted_image = derived_planes.float32(self.current_image) * factor
                 adjusted_image = np.clip(adjusted_image, 0, 255).astype(np.uint8)
             else:
                 channel_idx = channel.value
@@ -141,11 +330,12 @@ class GeometricTransformation:
                     adjusted_image[:, :, channel_idx].astype(np.float32) * factor, 0, 255
                 ).astype(np.uint8)
             
-            self.current_image = adjusted_image
+            self.current_image = as_result(adjusted_image)
             self.transformation_history.append({
                 'type': GeometricTransformationType.COLOR_ADJUSTMENT,
                 'parameters': {'channel': channel, 'multiply_factor': factor}
             })
+            self._checkpoint(start)
             
             return self
             
@@ -154,22 +344,24 @@ class GeometricTransformation:
 
     def translate(self, tx, ty, border_mode=cv2.BORDER_CONSTANT, border_value=(0, 0, 0)):
         try:
+            start = time.perf_counter()
             self._validate_parameters(tx=tx, ty=ty)
             
-            rows, cols = self.current_image.shape[:2]
+            rows, cols = self._shape()[:2]
             translation_matrix = np.float32([[1, 0, tx], [0, 1, ty]])
             
-            transformed_image = cv2.warpAffine(
-                self.current_image, translation_matrix, (cols, rows),
-                borderMode=border_mode, borderValue=border_value
-            )
-            
-            self.current_image = transformed_image
+            if not self._defer(translation_matrix, (cols, rows), cv2.INTER_LINEAR, border_mode, border_value):
+                transformed_image = cv2.warpAffine(
+                    self.current_image, translation_matrix, (cols, rows),
+                    borderMode=border_mode, borderValue=border_value
+                )
+                self.current_image = as_result(transformed_image)
             self.transformation_history.append({
                 'type': GeometricTransformationType.TRANSLATION,
                 'parameters': {'tx': tx, 'ty': ty, 'border_mode': border_mode, 'border_value': border_value},
                 'matrix': translation_matrix
             })
+            self._checkpoint(start)
             
             return self
             
@@ -178,9 +370,10 @@ class GeometricTransformation:
     
     def rotate(self, angle, center=None, scale=1.0, border_mode=cv2.BORDER_CONSTANT, border_value=(0, 0, 0)):
         try:
+            start = time.perf_counter()
             self._validate_parameters(angle=angle, scale=scale)
             
-            rows, cols = self.current_image.shape[:2]
+            rows, cols = self._shape()[:2]
             
             if center is None:
                 center = (cols / 2, rows / 2)
@@ -195,18 +388,19 @@ class GeometricTransformation:
             rotation_matrix[0, 2] += (new_cols / 2) - center[0]
             rotation_matrix[1, 2] += (new_rows / 2) - center[1]
             
-            transformed_image = cv2.warpAffine(
-                self.current_image, rotation_matrix, (new_cols, new_rows),
-                borderMode=border_mode, borderValue=border_value
-            )
-            
-            self.current_image = transformed_image
+            if not self._defer(rotation_matrix, (new_cols, new_rows), cv2.INTER_LINEAR, border_mode, border_value):
+                transformed_image = cv2.warpAffine(
+                    self.current_image, rotation_matrix, (new_cols, new_rows),
+                    borderMode=border_mode, borderValue=border_value
+                )
+                self.current_image = as_result(transformed_image)
             self.transformation_history.append({
                 'type': GeometricTransformationType.ROTATION,
                 'parameters': {'angle': angle, 'center': center, 'scale': scale, 
                               'border_mode': border_mode, 'border_value': border_value},
                 'matrix': rotation_matrix
             })
+            self._checkpoint(start)
             
             return self
             
@@ -215,6 +409,7 @@ class GeometricTransformation:
     
     def scale(self, fx, fy=None, interpolation=cv2.INTER_LINEAR):
         try:
+            start = time.perf_counter()
             self._validate_parameters(fx=fx)
             
             if fy is None:
@@ -223,20 +418,21 @@ class GeometricTransformation:
             if fx <= 0 or fy <= 0:
                 raise ValueError("عوامل التحجيم يجب أن تكون قيم موجبة")
             
-            rows, cols = self.current_image.shape[:2]
+            rows, cols = self._shape()[:2]
             new_cols = int(cols * fx)
             new_rows = int(rows * fy)
             
-            transformed_image = cv2.resize(
-                self.current_image, (new_cols, new_rows), 
-                interpolation=interpolation
-            )
-            
-            self.current_image = transformed_image
+            if not self._defer_resize(cols, rows, new_cols, new_rows, interpolation):
+                transformed_image = cv2.resize(
+                    self.current_image, (new_cols, new_rows), 
+                    interpolation=interpolation
+                )
+                self.current_image = as_result(transformed_image)
             self.transformation_history.append({
                 'type': GeometricTransformationType.SCALING,
                 'parameters': {'fx': fx, 'fy': fy, 'interpolation': interpolation}
             })
+            self._checkpoint(start)
             
             return self
             
@@ -245,24 +441,26 @@ class GeometricTransformation:
     
     def affine_transform(self, src_points, dst_points, border_mode=cv2.BORDER_CONSTANT, border_value=(0, 0, 0)):
         try:
+            start = time.perf_counter()
             self._validate_points(src_points, 3, "المصدر")
             self._validate_points(dst_points, 3, "الوجهة")
             
-            rows, cols = self.current_image.shape[:2]
+            rows, cols = self._shape()[:2]
             affine_matrix = cv2.getAffineTransform(src_points.astype(np.float32), dst_points.astype(np.float32))
             
-            transformed_image = cv2.warpAffine(
-                self.current_image, affine_matrix, (cols, rows),
-                borderMode=border_mode, borderValue=border_value
-            )
-            
-            self.current_image = transformed_image
+            if not self._defer(affine_matrix, (cols, rows), cv2.INTER_LINEAR, border_mode, border_value):
+                transformed_image = cv2.warpAffine(
+                    self.current_image, affine_matrix, (cols, rows),
+                    borderMode=border_mode, borderValue=border_value
+                )
+                self.current_image = as_result(transformed_image)
             self.transformation_history.append({
                 'type': GeometricTransformationType.AFFINE,
                 'parameters': {'src_points': src_points, 'dst_points': dst_points,
                               'border_mode': border_mode, 'border_value': border_value},
                 'matrix': affine_matrix
             })
+            self._checkpoint(start)
             
             return self
             
@@ -271,44 +469,113 @@ class GeometricTransformation:
     
     def perspective_transform(self, src_points, dst_points, border_mode=cv2.BORDER_CONSTANT, border_value=(0, 0, 0)):
         try:
+            start = time.perf_counter()
             self._validate_points(src_points, 4, "المصدر")
             self._validate_points(dst_points, 4, "الوجهة")
             
-            rows, cols = self.current_image.shape[:2]
+            rows, cols = self._shape()[:2]
             perspective_matrix = cv2.getPerspectiveTransform(
                 src_points.astype(np.float32), dst_points.astype(np.float32)
             )
             
-            transformed_image = cv2.warpPerspective(
-                self.current_image, perspective_matrix, (cols, rows),
-                borderMode=border_mode, borderValue=border_value
-            )
-            
-            self.current_image = transformed_image
+            if not self._defer(perspective_matrix, (cols, rows), cv2.INTER_LINEAR, border_mode, border_value):
+                # المصفوفة المتكررة بنفس الحجم تنفذ بجداول remap مخزنة
+                transformed_image = remap_perspective(
+                    self.current_image, perspective_matrix, (cols, rows),
+                    cv2.INTER_LINEAR, border_mode, border_value
+                )
+                self.current_image = as_result(transformed_image)
             self.transformation_history.append({
                 'type': GeometricTransformationType.PERSPECTIVE,
                 'parameters': {'src_points': src_points, 'dst_points': dst_points,
                               'border_mode': border_mode, 'border_value': border_value},
                 'matrix': perspective_matrix
             })
+            self._checkpoint(start)
             
             return self
             
         except Exception as e:
             raise RuntimeError(f"فشل في تحويل المنظور: {str(e)}")
     
+    def warp_polar(self, center=None, max_radius=None, dsize=None, log_polar=False, inverse=False,
+                   interpolation=cv2.INTER_LINEAR):
+        """
+        تحويل الصورة إلى الإحداثيات القطبية (أو اللوغاريتمية القطبية) أو العكس
+        
+        يطابق cv2.warpPolar مع WARP_FILL_OUTLIERS، وتخزن جداول remap لكل
+        حجم ومركز ونصف قطر فيصبح تكرار التحويل استدعاء remap واحداً.
+        
+        Parameters:
+        -----------
+        center : tuple, optional
+            مركز التحويل (x, y)؛ افتراضياً مركز الصورة الديكارتية
+        max_radius : float, optional
+            نصف قطر الدائرة المحولة؛ افتراضياً نصف أصغر بعدي الصورة
+            الديكارتية، وفي الاتجاه العكسي عرض الصورة القطبية
+        dsize : tuple, optional
+            حجم الناتج (width, height)؛ افتراضياً حجم OpenCV الافتراضي في
+            الاتجاه الأمامي، و (2 * max_radius, 2 * max_radius) في العكسي
+        log_polar : bool
+            مقياس لوغاريتمي لنصف القطر
+        inverse : bool
+            من الإحداثيات القطبية إلى الديكارتية
+        interpolation : int
+            طريقة الاستيفاء
+            
+        Returns:
+        --------
+        self : GeometricTransformation
+        """
+        try:
+            start = time.perf_counter()
+            rows, cols = self._shape()[:2]
+            
+            if max_radius is None:
+                max_radius = cols if inverse else min(rows, cols) / 2
+            if max_radius <= 0 or (log_polar and max_radius <= 1):
+                raise ValueError("نصف القطر يجب أن يكون قيمة موجبة (وأكبر من 1 في المقياس اللوغاريتمي)")
+            if dsize is None and inverse:
+                dsize = (int(round(2 * max_radius)), int(round(2 * max_radius)))
+            if dsize is not None:
+                dsize = (int(dsize[0]), int(dsize[1]))
+            if center is None:
+                center = (dsize[0] / 2, dsize[1] / 2) if inverse else (cols / 2, rows / 2)
+            center = (float(center[0]), float(center[1]))
+            
+            transformed_image = remap_polar(
+                self.current_image, center, max_radius, dsize, log_polar, inverse, interpolation
+            )
+            self.current_image = as_result(transformed_image)
+            
+            self.transformation_history.append({
+                'type': GeometricTransformationType.WARP_POLAR,
+                'parameters': {'center': center, 'max_radius': max_radius, 'dsize': dsize,
+                              'log_polar': log_polar, 'inverse': inverse, 'interpolation': interpolation}
+            })
+            self._checkpoint(start)
+            
+            return self
+            
+        except Exception as e:
+            raise RuntimeError(f"فشل في التحويل القطبي: {str(e)}")
+    
     def flip(self, flip_code):
         try:
+            start = time.perf_counter()
             if flip_code not in [0, 1, -1]:
                 raise ValueError("كود القلب يجب أن يكون 0، 1، أو -1")
             
-            transformed_image = cv2.flip(self.current_image, flip_code)
-            self.current_image = transformed_image
+            rows, cols = self._shape()[:2]
+            if not self._defer(flip_matrix(cols, rows, flip_code), (cols, rows)):
+                transformed_image = cv2.flip(self.current_image, flip_code)
+                self.current_image = as_result(transformed_image)
             
             self.transformation_history.append({
                 'type': GeometricTransformationType.FLIP,
                 'parameters': {'flip_code': flip_code}
             })
+            self._checkpoint(start)
             
             return self
             
@@ -317,9 +584,10 @@ class GeometricTransformation:
     
     def crop(self, x, y, width, height):
         try:
+            start = time.perf_counter()
             self._validate_parameters(x=x, y=y, width=width, height=height)
             
-            rows, cols = self.current_image.shape[:2]
+            rows, cols = self._shape()[:2]
             
             if x < 0 or y < 0 or width <= 0 or height <= 0:
                 raise ValueError("معاملات القص يجب أن تكون قيم موجبة")
@@ -327,13 +595,16 @@ class GeometricTransformation:
             if x + width > cols or y + height > rows:
                 raise ValueError("منطقة القص خارج حدود الصورة")
             
-            cropped_image = self.current_image[y:y+height, x:x+width]
-            self.current_image = cropped_image
+            # القص وحده عرض بلا نسخ، فلا يؤجل إلا إذا كانت هناك تحويلات معلقة
+            if self._pending is None or not self._defer(crop_matrix(x, y), (width, height)):
+                cropped_image = self.current_image[y:y+height, x:x+width]
+                self.current_image = as_result(cropped_image)
             
             self.transformation_history.append({
                 'type': GeometricTransformationType.CROP,
                 'parameters': {'x': x, 'y': y, 'width': width, 'height': height}
             })
+            self._checkpoint(start)
             
             return self
             
@@ -342,18 +613,22 @@ class GeometricTransformation:
     
     def resize(self, width, height, interpolation=cv2.INTER_LINEAR):
         try:
+            start = time.perf_counter()
             self._validate_parameters(width=width, height=height)
             
             if width <= 0 or height <= 0:
                 raise ValueError("أبعاد الصورة الجديدة يجب أن تكون قيم موجبة")
             
-            resized_image = cv2.resize(self.current_image, (width, height), interpolation=interpolation)
-            self.current_image = resized_image
+            rows, cols = self._shape()[:2]
+            if not self._defer_resize(cols, rows, width, height, interpolation):
+                resized_image = cv2.resize(self.current_image, (width, height), interpolation=interpolation)
+                self.current_image = as_result(resized_image)
             
             self.transformation_history.append({
                 'type': GeometricTransformationType.RESIZE,
                 'parameters': {'width': width, 'height': height, 'interpolation': interpolation}
             })
+            self._checkpoint(start)
             
             return self
             
@@ -385,6 +660,7 @@ class GeometricTransformation:
                 GeometricTransformationType.FLIP: self.flip,
                 GeometricTransformationType.CROP: self.crop,
                 GeometricTransformationType.RESIZE: self.resize,
+                GeometricTransformationType.WARP_POLAR: self.warp_polar,
                 GeometricTransformationType.COLOR_ADJUSTMENT: self.adjust_color_channel
             }
             
@@ -395,3 +671,96 @@ class GeometricTransformation:
             
         except Exception as e:
             raise RuntimeError(f"فشل في تطبيق التحويل: {str(e)}")
+
+    def apply_transformation_chain(self, transform_chain, on_step=None, precision='uint8', deferred=False):
+        """
+        تطبيق سلسلة من التحويلات بالتتابع
+        
+        عمليات ضبط القنوات اللونية المتتالية تدمج في جدول LUT واحد وتطبق
+        بتمريرة واحدة على الصورة، مع تسجيل كل عملية في السجل كالمعتاد.
+        
+        Parameters:
+        -----------
+        transform_chain : list
+            عناصر بالشكل {'transformation_type': ..., 'parameters': {...}}
+        on_step : callable, optional
+            تستدعى بالشكل on_step(index, image) بعد كل نتيجة وسيطة؛ العمليات
+            المدمجة تبلغ برقم آخر عملية فيها فقط
+        precision : str
+            'uint8' (الافتراضي) أو 'float32' لإبقاء النتائج الوسيطة بدقة float32
+            دون قص بعد كل عملية، ثم التقريب إلى uint8 مرة واحدة في النهاية
+        deferred : bool
+            دمج التحويلات الهندسية المتتالية في عملية warp واحدة؛ on_step لا
+            تستدعى إلا للخطوات التي نفذت بكسلاتها، وللخطوة الأخيرة دائماً.
+            القص والقلب والإزاحات الصحيحة والتصغير (الذي ينفذ مباشرة) مطابقة
+            للتنفيذ المتتالي، والتكبير وحده يختلف بستة مستويات على الأكثر
+            (warp يقرب مواقع العينات إلى 1/32 بكسل بينما لا يقربها resize).
+            أما عدة خطوات مستوفاة متتالية فتستوفى مرة واحدة بدل كل خطوة، فيختلف
+            الناتج عن التنفيذ المتتالي (الأكثر تنعيماً): أقل من مستوى واحد في
+            المتوسط للصور الناعمة، وحتى 143 مستوى في الضوضاء العشوائية
+            
+        Returns:
+        --------
+        self : GeometricTransformation
+        """
+        if precision not in ('uint8', 'float32'):
+            raise ValueError("الدقة يجب أن تكون 'uint8' أو 'float32'")
+        if deferred and not self.deferred:
+            self.deferred = True
+            try:
+                return self.apply_transformation_chain(transform_chain, on_step, precision)
+            finally:
+                self.deferred = False
+        if precision == 'float32' and self.precision == 'uint8':
+            self.precision = 'float32'
+            if self.current_image.dtype != np.float32:
+                self.current_image = derived_planes.float32(self.current_image)
+            try:
+                self.apply_transformation_chain(transform_chain, on_step)
+            finally:
+                self.precision = 'uint8'
+                self.current_image = quantize(self.current_image)
+            return self
+        
+        def flush(run, last_index):
+            if run:
+                self._apply_color_run(run)
+                if on_step is not None:
+                    on_step(last_index, self.current_image)
+        
+        run = []
+        for index, transform_config in enumerate(transform_chain):
+            transformation_type = transform_config.get('transformation_type')
+            parameters = transform_config.get('parameters', {})
+            
+            if transformation_type == 'color_adjustment':
+                lut = color_lut('adjust_color_channel', parameters, self.current_image)
+                if lut is not None:
+                    run.append((parameters, lut))
+                    continue
+            
+            flush(run, index - 1)
+            run = []
+            if transformation_type == 'color_adjustment':
+                self.adjust_color_channel(**parameters)
+            else:
+                self.apply_transformation(GeometricTransformationType(transformation_type), **parameters)
+            # الخطوات المعلقة لا تنفذ من أجل on_step، ما عدا الأخيرة
+            if on_step is not None and (self._pending is None or index == len(transform_chain) - 1):
+                on_step(index, self.current_image)
+        
+        flush(run, len(transform_chain) - 1)
+        return self
+    
+    def _apply_color_run(self, run):
+        if len(run) == 1:
+            self.adjust_color_channel(**run[0][0])
+        elif run:
+            start = time.perf_counter()
+            self.current_image = apply_fused(self.current_image, [lut for _, lut in run], self._output_buffer())
+            for parameters, _ in run:
+                self.transformation_history.append({
+                    'type': GeometricTransformationType.COLOR_ADJUSTMENT,
+                    'parameters': {'channel': parameters['channel'], 'value': parameters['value']}
+                })
+            self._checkpoint(start)
@@ -0,0 +1,99 @@
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024  # لكل معالج
+DEFAULT_MIN_REPLAY_SECONDS = 0.02
+
+
+class CheckpointHistory:
+    """
+    لقطات وسيطة لسجل العمليات تجعل التراجع لا يعيد تطبيق السجل كاملاً
+
+    السجل نفسه (قائمة العمليات) يبقى ملكاً للمعالج وقد يعدل من خارجه، لذلك
+    تحفظ كل لقطة الصورة بعد الخطوة index مع عنصر السجل في تلك الخطوة، ولا
+    تعتبر صالحة إلا إذا بقي نفس العنصر في نفس الموضع من السجل.
+
+    تؤخذ اللقطة عندما يتجاوز زمن إعادة التطبيق منذ آخر لقطة صالحة القيمة
+    min_replay_seconds، فالعمليات الثقيلة (مثل المرشح الثنائي) تحفظ نتيجتها
+    دائماً بينما تتجمع العمليات الرخيصة بين لقطتين. عند تجاوز max_bytes تحذف
+    اللقطة التي يضيف حذفها أقل زمن إعادة تطبيق.
+    """
+
+    def __init__(self, original: np.ndarray, max_bytes: int = DEFAULT_MAX_BYTES,
+                 min_replay_seconds: float = DEFAULT_MIN_REPLAY_SECONDS):
+        self.original = original
+        self.max_bytes = max_bytes
+        self.min_replay_seconds = min_replay_seconds
+        self._checkpoints: Dict[int, Tuple[Any, np.ndarray]] = {}
+        self._costs: Dict[int, Tuple[Any, float]] = {}
+
+    def record(self, history: List[Any], image: np.ndarray, seconds: float) -> None:
+        """تسجيل زمن الخطوة الأخيرة في history وأخذ لقطة لنتيجتها عند الحاجة"""
+        index = len(history)
+        if index == 0:
+            return
+        self._prune(history)
+        entry = history[-1]
+        self._costs[index] = (entry, seconds)
+        if self.replay_cost(history, index) >= self.min_replay_seconds:
+            self._checkpoints[index] = (entry, image)
+            self._enforce_budget(history)
+
+    def restore_point(self, history: List[Any], step: int) -> Tuple[int, np.ndarray]:
+        """أقرب لقطة صالحة عند الخطوة step أو قبلها: (index, image)"""
+        self._prune(history)
+        index = self._previous(step + 1)
+        if index == 0:
+            return 0, self.original
+        return index, self._checkpoints[index][1]
+
+    def replay_cost(self, history: List[Any], index: int) -> float:
+        """زمن إعادة تطبيق الخطوات من أقرب لقطة سابقة حتى الخطوة index"""
+        start = self._previous(index)
+        total = 0.0
+        for step in range(start + 1, index + 1):
+            cost = self._costs.get(step)
+            if cost is not None and self._is_valid(history, step, cost[0]):
+                total += cost[1]
+        return total
+
+    def copy(self) -> 'CheckpointHistory':
+        """نسخة مستقلة: تشارك الصور (للقراءة فقط) لكن لقطاتها وأزمنتها خاصة بها"""
+        clone = CheckpointHistory(self.original, self.max_bytes, self.min_replay_seconds)
+        clone._checkpoints = dict(self._checkpoints)
+        clone._costs = dict(self._costs)
+        return clone
+
+    def clear(self) -> None:
+        self._checkpoints.clear()
+        self._costs.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'checkpoints': sorted(self._checkpoints),
+            'current_bytes': self._current_bytes(),
+            'max_bytes': self.max_bytes
+        }
+
+    def _previous(self, index: int) -> int:
+        earlier = [step for step in self._checkpoints if step < index]
+        return max(earlier) if earlier else 0
+
+    @staticmethod
+    def _is_valid(history: List[Any], index: int, entry: Any) -> bool:
+        return index <= len(history) and history[index - 1] is entry
+
+    def _prune(self, history: List[Any]) -> None:
+        for store in (self._checkpoints, self._costs):
+            for index in [index for index, (entry, _) in store.items()
+                          if not self._is_valid(history, index, entry)]:
+                del store[index]
+
+    def _current_bytes(self) -> int:
+        return sum(image.nbytes for _, image in self._checkpoints.values())
+
+    def _enforce_budget(self, history: List[Any]) -> None:
+        while self._checkpoints and self._current_bytes() > self.max_bytes:
+            cheapest = min(self._checkpoints, key=lambda index: self.replay_cost(history, index))
+            del self._checkpoints[cheapest]
@@ -1,9 +1,20 @@
 import cv2
 import numpy as np
-from typing import Union, List, Dict, Any, Optional, Callable
+from typing import Union, List, Dict, Any, Optional, Callable, Iterable
 from enum import Enum
+import time
 import logging
 
+from .shared_buffer import as_readonly, as_result
+from .pointwise import gamma_table, filter_lut, apply_fused, quantize
+from .history import CheckpointHistory
+from .convolution import separable_factors, dft_filter2d, DFT_MIN_KERNEL_AREA, DFT_DTYPES
+from .tiling import run_tiled, TILED_MIN_PIXELS
+from .derived_planes import derived_planes
+from .approximate import approximate_gaussian_blur, approximate_bilateral_filter
+from .morphology import structuring_element, decomposition, decomposed_morphology
+from .parallel_batch import ImageBatchResult, run_image_batch
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -21,6 +32,12 @@ class FilterType(Enum):
     MORPHOLOGICAL = "morphological"
     CUSTOM = "custom"
 
+# Chain precisions: 'float32' keeps intermediates in float32 and quantizes once at the end
+PRECISIONS = ('uint8', 'float32')
+
+# Filters OpenCV implements for 8-bit images only; in float32 mode their input is quantized
+UINT8_ONLY_FILTERS = {FilterType.CANNY, FilterType.HISTOGRAM_EQUALIZATION, FilterType.ADAPTIVE_THRESHOLD}
+
 class ImageProcessingException(Exception):
     pass
 
@@ -33,6 +50,16 @@ class InvalidParameterException(ImageProcessingException):
 class FilterConfigurationException(ImageProcessingException):
     pass
 
+class HistoryEntry(tuple):
+    """(filter_type, params) history entry carrying metadata about how the filter ran"""
+    def __new__(cls, filter_type, params, metadata=None):
+        entry = super().__new__(cls, (filter_type, params))
+        entry.metadata = metadata or {}
+        return entry
+
+    def __getnewargs__(self):
+        return (self[0], self[1], self.metadata)
+
 class AdvancedImageProcessor:
     def __init__(self, image: np.ndarray):
         if not isinstance(image, np.ndarray):
@@ -40,10 +67,17 @@ class AdvancedImageProcessor:
         if image.size == 0:
             raise InvalidImageException("Image cannot be empty")
         
-        self.original_image = image.copy()
-        self.current_image = image.copy()
+        self.original_image = as_readonly(image)
+        self.current_image = self.original_image
         self.history = []
+        self.checkpoints = CheckpointHistory(self.original_image)
         self.filter_configs = {}
+        # Details of how the running filter was computed, kept with its history entry
+        self._run_metadata = {}
+        # Working precision of the current image, see PRECISIONS
+        self.precision = 'uint8'
+        # Expensive local filters run in strips on a thread pool above min_pixels
+        self.tiling = {'enabled': True, 'min_pixels': TILED_MIN_PIXELS, 'max_workers': None}
         
     def validate_image(self, image: np.ndarray) -> None:
         if not isinstance(image, np.ndarray):
@@ -85,40 +119,98 @@ class AdvancedImageProcessor:
             if filter_type not in filter_methods:
                 raise FilterConfigurationException(f"Unsupported filter type: {filter_type}")
             
-            result = filter_methods[filter_type](**kwargs)
-            self.history.append((filter_type, kwargs))
+            start = time.perf_counter()
+            self._run_metadata = {}
+            if self.precision == 'float32':
+                result = as_result(self._apply_float32(filter_methods[filter_type], filter_type, kwargs))
+            else:
+                result = as_result(filter_methods[filter_type](**kwargs))
+            if self._run_metadata:
+                self.history.append(HistoryEntry(filter_type, kwargs, self._run_metadata))
+            else:
+                self.history.append((filter_type, kwargs))
             self.current_image = result
+            # Float32 intermediates are not checkpointed; undo replays at the processor's precision
+            if self.precision == 'uint8':
+                self.checkpoints.record(self.history, result, time.perf_counter() - start)
             return result
             
         except Exception as e:
             logger.error(f"Error applying filter {filter_type}: {str(e)}")
             raise ImageProcessingException(f"Failed to apply filter: {str(e)}")
 
-    def _apply_gaussian_blur(self, ksize: int = 5, sigma: float = 0) -> np.ndarray:
+    def _apply_float32(self, method: Callable[..., np.ndarray], filter_type: FilterType,
+                       kwargs: Dict[str, Any]) -> np.ndarray:
+        """Run a filter on the float32 current image, quantizing only for 8-bit-only filters"""
+        needs_uint8 = (
+            filter_type in UINT8_ONLY_FILTERS
+            or (filter_type == FilterType.MEDIAN_BLUR and kwargs.get('ksize', 5) > 5)
+            or (filter_type == FilterType.THRESHOLD
+                and int(kwargs.get('type', cv2.THRESH_BINARY)) & (cv2.THRESH_OTSU | cv2.THRESH_TRIANGLE))
+        )
+        if not needs_uint8:
+            return method(**kwargs).astype(np.float32, copy=False)
+        
+        image = self.current_image
+        self.current_image = quantize(image)
+        try:
+            return method(**kwargs).astype(np.float32)
+        finally:
+            self.current_image = image
+
+    def _apply_gaussian_blur(self, ksize: int = 5, sigma: float = 0, approximate: bool = False) -> np.ndarray:
         self.validate_kernel_size(ksize)
         if sigma < 0:
             raise InvalidParameterException("Sigma must be non-negative")
+        if approximate:
+            return self._run_approximate(approximate_gaussian_blur, ksize, sigma)
         return cv2.GaussianBlur(self.current_image, (ksize, ksize), sigma)
 
+    def set_tiling(self, enabled: bool = True, min_pixels: Optional[int] = None,
+                   max_workers: Optional[int] = None) -> None:
+        self.tiling['enabled'] = enabled
+        if min_pixels is not None:
+            self.tiling['min_pixels'] = min_pixels
+        if max_workers is not None:
+            self.tiling['max_workers'] = max_workers
+
+    def _run_local(self, func: Callable[[np.ndarray], np.ndarray], halo: int) -> np.ndarray:
+        """Run a filter whose output depends only on pixels within `halo` rows, tiled on large images"""
+        image = self.current_image
+        if not self.tiling['enabled'] or image.shape[0] * image.shape[1] < self.tiling['min_pixels']:
+            return func(image)
+        return run_tiled(func, image, halo, self.tiling['max_workers'])
+
+    def _run_approximate(self, method: Callable[..., tuple], *args) -> np.ndarray:
+        """Run a downsampled approximation, recording the scale factor it used (1 = exact)"""
+        result, factor = method(self.current_image, *args)
+        self._run_metadata = {'path': 'approximate' if factor > 1 else 'exact', 'factor': factor}
+        return result
+
     def _apply_median_blur(self, ksize: int = 5) -> np.ndarray:
         self.validate_kernel_size(ksize)
-        return cv2.medianBlur(self.current_image, ksize)
+        return self._run_local(lambda image: cv2.medianBlur(image, ksize), ksize // 2)
 
-    def _apply_bilateral_filter(self, d: int = 9, sigma_color: float = 75, sigma_space: float = 75) -> np.ndarray:
+    def _apply_bilateral_filter(self, d: int = 9, sigma_color: float = 75, sigma_space: float = 75,
+                                approximate: bool = False) -> np.ndarray:
         if d <= 0 or sigma_color <= 0 or sigma_space <= 0:
             raise InvalidParameterException("Parameters must be positive")
-        return cv2.bilateralFilter(self.current_image, d, sigma_color, sigma_space)
+        if approximate:
+            return self._run_approximate(approximate_bilateral_filter, d, sigma_color, sigma_space)
+        if self.current_image.dtype != np.uint8:
+            # Float images are normalized by their global range, so strips would differ
+            return cv2.bilateralFilter(self.current_image, d, sigma_color, sigma_space)
+        return self._run_local(lambda image: cv2.bilateralFilter(image, d, sigma_color, sigma_space), d // 2)
 
     def _apply_sobel(self, dx: int = 1, dy: int = 0, ksize: int = 3, scale: float = 1.0, delta: float = 0.0) -> np.ndarray:
         self.validate_kernel_size(ksize)
         if dx < 0 or dy < 0:
             raise InvalidParameterException("dx and dy must be non-negative")
         
-        if len(self.current_image.shape) == 3:
-            gray = cv2.cvtColor(self.current_image, cv2.COLOR_BGR2GRAY)
-        else:
-            gray = self.current_image
+        gray = derived_planes.gray(self.current_image)
             
+        if self.precision == 'float32':
+            return np.absolute(cv2.Sobel(gray, cv2.CV_32F, dx, dy, ksize=ksize, scale=scale, delta=delta))
         sobel = cv2.Sobel(gray, cv2.CV_64F, dx, dy, ksize=ksize, scale=scale, delta=delta)
         return np.uint8(np.absolute(sobel))
 
@@ -128,27 +220,23 @@ class AdvancedImageProcessor:
         if aperture_size not in [3, 5, 7]:
             raise InvalidParameterException("Aperture size must be 3, 5, or 7")
         
-        if len(self.current_image.shape) == 3:
-            gray = cv2.cvtColor(self.current_image, cv2.COLOR_BGR2GRAY)
-        else:
-            gray = self.current_image
+        gray = derived_planes.gray(self.current_image)
             
         return cv2.Canny(gray, threshold1, threshold2, apertureSize=aperture_size)
 
     def _apply_laplacian(self, ksize: int = 3, scale: float = 1.0, delta: float = 0.0) -> np.ndarray:
         self.validate_kernel_size(ksize)
-        if len(self.current_image.shape) == 3:
-            gray = cv2.cvtColor(self.current_image, cv2.COLOR_BGR2GRAY)
-        else:
-            gray = self.current_image
+        gray = derived_planes.gray(self.current_image)
             
+        if self.precision == 'float32':
+            return np.absolute(cv2.Laplacian(gray, cv2.CV_32F, ksize=ksize, scale=scale, delta=delta))
         laplacian = cv2.Laplacian(gray, cv2.CV_64F, ksize=ksize, scale=scale, delta=delta)
         return np.uint8(np.absolute(laplacian))
 
     def _apply_histogram_equalization(self) -> np.ndarray:
         if len(self.current_image.shape) == 3:
-            hsv = cv2.cvtColor(self.current_image, cv2.COLOR_BGR2HSV)
-            hsv[:,:,2] = cv2.equalizeHist(hsv[:,:,2])
+            hue, saturation, value = cv2.split(derived_planes.hsv(self.current_image))
+            hsv = cv2.merge([hue, saturation, cv2.equalizeHist(value)])
             return cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
         else:
             return cv2.equalizeHist(self.current_image)
@@ -157,18 +245,16 @@ class AdvancedImageProcessor:
         if gamma <= 0:
             raise InvalidParameterException("Gamma must be positive")
         
-        inv_gamma = 1.0 / gamma
-        table = np.array([((i / 255.0) ** inv_gamma) * 255 for i in np.arange(0, 256)]).astype("uint8")
-        return cv2.LUT(self.current_image, table)
+        if self.precision == 'float32':
+            # Values above 255 (e.g. from sobel) are kept and clipped at output
+            return cv2.pow(np.maximum(self.current_image, 0) * (1.0 / 255), 1.0 / gamma) * 255
+        return cv2.LUT(self.current_image, gamma_table(float(gamma)))
 
     def _apply_threshold(self, thresh: float = 127, maxval: float = 255, type: int = cv2.THRESH_BINARY) -> np.ndarray:
         if thresh < 0 or maxval < 0:
             raise InvalidParameterException("Threshold values must be non-negative")
         
-        if len(self.current_image.shape) == 3:
-            gray = cv2.cvtColor(self.current_image, cv2.COLOR_BGR2GRAY)
-        else:
-            gray = self.current_image
+        gray = derived_planes.gray(self.current_image)
             
         _, thresholded = cv2.threshold(gray, thresh, maxval, type)
         return thresholded
@@ -180,10 +266,7 @@ class AdvancedImageProcessor:
         if max_value <= 0:
             raise InvalidParameterException("Max value must be positive")
         
-        if len(self.current_image.shape) == 3:
-            gray = cv2.cvtColor(self.current_image, cv2.COLOR_BGR2GRAY)
-        else:
-            gray = self.current_image
+        gray = derived_planes.gray(self.current_image)
             
         return cv2.adaptiveThreshold(gray, max_value, adaptive_method, threshold_type, block_size, C)
 
@@ -193,8 +276,23 @@ class AdvancedImageProcessor:
         if iterations <= 0:
             raise InvalidParameterException("Iterations must be positive")
         
-        kernel = cv2.getStructuringElement(kernel_shape, (kernel_size, kernel_size))
-        return cv2.morphologyEx(self.current_image, operation, kernel, iterations=iterations)
+        # Every erosion or dilation widens the support by the kernel radius;
+        # all operations but these two chain two passes per iteration
+        passes = 1 if operation in (cv2.MORPH_ERODE, cv2.MORPH_DILATE) else 2
+        halo = (kernel_size // 2) * iterations * passes
+        
+        # Large rectangles and crosses run as exact 1D passes instead
+        path = decomposition(kernel_shape, kernel_size, iterations, operation, self.current_image.dtype)
+        if path is not None:
+            self._run_metadata = {'path': f'decomposed_{path}'}
+            return self._run_local(
+                lambda image: decomposed_morphology(image, operation, kernel_shape, kernel_size, iterations), halo
+            )
+        
+        kernel = structuring_element(kernel_shape, kernel_size)
+        return self._run_local(
+            lambda image: cv2.morphologyEx(image, operation, kernel, iterations=iterations), halo
+        )
 
     def _apply_custom_filter(self, kernel: np.ndarray, delta: float = 0.0) -> np.ndarray:
         if not isinstance(kernel, np.ndarray):
@@ -202,40 +300,115 @@ class AdvancedImageProcessor:
         if kernel.size == 0:
             raise InvalidParameterException("Kernel cannot be empty")
         
+        # Rank-1 kernels run as two 1D passes, large ones in the frequency domain;
+        # the 'custom' filter config may set its own 'dft_min_area'
+        config = self.filter_configs.get(FilterType.CUSTOM.value) or {}
+        dft_min_area = config.get('dft_min_area', DFT_MIN_KERNEL_AREA)
+        factors = separable_factors(kernel) if kernel.ndim == 2 else None
+        if factors is not None:
+            self._run_metadata = {'path': 'separable'}
+            row, column = factors
+            return cv2.sepFilter2D(self.current_image, -1, row, column, delta=delta)
+        if kernel.ndim == 2 and kernel.size >= dft_min_area and self.current_image.dtype in DFT_DTYPES:
+            self._run_metadata = {'path': 'dft'}
+            return dft_filter2d(self.current_image, kernel, delta)
+        self._run_metadata = {'path': 'direct'}
         return cv2.filter2D(self.current_image, -1, kernel, delta=delta)
 
-    def apply_filter_chain(self, filter_chain: List[Dict[str, Any]]) -> np.ndarray:
+    def apply_filter_chain(self, filter_chain: List[Dict[str, Any]],
+                           on_step: Optional[Callable[[int, np.ndarray], None]] = None,
+                           precision: str = 'uint8') -> np.ndarray:
+        # on_step(index, image) is called with each intermediate result; a fused
+        # run of point-wise filters reports only the index of its last filter.
+        # With precision='float32' intermediates (and on_step images) stay float32
+        # and the result is quantized to uint8 once, after the last filter.
+        if precision not in PRECISIONS:
+            raise InvalidParameterException(f"Precision must be one of {', '.join(PRECISIONS)}")
+        if precision == 'float32' and self.precision == 'uint8':
+            self.precision = 'float32'
+            if self.current_image.dtype != np.float32:
+                self.current_image = derived_planes.float32(self.current_image)
+            try:
+                self.apply_filter_chain(filter_chain, on_step)
+            finally:
+                self.precision = 'uint8'
+                self.current_image = quantize(self.current_image)
+            return self.current_image
+        
+        def flush(run, last_index):
+            if run:
+                self._apply_pointwise_run(run)
+                if on_step is not None:
+                    on_step(last_index, self.current_image)
+        
         try:
-            for filter_config in filter_chain:
+            # Consecutive point-wise filters are fused into a single LUT pass
+            run = []
+            for index, filter_config in enumerate(filter_chain):
                 filter_type = filter_config.get('filter_type')
                 params = filter_config.get('parameters', {})
+                lut = filter_lut(filter_type, params, self.current_image)
+                if lut is not None:
+                    run.append((filter_type, params, lut))
+                    continue
+                flush(run, index - 1)
+                run = []
                 self.apply_filter(filter_type, **params)
+                if on_step is not None:
+                    on_step(index, self.current_image)
+            flush(run, len(filter_chain) - 1)
             return self.current_image
         except Exception as e:
             logger.error(f"Error in filter chain: {str(e)}")
             raise ImageProcessingException(f"Filter chain failed: {str(e)}")
 
+    def _apply_pointwise_run(self, run: List[tuple]) -> None:
+        if len(run) == 1:
+            filter_type, params, _ = run[0]
+            self.apply_filter(filter_type, **params)
+        elif run:
+            start = time.perf_counter()
+            self.current_image = apply_fused(self.current_image, [lut for _, _, lut in run])
+            for filter_type, params, _ in run:
+                if isinstance(filter_type, str):
+                    filter_type = FilterType(filter_type.lower())
+                self.history.append((filter_type, params))
+            self.checkpoints.record(self.history, self.current_image, time.perf_counter() - start)
+
     def reset_to_original(self) -> None:
-        self.current_image = self.original_image.copy()
+        self.current_image = self.original_image
         self.history.clear()
+        self.checkpoints.clear()
 
     def undo_last_filter(self) -> Optional[np.ndarray]:
         if not self.history:
             return None
+        return self.jump_to_step(len(self.history) - 1)
+
+    def jump_to_step(self, step: int) -> np.ndarray:
+        """Return to the state after the first `step` filters, dropping the rest.
+
+        Restores the nearest checkpoint at or before `step` and replays only
+        the filters between it and `step`.
+        """
+        if not isinstance(step, int) or not 0 <= step <= len(self.history):
+            raise InvalidParameterException(f"Step must be between 0 and {len(self.history)}")
         
-        self.history.pop()
-        self.reset_to_original()
+        index, image = self.checkpoints.restore_point(self.history, step)
+        replay = self.history[index:step]
+        del self.history[index:]
+        self.current_image = image
         
-        for filter_type, params in self.history:
+        for filter_type, params in replay:
             self.apply_filter(filter_type, **params)
         
         return self.current_image
 
     def get_current_image(self) -> np.ndarray:
-        return self.current_image.copy()
+        return self.current_image
 
     def get_original_image(self) -> np.ndarray:
-        return self.original_image.copy()
+        return self.original_image
 
     def get_history(self) -> List[tuple]:
         return self.history.copy()
@@ -256,14 +429,37 @@ class AdvancedImageProcessor:
     def get_custom_filter_config(self, filter_name: str) -> Optional[Dict[str, Any]]:
         return self.filter_configs.get(filter_name)
 
-    def batch_process(self, images: List[np.ndarray], filter_chain: List[Dict[str, Any]]) -> List[np.ndarray]:
-        results = []
-        for img in images:
-            try:
-                processor = AdvancedImageProcessor(img)
-                result = processor.apply_filter_chain(filter_chain)
-                results.append(result)
-            except Exception as e:
-                logger.error(f"Error processing image in batch: {str(e)}")
-                raise ImageProcessingException(f"Batch processing failed: {str(e)}")
-        return results
+    def batch_process(self, images: List[np.ndarray], filter_chain: List[Dict[str, Any]],
+                      backend: str = 'thread', max_workers: Optional[int] = None,
+                      max_in_flight: Optional[int] = None, precision: str = 'uint8') -> List[np.ndarray]:
+        # Every image is processed even if some fail; the failures are then raised together
+        results = self.parallel_batch_process(images, filter_chain, backend, max_workers, max_in_flight, precision)
+        failed = [result for result in results if not result.success]
+        if failed:
+            details = '; '.join(f"image {result.index}: {result.error_message}" for result in failed)
+            logger.error(f"Error processing images in batch: {details}")
+            raise ImageProcessingException(f"Batch processing failed for {len(failed)} of {len(results)} images: {details}")
+        return [result.image for result in results]
+
+    def parallel_batch_process(self, images: Iterable[np.ndarray], filter_chain: List[Dict[str, Any]],
+                               backend: str = 'thread', max_workers: Optional[int] = None,
+                               max_in_flight: Optional[int] = None,
+                               precision: str = 'uint8') -> List[ImageBatchResult]:
+        # One ImageBatchResult per image, in input order, with per-image errors.
+        # backend is 'serial', 'thread' or 'process' (images travel through shared memory);
+        # at most max_in_flight images are read ahead of the results returned.
+        if precision not in PRECISIONS:
+            raise InvalidParameterException(f"Precision must be one of {', '.join(PRECISIONS)}")
+        try:
+            return run_image_batch(_apply_chain, images, (filter_chain, precision),
+                                   backend, max_workers, max_in_flight)
+        except ValueError as e:
+            raise InvalidParameterException(str(e))
+
+
+def _apply_chain(image: np.ndarray, filter_chain: List[Dict[str, Any]], precision: str) -> np.ndarray:
+    # Batch worker; module level so the process backend can pickle it. The batch
+    # already runs images in parallel, so per-image strip tiling is turned off.
+    processor = AdvancedImageProcessor(image)
+    processor.set_tiling(False)
+    return processor.apply_filter_chain(filter_chain, precision=precision)
@@ -0,0 +1,126 @@
+from functools import lru_cache
+from typing import Optional
+
+import cv2
+import numpy as np
+
+# طول الخط الذي يصبح عنده التفكيك اللوغاريتمي أسرع من مرشح الصف في OpenCV
+# (قيس على صورة BGR بحجم 2000x1500: 61 متقارب، 201 أسرع بمرتين تقريباً)
+LOG_LINE_MIN_LENGTH = 101
+
+# حجم العنصر المتصالب الذي يصبح عنده تمريرتا الخطين أسرع من المرشح العام
+CROSS_MIN_SIZE = 51
+
+# القيمة المحايدة خارج الصورة لكل نوع بيانات: (للتمدد، للتآكل)
+NEUTRAL_VALUES = {
+    np.dtype(np.uint8): (0, 255),
+    np.dtype(np.float32): (-np.inf, np.inf)
+}
+
+# العمليات المركبة من التآكل والتمدد؛ MORPH_HITMISS تنفذ مباشرة دائماً
+COMPOUND_OPERATIONS = {
+    cv2.MORPH_ERODE, cv2.MORPH_DILATE, cv2.MORPH_OPEN, cv2.MORPH_CLOSE,
+    cv2.MORPH_GRADIENT, cv2.MORPH_TOPHAT, cv2.MORPH_BLACKHAT
+}
+
+
+@lru_cache(maxsize=128)
+def structuring_element(shape: int, size: int) -> np.ndarray:
+    """عنصر هيكلي مربع الحجم مخزن حسب (الشكل، الحجم) وللقراءة فقط"""
+    element = cv2.getStructuringElement(shape, (size, size))
+    element.flags.writeable = False
+    return element
+
+
+def _line(image: np.ndarray, length: int, axis: int, dilate: bool) -> np.ndarray:
+    """
+    تآكل أو تمدد بخط طوله length (مركزه في المنتصف) على محور واحد
+
+    الخطوط الطويلة تفكك لوغاريتمياً: كل خطوة تأخذ القيمة القصوى (أو الدنيا)
+    بين الصورة ونسخة منها مزاحة بمقدار يضاعف الطول المغطى، فتكلفة البكسل
+    تتناسب مع log(length) بدلاً من length. الحشو بقيمة محايدة يطابق حدود
+    cv2.morphologyEx الافتراضية، فالنتيجة مطابقة تماماً.
+    """
+    if length == 1:
+        return image
+    if length < LOG_LINE_MIN_LENGTH:
+        kernel = np.ones((1, length) if axis == 1 else (length, 1), np.uint8)
+        return cv2.dilate(image, kernel) if dilate else cv2.erode(image, kernel)
+
+    neutral = NEUTRAL_VALUES[image.dtype][0 if dilate else 1]
+    combine = cv2.max if dilate else cv2.min
+    before = (length - 1) // 2
+    after = length - 1 - before
+    if axis == 1:
+        padded = cv2.copyMakeBorder(image, 0, 0, before, after, cv2.BORDER_CONSTANT, value=(neutral,) * 4)
+    else:
+        padded = cv2.copyMakeBorder(image, before, after, 0, 0, cv2.BORDER_CONSTANT, value=(neutral,) * 4)
+
+    covered = 1
+    while covered < length:
+        step = min(covered, length - covered)
+        if axis == 1:
+            padded = combine(padded[:, :padded.shape[1] - step], padded[:, step:])
+        else:
+            padded = combine(padded[:padded.shape[0] - step], padded[step:])
+        covered += step
+    return padded
+
+
+def _rect(image: np.ndarray, size: int, iterations: int, dilate: bool) -> np.ndarray:
+    # تكرار التآكل بمستطيل k يكافئ تماماً مستطيلاً واحداً بطول (k - 1) * n + 1
+    length = (size - 1) * iterations + 1
+    return _line(_line(image, length, 1, dilate), length, 0, dilate)
+
+
+def _cross(image: np.ndarray, size: int, iterations: int, dilate: bool) -> np.ndarray:
+    # المتصالب اتحاد خطين، فالنتيجة هي القيمة القصوى (أو الدنيا) لتمريرتي الخطين؛
+    # أما تكرار المتصالب فليس متصالباً أكبر، لذلك تبقى التكرارات متتالية
+    combine = cv2.max if dilate else cv2.min
+    for _ in range(iterations):
+        image = combine(_line(image, size, 1, dilate), _line(image, size, 0, dilate))
+    return image
+
+
+def decomposition(kernel_shape: int, kernel_size: int, iterations: int, operation: int,
+                  dtype: np.dtype) -> Optional[str]:
+    """
+    اسم التفكيك الأسرع المطابق تماماً لـ cv2.morphologyEx، أو None للمسار المباشر
+
+    OpenCV يفكك المستطيل إلى مرشحي صف وعمود ويدمج التكرارات بنفسه، لذلك لا
+    يفكك المستطيل هنا إلا إذا كان الطول المكافئ طويلاً بما يكفي للتفكيك
+    اللوغاريتمي. الشكل البيضاوي لا يتحلل بدقة فينفذ مباشرة.
+    """
+    if operation not in COMPOUND_OPERATIONS or np.dtype(dtype) not in NEUTRAL_VALUES:
+        return None
+    if kernel_shape == cv2.MORPH_RECT and (kernel_size - 1) * iterations + 1 >= LOG_LINE_MIN_LENGTH:
+        return 'rect'
+    if kernel_shape == cv2.MORPH_CROSS and kernel_size >= CROSS_MIN_SIZE:
+        return 'cross'
+    return None
+
+
+def decomposed_morphology(image: np.ndarray, operation: int, kernel_shape: int,
+                          kernel_size: int, iterations: int) -> np.ndarray:
+    """تنفيذ cv2.morphologyEx بتمريرات أحادية البعد حسب decomposition()"""
+    primitive = _rect if kernel_shape == cv2.MORPH_RECT else _cross
+
+    def erode(source):
+        return primitive(source, kernel_size, iterations, False)
+
+    def dilate(source):
+        return primitive(source, kernel_size, iterations, True)
+
+    if operation == cv2.MORPH_ERODE:
+        return erode(image)
+    if operation == cv2.MORPH_DILATE:
+        return dilate(image)
+    if operation == cv2.MORPH_OPEN:
+        return dilate(erode(image))
+    if operation == cv2.MORPH_CLOSE:
+        return erode(dilate(image))
+    if operation == cv2.MORPH_GRADIENT:
+        return cv2.subtract(dilate(image), erode(image))
+    if operation == cv2.MORPH_TOPHAT:
+        return cv2.subtract(image, dilate(erode(image)))
+    return cv2.subtract(erode(dilate(image)), image)
@@ -0,0 +1,196 @@
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .tiling import default_workers
+
+# 'serial' في الخيط الحالي، 'thread' مجمع خيوط (OpenCV يحرر GIL)،
+# 'process' مجمع عمليات تنتقل الصور إليه وتعود عبر الذاكرة المشتركة
+BACKENDS = ('serial', 'thread', 'process')
+
+# عدد الصور قيد المعالجة لكل عامل عندما لا يحدد max_in_flight
+IN_FLIGHT_PER_WORKER = 2
+
+
+@dataclass
+class ImageBatchResult:
+    """نتيجة صورة واحدة من الدفعة"""
+    index: int
+    success: bool
+    image: Optional[np.ndarray]
+    processing_time: float
+    error_message: Optional[str] = None
+
+
+def _to_shared(image: np.ndarray) -> Tuple[SharedMemory, Dict[str, Any]]:
+    block = SharedMemory(create=True, size=max(image.nbytes, 1))
+    np.ndarray(image.shape, image.dtype, buffer=block.buf)[...] = image
+    return block, {'name': block.name, 'shape': image.shape, 'dtype': image.dtype.str}
+
+
+def _from_shared(descriptor: Dict[str, Any]) -> np.ndarray:
+    # نسخة مملوكة ثم تحرير الكتلة التي أنشأها العامل
+    block = SharedMemory(name=descriptor['name'])
+    try:
+        view = np.ndarray(descriptor['shape'], np.dtype(descriptor['dtype']), buffer=block.buf)
+        image = view.copy()
+        del view
+    finally:
+        block.close()
+        block.unlink()
+    return image
+
+
+def _run_one(func: Callable[..., np.ndarray], image: np.ndarray, args: tuple) -> Tuple[Any, float, Optional[str]]:
+    start = time.perf_counter()
+    try:
+        result = func(image, *args)
+    except Exception as e:
+        return None, time.perf_counter() - start, str(e)
+    return result, time.perf_counter() - start, None
+
+
+def _process_worker(func: Callable[..., np.ndarray], args: tuple,
+                    descriptor: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], float, Optional[str]]:
+    """
+    تنفيذ func في عملية عاملة على صورة في الذاكرة المشتركة
+
+    الصورة تقرأ مباشرة من كتلة الأب دون نسخ، والنتيجة تكتب في كتلة جديدة
+    يعيد العامل اسمها فقط ويتولى الأب تحريرها. لا يبقى أي مرجع إلى كتلة
+    الإدخال بعد الإرجاع، وإلا تعذر إغلاقها.
+    """
+    block = SharedMemory(name=descriptor['name'])
+    try:
+        image = np.ndarray(descriptor['shape'], np.dtype(descriptor['dtype']), buffer=block.buf)
+        image.flags.writeable = False
+        result, elapsed, error = _run_one(func, image, args)
+        del image
+        if error is not None:
+            return None, elapsed, error
+        if not isinstance(result, np.ndarray):
+            return None, elapsed, f"Expected an image result, got {type(result).__name__}"
+        output, result_descriptor = _to_shared(result)
+        del result
+        output.close()
+        return result_descriptor, elapsed, None
+    finally:
+        block.close()
+
+
+def iter_image_batch(func: Callable[..., np.ndarray], images: Iterable[np.ndarray], args: tuple = (),
+                     backend: str = 'thread', max_workers: Optional[int] = None,
+                     max_in_flight: Optional[int] = None) -> Iterator[ImageBatchResult]:
+    """
+    تطبيق func(image, *args) على كل صورة وإرجاع النتائج بترتيب الإدخال
+
+    Parameters:
+    -----------
+    func : Callable
+        دالة المعالجة؛ مع backend='process' يجب أن تكون دالة على مستوى
+        الوحدة وأن تكون args قابلة للتسلسل (pickle)
+    images : Iterable[np.ndarray]
+        الصور، وتقرأ تدريجياً فيمكن تمرير مولد
+    backend : str
+        أحد BACKENDS
+    max_workers : int
+        عدد العمال (افتراضياً عدد المعالجات المتاحة)
+    max_in_flight : int
+        أقصى عدد من الصور المقروءة التي لم تعد نتائجها بعد، فالذاكرة
+        المستخدمة محدودة مهما طالت الدفعة
+
+    Returns:
+    --------
+    Iterator[ImageBatchResult]
+        نتيجة لكل صورة؛ فشل صورة لا يوقف بقية الدفعة
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend must be one of {', '.join(BACKENDS)}")
+    workers = max_workers or default_workers()
+    in_flight = max(max_in_flight or workers * IN_FLIGHT_PER_WORKER, 1)
+
+    if backend == 'serial':
+        for index, image in enumerate(images):
+            result, elapsed, error = _run_one(func, image, args)
+            yield _make_result(index, result, elapsed, error)
+        return
+
+    executor_class = ProcessPoolExecutor if backend == 'process' else ThreadPoolExecutor
+    with executor_class(max_workers=workers) as executor:
+        pending: 'deque[Tuple[int, Future, Optional[SharedMemory]]]' = deque()
+        source = enumerate(images)
+        exhausted = False
+        try:
+            while pending or not exhausted:
+                while not exhausted and len(pending) < in_flight:
+                    item = next(source, None)
+                    if item is None:
+                        exhausted = True
+                        break
+                    pending.append(_submit(executor, backend, func, args, *item))
+
+                # انتظار أقدم صورة فقط، فتعاد النتائج بترتيب الإدخال
+                index, future, block = pending.popleft()
+                yield _collect(index, future, block, backend)
+        finally:
+            for _, future, block in pending:
+                future.cancel()
+                if block is not None:
+                    _release(future, block)
+
+
+def run_image_batch(func: Callable[..., np.ndarray], images: Iterable[np.ndarray], args: tuple = (),
+                    backend: str = 'thread', max_workers: Optional[int] = None,
+                    max_in_flight: Optional[int] = None) -> List[ImageBatchResult]:
+    """مثل iter_image_batch لكن تعاد كل النتائج في قائمة"""
+    return list(iter_image_batch(func, images, args, backend, max_workers, max_in_flight))
+
+
+def _submit(executor, backend: str, func: Callable[..., np.ndarray], args: tuple,
+            index: int, image: np.ndarray) -> Tuple[int, Future, Optional[SharedMemory]]:
+    if backend == 'thread':
+        return index, executor.submit(_run_one, func, image, args), None
+    if not isinstance(image, np.ndarray) or image.size == 0:
+        future = Future()
+        future.set_result((None, 0.0, "Image must be a non-empty numpy array"))
+        return index, future, None
+    block, descriptor = _to_shared(image)
+    return index, executor.submit(_process_worker, func, args, descriptor), block
+
+
+def _collect(index: int, future: Future, block: Optional[SharedMemory], backend: str) -> ImageBatchResult:
+    try:
+        result, elapsed, error = future.result()
+    except Exception as e:
+        # تعطل العامل نفسه (مثل فشل التسلسل) يعد فشلاً لهذه الصورة فقط
+        result, elapsed, error = None, 0.0, str(e) or type(e).__name__
+    finally:
+        if block is not None:
+            block.close()
+            block.unlink()
+    if backend == 'process' and result is not None:
+        result = _from_shared(result)
+    return _make_result(index, result, elapsed, error)
+
+
+def _release(future: Future, block: SharedMemory) -> None:
+    # عند إيقاف الدفعة مبكراً: تحرير كتلة الإدخال، وكتلة النتيجة إن اكتملت
+    if not future.cancelled():
+        try:
+            descriptor = future.result()[0]
+            if descriptor is not None:
+                _from_shared(descriptor)
+        except Exception:
+            pass
+    block.close()
+    block.unlink()
+
+
+def _make_result(index: int, result: Any, elapsed: float, error: Optional[str]) -> ImageBatchResult:
+    if error is not None:
+        return ImageBatchResult(index, False, None, elapsed, error)
+    return ImageBatchResult(index, True, result, elapsed)
@@ -0,0 +1,168 @@
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from .shared_buffer import as_result
+
+IDENTITY_TABLE = np.arange(256, dtype=np.uint8)
+
+# أنواع العتبة التي تعتمد على محتوى الصورة ولا يمكن تمثيلها بجدول ثابت
+DATA_DEPENDENT_THRESHOLDS = cv2.THRESH_OTSU | cv2.THRESH_TRIANGLE
+
+
+@lru_cache(maxsize=256)
+def gamma_table(gamma: float) -> np.ndarray:
+    """جدول تصحيح جاما (256 قيمة) بنفس حساب الحلقة الأصلية"""
+    inv_gamma = 1.0 / gamma
+    table = ((np.arange(256) / 255.0) ** inv_gamma * 255).astype(np.uint8)
+    table.flags.writeable = False
+    return table
+
+
+@lru_cache(maxsize=256)
+def threshold_table(thresh: float, maxval: float, threshold_type: int) -> np.ndarray:
+    """جدول العتبة مبني بتطبيق cv2.threshold على جميع القيم الممكنة"""
+    _, table = cv2.threshold(IDENTITY_TABLE, thresh, maxval, threshold_type)
+    table = table.ravel()
+    table.flags.writeable = False
+    return table
+
+
+@lru_cache(maxsize=256)
+def shift_table(value: int) -> np.ndarray:
+    """جدول إضافة قيمة ثابتة (صحيحة أو عشرية ثم تقطع) مع القص إلى [0, 255]"""
+    table = np.clip(np.arange(256, dtype=np.int16) + value, 0, 255).astype(np.uint8)
+    table.flags.writeable = False
+    return table
+
+
+@lru_cache(maxsize=256)
+def scale_table(factor: float) -> np.ndarray:
+    """جدول الضرب بمعامل بدقة float32 كما في multiply_color_channel"""
+    table = np.clip(np.arange(256).astype(np.float32) * factor, 0, 255).astype(np.uint8)
+    table.flags.writeable = False
+    return table
+
+
+def channel_lut(table: np.ndarray, channels: int, channel_index: Optional[int] = None) -> np.ndarray:
+    """
+    توسيع جدول 256 قيمة إلى جدول لكل قناة بشكل (256, channels)
+
+    عند تحديد channel_index يطبق الجدول على تلك القناة فقط وتبقى بقية
+    القنوات دون تغيير.
+    """
+    if channel_index is None:
+        return np.repeat(table[:, None], channels, axis=1)
+    lut = np.repeat(IDENTITY_TABLE[:, None], channels, axis=1)
+    lut[:, channel_index] = table
+    return lut
+
+
+def compose_luts(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """جدول واحد يكافئ تطبيق first ثم second"""
+    return second[first, np.arange(first.shape[1])]
+
+
+def apply_lut(image: np.ndarray, lut: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """تطبيق جدول (256, channels) على الصورة بتمريرة cv2.LUT واحدة، في out إن أعطي"""
+    if image.ndim == 2:
+        return cv2.LUT(image, lut[:, 0], dst=out)
+    return cv2.LUT(image, np.ascontiguousarray(lut).reshape(256, 1, lut.shape[1]), dst=out)
+
+
+def _channels(image: np.ndarray) -> int:
+    return 1 if image.ndim == 2 else image.shape[2]
+
+
+def _bind(parameters: Dict[str, Any], defaults: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """دمج المعاملات مع القيم الافتراضية، أو None إذا وجد معامل غير معروف"""
+    if not set(parameters) <= set(defaults):
+        return None
+    return {**defaults, **parameters}
+
+
+def filter_lut(filter_type: Any, parameters: Dict[str, Any], image: np.ndarray) -> Optional[np.ndarray]:
+    """
+    جدول LUT لمرشح نقطي من AdvancedImageProcessor، أو None
+
+    يعيد None لأي مرشح غير نقطي أو معاملات غير صالحة أو تخطيط قنوات لا
+    يطابق النتيجة الأصلية (مثل العتبة على صورة ملونة التي تحولها إلى رمادية)،
+    فيطبق المرشح حينها بالطريقة العادية بما في ذلك رسائل الخطأ.
+    """
+    if image.dtype != np.uint8:
+        return None
+    name = getattr(filter_type, 'value', filter_type)
+    name = name.lower() if isinstance(name, str) else name
+    channels = _channels(image)
+
+    if name == 'gamma_correction':
+        params = _bind(parameters, {'gamma': 1.0})
+        if params is None or not params['gamma'] > 0:
+            return None
+        return channel_lut(gamma_table(float(params['gamma'])), channels)
+
+    if name == 'threshold':
+        params = _bind(parameters, {'thresh': 127, 'maxval': 255, 'type': cv2.THRESH_BINARY})
+        if params is None or channels != 1 or params['thresh'] < 0 or params['maxval'] < 0:
+            return None
+        if int(params['type']) & DATA_DEPENDENT_THRESHOLDS:
+            return None
+        return channel_lut(threshold_table(float(params['thresh']), float(params['maxval']), int(params['type'])), 1)
+
+    return None
+
+
+def color_lut(operation: str, parameters: Dict[str, Any], image: np.ndarray) -> Optional[np.ndarray]:
+    """
+    جدول LUT لعمليات القنوات اللونية في GeometricTransformation، أو None
+
+    operation هو اسم الدالة: adjust_color_channel أو multiply_color_channel.
+    """
+    from .geometric_transforms import ColorChannel
+
+    if image.dtype != np.uint8:
+        return None
+    channel = parameters.get('channel')
+    if not isinstance(channel, ColorChannel):
+        return None
+    channels = _channels(image)
+    if channel != ColorChannel.ALL and (image.ndim != 3 or channel.value >= channels):
+        return None
+    channel_index = None if channel == ColorChannel.ALL else channel.value
+
+    if operation == 'adjust_color_channel':
+        params = _bind(parameters, {'channel': None, 'value': None})
+        if params is None or params['value'] is None or not -255 <= params['value'] <= 255:
+            return None
+        table = shift_table(params['value'])
+    elif operation == 'multiply_color_channel':
+        params = _bind(parameters, {'channel': None, 'factor': None})
+        if params is None or params['factor'] is None or not params['factor'] > 0:
+            return None
+        table = scale_table(float(params['factor']))
+    else:
+        return None
+
+    return channel_lut(table, channels, channel_index)
+
+
+def fuse(luts: List[np.ndarray]) -> np.ndarray:
+    """تركيب سلسلة من الجداول في جدول واحد"""
+    fused = luts[0]
+    for lut in luts[1:]:
+        fused = compose_luts(fused, lut)
+    return fused
+
+
+def apply_fused(image: np.ndarray, luts: List[np.ndarray], out: Optional[np.ndarray] = None) -> np.ndarray:
+    """تطبيق سلسلة عمليات نقطية متتالية بتمريرة واحدة على الصورة"""
+    return as_result(apply_lut(image, fuse(luts), out))
+
+
+def quantize(image: np.ndarray) -> np.ndarray:
+    """تحويل نتيجة بدقة float32 إلى uint8 بالتقريب والقص، مرة واحدة عند الإخراج"""
+    if image.dtype == np.uint8:
+        return image
+    return as_result(np.clip(np.rint(image), 0, 255).astype(np.uint8))
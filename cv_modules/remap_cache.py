@@ -0,0 +1,228 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# بناء جداول المنظور يكلف نحو ثلاثة أضعاف تنفيذ warpPerspective مرة واحدة،
+# لذلك لا تبنى إلا عند تكرار نفس التحويل؛ جداول الإحداثيات القطبية تبنى
+# داخل cv2.warpPolar في كل استدعاء أصلاً فتخزن من أول مرة
+PERSPECTIVE_MIN_USES = 2
+POLAR_MIN_USES = 1
+
+# عدد المفاتيح التي يتذكر عدد مرات طلبها قبل بناء جداولها
+MAX_TRACKED_KEYS = 1024
+
+# جداول الإزاحة الثابتة في OpenCV: 5 بتات للجزء الكسري من كل إحداثي
+INTER_BITS = 5
+INTER_TAB_SIZE = 1 << INTER_BITS
+
+# حجم الكتلة التي يجمع عليها warpPerspective الإحداثيات (BLOCK_SZ * BLOCK_SZ / 16)
+PERSPECTIVE_BLOCK_AREA = 1024
+PERSPECTIVE_BLOCK_ROWS = 16
+
+
+class RemapCache:
+    """
+    ذاكرة مشتركة لجداول remap الثابتة (بصيغة cv2.convertMaps) حسب التحويل
+
+    التحويل المتكرر على صور بنفس الحجم (مثل تصحيح إطارات فيديو) يصبح
+    استدعاء cv2.remap واحداً دون أي حساب للإحداثيات. الجداول للقراءة فقط،
+    وتحذف الأقل استخداماً عند تجاوز max_bytes.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[Hashable, Tuple[np.ndarray, Optional[np.ndarray]]]' = OrderedDict()
+        self._uses: 'OrderedDict[Hashable, int]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._current_bytes = 0
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: Hashable, build: Callable[[], Tuple[np.ndarray, Optional[np.ndarray]]],
+            min_uses: int = 1) -> Optional[Tuple[np.ndarray, Optional[np.ndarray]]]:
+        """الجداول المخزنة للمفتاح، أو بناؤها عند الطلب رقم min_uses، وإلا None"""
+        with self._lock:
+            maps = self._entries.get(key)
+            if maps is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return maps
+            self._misses += 1
+            uses = self._uses.pop(key, 0) + 1
+            if uses < min_uses:
+                self._uses[key] = uses
+                while len(self._uses) > MAX_TRACKED_KEYS:
+                    self._uses.popitem(last=False)
+                return None
+
+        maps = tuple(None if table is None else _readonly(table) for table in build())
+        size = sum(table.nbytes for table in maps if table is not None)
+        with self._lock:
+            if key not in self._entries and size <= self.max_bytes:
+                self._entries[key] = maps
+                self._current_bytes += size
+                self._enforce_budget()
+        return maps
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._uses.clear()
+            self._current_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'current_bytes': self._current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses
+            }
+
+    def _enforce_budget(self) -> None:
+        while self._entries and self._current_bytes > self.max_bytes:
+            _, maps = self._entries.popitem(last=False)
+            self._current_bytes -= sum(table.nbytes for table in maps if table is not None)
+
+
+def _readonly(table: np.ndarray) -> np.ndarray:
+    table.flags.writeable = False
+    return table
+
+
+def perspective_maps(matrix: np.ndarray, dsize: Tuple[int, int],
+                     nearest: bool) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    جداول remap الثابتة المطابقة تماماً لما يحسبه cv2.warpPerspective داخلياً
+
+    يعكس المصفوفة بنفس طريقة OpenCV، ويجمع الإحداثيات بنفس الترتيب على
+    كتل أعمدتها 64 (حتى يطابق التقريب بتاً ببت)، ثم يقربها إلى 1/32 بكسل.
+    """
+    inverse = cv2.invert(np.float64(matrix), flags=cv2.DECOMP_LU)[1]
+    cols, rows = dsize
+    x = np.arange(cols, dtype=np.float64)[None]
+    y = np.arange(rows, dtype=np.float64)[:, None]
+    block = min(PERSPECTIVE_BLOCK_AREA // min(PERSPECTIVE_BLOCK_ROWS, rows), cols)
+    x_block = (x // block) * block
+    x = x - x_block
+
+    X0 = inverse[0, 0] * x_block + inverse[0, 1] * y + inverse[0, 2]
+    Y0 = inverse[1, 0] * x_block + inverse[1, 1] * y + inverse[1, 2]
+    W0 = inverse[2, 0] * x_block + inverse[2, 1] * y + inverse[2, 2]
+    W = W0 + inverse[2, 0] * x
+    scale = 1 if nearest else INTER_TAB_SIZE
+    with np.errstate(divide='ignore'):
+        W = np.where(W != 0, scale / W, 0)
+    limit = np.iinfo(np.int32)
+    X = np.rint(np.clip((X0 + inverse[0, 0] * x) * W, limit.min, limit.max)).astype(np.int64)
+    Y = np.rint(np.clip((Y0 + inverse[1, 0] * x) * W, limit.min, limit.max)).astype(np.int64)
+
+    if nearest:
+        return np.dstack([np.clip(X, -32768, 32767), np.clip(Y, -32768, 32767)]).astype(np.int16), None
+    xy = np.dstack([np.clip(X >> INTER_BITS, -32768, 32767), np.clip(Y >> INTER_BITS, -32768, 32767)])
+    fraction = (Y & (INTER_TAB_SIZE - 1)) * INTER_TAB_SIZE + (X & (INTER_TAB_SIZE - 1))
+    return xy.astype(np.int16), fraction.astype(np.uint16)
+
+
+def polar_dsize(max_radius: float, dsize: Optional[Tuple[int, int]]) -> Tuple[int, int]:
+    # نفس الحجم الافتراضي في cv2.warpPolar
+    if dsize is None or (dsize[0] <= 0 and dsize[1] <= 0):
+        return int(np.rint(max_radius)), int(np.rint(max_radius * np.pi))
+    if dsize[1] <= 0:
+        return int(dsize[0]), int(np.rint(dsize[0] * np.pi))
+    return int(dsize[0]), int(dsize[1])
+
+
+def polar_maps(source_size: Tuple[int, int], center: Tuple[float, float], max_radius: float,
+               dsize: Tuple[int, int], log_polar: bool, inverse: bool,
+               nearest: bool) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    جداول remap الثابتة لـ cv2.warpPolar بنفس حساباتها
+
+    في الاتجاه العكسي (من الإحداثيات القطبية إلى الديكارتية) تشير الجداول
+    إلى الصورة بعد إضافة صف ملتف أعلاها وأسفلها، كما يفعل OpenCV.
+    """
+    cx, cy = np.float32(center[0]), np.float32(center[1])
+    cols, rows = dsize
+    if not inverse:
+        k_angle = 2 * np.pi / rows
+        if log_polar:
+            k_mag = np.log(max_radius) / cols
+            rhos = (np.exp(np.arange(cols) * k_mag) - 1.0).astype(np.float32)
+        else:
+            k_mag = max_radius / cols
+            rhos = (np.arange(cols) * k_mag).astype(np.float32)
+        angles = k_angle * np.arange(rows)[:, None]
+        map_x = (rhos.astype(np.float64) * np.cos(angles) + np.float64(cx)).astype(np.float32)
+        map_y = (rhos.astype(np.float64) * np.sin(angles) + np.float64(cy)).astype(np.float32)
+    else:
+        source_cols, source_rows = source_size
+        k_angle = 2 * np.pi / source_rows
+        k_mag = (np.log(max_radius) if log_polar else max_radius) / source_cols
+        x = np.broadcast_to(np.arange(cols, dtype=np.float32)[None] - cx, (rows, cols))
+        y = np.broadcast_to(np.arange(rows, dtype=np.float32)[:, None] - cy, (rows, cols))
+        magnitude, angle = cv2.cartToPolar(np.ascontiguousarray(x), np.ascontiguousarray(y))
+        if log_polar:
+            magnitude = cv2.log(magnitude + np.float32(1))
+        map_x = (magnitude.astype(np.float64) / k_mag).astype(np.float32)
+        map_y = (angle.astype(np.float64) / k_angle).astype(np.float32) + np.float32(1)
+
+    if nearest:
+        return cv2.convertMaps(map_x, map_y, cv2.CV_16SC2, nninterpolation=True)[0], None
+    return cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+
+
+def _remap(image: np.ndarray, maps: Tuple[np.ndarray, Optional[np.ndarray]], interpolation: int,
+           border_mode: int, border_value) -> np.ndarray:
+    map1, map2 = maps
+    return cv2.remap(image, map1, map2, interpolation, borderMode=border_mode, borderValue=border_value)
+
+
+def remap_perspective(image: np.ndarray, matrix: np.ndarray, dsize: Tuple[int, int],
+                     interpolation: int = cv2.INTER_LINEAR, border_mode: int = cv2.BORDER_CONSTANT,
+                     border_value=0, min_uses: int = PERSPECTIVE_MIN_USES) -> np.ndarray:
+    """
+    cv2.warpPerspective بجداول remap مخزنة عند تكرار نفس المصفوفة والحجم والاستيفاء
+
+    min_uses=1 يبني الجداول من أول استدعاء، عندما يعرف مسبقاً أن التحويل
+    سيتكرر (مثل تطبيق نفس الوصفة على سلسلة صور).
+    """
+    matrix = np.float64(matrix)
+    nearest = interpolation == cv2.INTER_NEAREST
+    key = ('perspective', matrix.tobytes(), tuple(dsize), nearest)
+    maps = remap_cache.get(key, lambda: perspective_maps(matrix, dsize, nearest), min_uses)
+    if maps is None:
+        return cv2.warpPerspective(image, matrix, tuple(dsize), flags=interpolation,
+                                   borderMode=border_mode, borderValue=border_value)
+    return _remap(image, maps, interpolation, border_mode, border_value)
+
+
+def remap_polar(image: np.ndarray, center: Tuple[float, float], max_radius: float,
+               dsize: Optional[Tuple[int, int]] = None, log_polar: bool = False, inverse: bool = False,
+               interpolation: int = cv2.INTER_LINEAR) -> np.ndarray:
+    """
+    cv2.warpPolar مع WARP_FILL_OUTLIERS (ما يقع خارج الصورة يملأ بالصفر)
+    بجداول remap مخزنة حسب الحجم والمركز ونصف القطر
+    """
+    dsize = polar_dsize(max_radius, dsize)
+    source_size = (image.shape[1], image.shape[0])
+    nearest = interpolation == cv2.INTER_NEAREST
+    key = ('polar', source_size, (float(center[0]), float(center[1])), float(max_radius),
+           dsize, log_polar, inverse, nearest)
+    maps = remap_cache.get(
+        key, lambda: polar_maps(source_size, center, max_radius, dsize, log_polar, inverse, nearest),
+        POLAR_MIN_USES
+    )
+    if inverse:
+        # الزاوية دورية: صف ملتف من كل جهة حتى تستوفى الزاويتان 0 و 2π معاً
+        image = cv2.copyMakeBorder(image, 1, 1, 0, 0, cv2.BORDER_WRAP)
+    return _remap(image, maps, interpolation, cv2.BORDER_CONSTANT, 0)
+
+
+remap_cache = RemapCache()
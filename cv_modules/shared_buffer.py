@@ -0,0 +1,153 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_POOL_BYTES = 128 * 1024 * 1024
+
+
+def as_readonly(image: np.ndarray) -> np.ndarray:
+    """
+    إرجاع عرض للقراءة فقط يشارك ذاكرة الصورة دون نسخها
+
+    جميع المعالجات تحتفظ بالصورة الأصلية والنتائج بهذا الشكل، لذلك يمكن
+    مشاركة نفس المخزن بين عدة معالجات بأمان. أي عملية تنتج نتيجة جديدة
+    تقوم بحجز مصفوفة جديدة بدلاً من تعديل المخزن المشترك.
+    """
+    if not image.flags.writeable:
+        return image
+    view = image.view()
+    view.flags.writeable = False
+    return view
+
+
+def freeze(image: np.ndarray) -> np.ndarray:
+    """
+    منع تعديل المخزن نفسه (وليس عرضاً منه فقط)
+
+    تستخدم عند امتلاك المصفوفة بالكامل، مثل الصورة المفكوكة عند الرفع،
+    بحيث لا يبقى أي مرجع قابل للكتابة إلى الصورة الأصلية المشتركة.
+    """
+    if image.flags.writeable:
+        image.flags.writeable = False
+    return image
+
+
+def as_result(image: np.ndarray) -> np.ndarray:
+    """
+    نتيجة عملية للقراءة فقط
+
+    المصفوفة الجديدة التي تملك ذاكرتها (مخرجات OpenCV و numpy) لا يشير إليها
+    أحد غير المعالج، فتجمد نفسها؛ أما العرض على مخزن آخر فيعاد كعرض للقراءة
+    فقط لأن المخزن قد يكون صورة المستخدم. بذلك يعرف derived_planes أن محتوى
+    المخزن ثابت ويمكن تخزين مستوياته.
+    """
+    if image.base is None:
+        return freeze(image)
+    return as_readonly(image)
+
+
+def roi_of(view: np.ndarray, parent: np.ndarray):
+    """
+    موضع view داخل مخزن parent كمستطيل (x, y, width, height)
+
+    يعيد None إذا لم يكن view نافذة مستطيلة على نفس المخزن بنفس الخطوات
+    (مثل نتيجة عملية جديدة أو صورة مقلوبة)، فيعامل حينها كصورة مستقلة.
+    """
+    if view.dtype != parent.dtype or view.ndim != parent.ndim or parent.ndim < 2:
+        return None
+    if view.strides != parent.strides or view.shape[2:] != parent.shape[2:]:
+        return None
+    row_step, pixel_step = parent.strides[:2]
+    if row_step <= 0 or pixel_step <= 0:
+        return None
+    offset = view.__array_interface__['data'][0] - parent.__array_interface__['data'][0]
+    if offset < 0:
+        return None
+    y, remainder = divmod(offset, row_step)
+    x, remainder = divmod(remainder, pixel_step)
+    height, width = view.shape[:2]
+    if remainder or x + width > parent.shape[1] or y + height > parent.shape[0]:
+        return None
+    return int(x), int(y), int(width), int(height)
+
+
+class OutputBuffers:
+    """
+    مخازن إخراج يعاد استخدامها بين الاستدعاءات للعمليات ذات الناتج بنفس الأبعاد
+
+    النتائج للقراءة فقط وتشاركها نقاط الاستعادة وذاكرة النتائج والمعالجات
+    الأخرى، لذلك لا يعاد مخزن إلا إذا لم يبق أي مرجع إليه خارج المجمع (ولا
+    عرض عليه). عندها يستدعى on_reuse (لحذف مستوياته المشتقة) ويفتح للكتابة.
+    إعادة الاستخدام توفر حجز الذاكرة وأخطاء الصفحات لصورة كاملة في كل استدعاء.
+
+    المجمع يحتفظ بمخازن حتى max_bytes، ويحذف غير المستخدم منها من الأبعاد
+    الأقدم استخداماً عند الحاجة؛ ما يتجاوز الحد يحجز عادياً دون تتبع.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_POOL_BYTES,
+                 on_reuse: Optional[Callable[[np.ndarray], None]] = None):
+        self.max_bytes = max_bytes
+        self.on_reuse = on_reuse
+        self._buffers: 'OrderedDict[Tuple, list]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._current_bytes = 0
+        self._reused = 0
+        self._allocated = 0
+
+    def empty(self, shape: Tuple[int, ...], dtype) -> np.ndarray:
+        """مخزن قابل للكتابة بالأبعاد المطلوبة، محتواه غير محدد"""
+        key = (tuple(shape), np.dtype(dtype).str)
+        with self._lock:
+            buffers = self._buffers.get(key)
+            if buffers is not None:
+                self._buffers.move_to_end(key)
+                for buffer in buffers:
+                    # مراجع القائمة ومتغير الحلقة ومعامل getrefcount فقط
+                    if sys.getrefcount(buffer) == 3:
+                        break
+                else:
+                    buffer = None
+                if buffer is not None:
+                    self._reused += 1
+                    if self.on_reuse is not None:
+                        self.on_reuse(buffer)
+                    buffer.flags.writeable = True
+                    return buffer
+
+            buffer = np.empty(shape, dtype)
+            self._allocated += 1
+            self._trim(buffer.nbytes)
+            if self._current_bytes + buffer.nbytes <= self.max_bytes:
+                self._buffers.setdefault(key, []).append(buffer)
+                self._current_bytes += buffer.nbytes
+            return buffer
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'buffers': sum(len(buffers) for buffers in self._buffers.values()),
+                'current_bytes': self._current_bytes,
+                'max_bytes': self.max_bytes,
+                'reused': self._reused,
+                'allocated': self._allocated
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buffers.clear()
+            self._current_bytes = 0
+
+    def _trim(self, needed: int) -> None:
+        # حذف المخازن غير المستخدمة من الأبعاد الأقدم حتى يتسع مخزن جديد
+        for key in list(self._buffers):
+            if self._current_bytes + needed <= self.max_bytes:
+                return
+            buffers = self._buffers[key]
+            for index in reversed(range(len(buffers))):
+                if sys.getrefcount(buffers[index]) == 2:
+                    self._current_bytes -= buffers.pop(index).nbytes
+            if not buffers:
+                del self._buffers[key]
@@ -0,0 +1,65 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+# الصور الأصغر من هذا تعالج مباشرة؛ كلفة التقسيم لا تستحق
+TILED_MIN_PIXELS = 4_000_000
+
+# أقل ارتفاع لشريحة بالنسبة لحجم الهامش، حتى لا يطغى الهامش المكرر على العمل
+MIN_STRIP_TO_HALO = 4
+
+
+def default_workers() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def strip_bounds(rows: int, strips: int, halo: int) -> List[Tuple[int, int, int, int]]:
+    """
+    حدود الشرائح الأفقية: (top, bottom, source_top, source_bottom)
+
+    كل شريحة تقرأ من source_top إلى source_bottom، أي صفوفها مع هامش halo
+    من كل جهة داخل حدود الصورة، وتكتب الصفوف من top إلى bottom فقط.
+    """
+    edges = np.linspace(0, rows, strips + 1).astype(int)
+    return [
+        (int(top), int(bottom), max(0, int(top) - halo), min(rows, int(bottom) + halo))
+        for top, bottom in zip(edges[:-1], edges[1:])
+    ]
+
+
+def run_tiled(func: Callable[[np.ndarray], np.ndarray], image: np.ndarray, halo: int,
+              max_workers: Optional[int] = None) -> np.ndarray:
+    """
+    تطبيق func على شرائح أفقية من الصورة بالتوازي ثم تجميع النتيجة
+
+    func يجب أن تكون عملية محلية لا يتأثر ناتج أي بكسل فيها إلا بالبكسلات
+    ضمن مسافة halo صفاً منه، فتكون النتيجة المجمعة مطابقة تماماً للتطبيق
+    على الصورة كاملة: حواف الصورة الحقيقية تبقى حواف الشرائح الطرفية، وأما
+    الحواف المصطنعة بين الشرائح فتقع داخل الهامش الذي يهمل. دوال OpenCV
+    تحرر GIL أثناء التنفيذ، لذلك يكفي مجمع خيوط.
+    """
+    workers = max_workers or default_workers()
+    rows = image.shape[0]
+    strips = min(workers, rows // max(MIN_STRIP_TO_HALO * halo, 1))
+    if strips < 2:
+        return func(image)
+
+    bounds = strip_bounds(rows, strips, halo)
+    output = None
+
+    def process(bound):
+        top, bottom, source_top, source_bottom = bound
+        result = func(image[source_top:source_bottom])
+        return top, result[top - source_top:bottom - source_top]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for top, strip in executor.map(process, bounds):
+            if output is None:
+                output = np.empty((rows,) + strip.shape[1:], dtype=strip.dtype)
+            output[top:top + strip.shape[0]] = strip
+    return output
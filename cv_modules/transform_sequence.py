@@ -0,0 +1,236 @@
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .composed_warp import warp_image
+from .geometric_transforms import GeometricTransformation
+from .parallel_batch import ImageBatchResult, iter_image_batch
+from .pointwise import apply_lut, color_lut, compose_luts
+from .shared_buffer import as_readonly, as_result
+
+
+@dataclass
+class WarpStage:
+    """تحويلات هندسية متتالية مدمجة في مصفوفة واحدة، مع قناع اللوحات الوسيطة محسوباً مسبقاً"""
+    matrix: np.ndarray
+    size: Tuple[int, int]
+    interpolation: Optional[int]
+    border_value: Optional[Tuple]
+    mask: Optional[np.ndarray]
+    steps: int
+
+    name = 'warp'
+
+    def apply(self, image: np.ndarray) -> np.ndarray:
+        # الجداول تبنى من أول صورة في كل عملية ثم تؤخذ من remap_cache
+        return warp_image(image, self.matrix, self.size, self.interpolation, self.border_value,
+                          self.mask, min_uses=1)
+
+
+@dataclass
+class LutStage:
+    """عمليات ضبط ألوان متتالية مركبة في جدول واحد"""
+    lut: np.ndarray
+    steps: int
+
+    name = 'lut'
+
+    def apply(self, image: np.ndarray) -> np.ndarray:
+        return apply_lut(image, self.lut)
+
+
+@dataclass
+class ReplayStage:
+    """خطوات لا يمكن دمجها (مثل INTER_AREA أو warp_polar) تنفذ كما هي على كل صورة"""
+    transform_chain: List[Dict[str, Any]]
+
+    name = 'replay'
+
+    @property
+    def steps(self) -> int:
+        return len(self.transform_chain)
+
+    def apply(self, image: np.ndarray) -> np.ndarray:
+        transformer = GeometricTransformation(image)
+        return transformer.apply_transformation_chain(self.transform_chain).current_image
+
+
+@dataclass
+class SequenceStats:
+    """أرقام الإنتاجية لتشغيل سلسلة صور"""
+    images: int
+    failed: int
+    compile_time: float
+    elapsed: float
+    images_per_second: float
+    megapixels_per_second: float
+    stages: List[str] = field(default_factory=list)
+
+
+@dataclass
+class SequenceResult:
+    results: List[ImageBatchResult]
+    stats: SequenceStats
+
+
+class _PlanRecorder(GeometricTransformation):
+    """
+    تنفيذ الوصفة على صورة قالب في الوضع المؤجل مع تسجيل كل warp مدمج كمرحلة
+
+    لا تحفظ لقطات، فالقالب يستخدم للتحقق وتجهيز المراحل فقط.
+    """
+
+    def __init__(self, template: np.ndarray, stages: list):
+        super().__init__(template)
+        self.stages = stages
+        self.set_deferred(True)
+
+    def _materialize(self):
+        pending = self._pending
+        self._pending = None
+        stage = WarpStage(pending.matrix, pending.size, pending.interpolation,
+                          pending.border_value, pending._canvas_mask(), pending.steps)
+        self.stages.append(stage)
+        # تنفيذ المرحلة على القالب يبني جداول remap قبل توزيع الصور على العمال
+        self._current_image = as_result(stage.apply(pending.source))
+
+    def _checkpoint(self, start):
+        pass
+
+
+class TransformSequence:
+    """
+    وصفة تحويلات هندسية واحدة مجهزة لتطبيقها على آلاف الصور بنفس الأبعاد
+
+    تتحقق الوصفة وتجهز مرة واحدة عند الإنشاء: التحويلات المصفوفية المتتالية
+    تدمج في مصفوفة واحدة مع قناعها وجداول remap الخاصة بها، وعمليات ضبط
+    الألوان المتتالية في جدول LUT واحد. ما لا يمكن دمجه يعاد تنفيذه على كل
+    صورة. النتائج مطابقة لـ apply_transformation_chain بالوضع المؤجل، وللتنفيذ
+    المتتالي في القص والقلب والإزاحات الصحيحة وضبط الألوان؛ التحويلات
+    المستوفاة تختلف عنه بفروق التقريب فقط، وما صار حدوداً يبقى حدوداً.
+    """
+
+    def __init__(self, transform_chain: List[Dict[str, Any]], shape: Tuple[int, ...], dtype=np.uint8):
+        """
+        Parameters:
+        -----------
+        transform_chain : list
+            عناصر بالشكل {'transformation_type': ..., 'parameters': {...}}
+        shape : tuple
+            أبعاد كل صور السلسلة (rows, cols) أو (rows, cols, channels)
+        dtype : numpy dtype
+            نوع بكسلات الصور
+
+        Raises:
+        -------
+        ValueError
+            إذا كانت الوصفة غير صالحة لهذه الأبعاد، مع رقم الخطوة
+        """
+        if len(shape) not in (2, 3) or min(shape) <= 0:
+            raise ValueError("أبعاد الصور يجب أن تكون (rows, cols) أو (rows, cols, channels)")
+        start = time.perf_counter()
+        self.transform_chain = list(transform_chain)
+        self.shape = tuple(int(dim) for dim in shape)
+        self.dtype = np.dtype(dtype)
+        self.stages: list = []
+        self.output_shape = self._compile()
+        self.compile_time = time.perf_counter() - start
+
+    def _compile(self) -> Tuple[int, ...]:
+        recorder = _PlanRecorder(np.zeros(self.shape, self.dtype), self.stages)
+        for index, step in enumerate(self.transform_chain):
+            try:
+                if self._add_lut(recorder, step):
+                    continue
+                recorder.apply_transformation_chain([step])
+            except Exception as e:
+                raise ValueError(f"الخطوة {index} غير صالحة: {str(e)}")
+            # الخطوة نفذت مباشرة ولم تدمج مع ما قبلها
+            if recorder._pending is None:
+                self._add_replay(step)
+        return recorder.current_image.shape
+
+    def _add_lut(self, recorder: _PlanRecorder, step: Dict[str, Any]) -> bool:
+        if step.get('transformation_type') != 'color_adjustment':
+            return False
+        probe = np.zeros((1, 1) + self.shape[2:], self.dtype)
+        lut = color_lut('adjust_color_channel', step.get('parameters', {}), probe)
+        if lut is None:
+            return False
+        # الجدول يطبق بعد التحويلات المعلقة، فتسجل كمرحلة قبله
+        if recorder._pending is not None:
+            recorder._materialize()
+        previous = self.stages[-1] if self.stages else None
+        if isinstance(previous, LutStage):
+            self.stages[-1] = LutStage(compose_luts(previous.lut, lut), previous.steps + 1)
+        else:
+            self.stages.append(LutStage(lut, 1))
+        return True
+
+    def _add_replay(self, step: Dict[str, Any]) -> None:
+        previous = self.stages[-1] if self.stages else None
+        if isinstance(previous, ReplayStage):
+            previous.transform_chain.append(step)
+        else:
+            self.stages.append(ReplayStage([step]))
+
+    def apply(self, image: np.ndarray) -> np.ndarray:
+        """تطبيق الوصفة على صورة واحدة بنفس أبعاد السلسلة"""
+        if not isinstance(image, np.ndarray):
+            raise TypeError(f"نوع الصورة يجب أن يكون numpy.ndarray، لكن تم إدخال: {type(image)}")
+        if image.shape != self.shape or image.dtype != self.dtype:
+            raise ValueError(f"أبعاد الصورة {image.shape} ({image.dtype}) لا تطابق أبعاد السلسلة "
+                             f"{self.shape} ({self.dtype})")
+        result = as_readonly(image)
+        for stage in self.stages:
+            result = stage.apply(result)
+        # القص وحده يعيد نافذة على صورة الإدخال؛ تنسخ حتى لا تبقى الصورة كاملة في الذاكرة
+        if np.may_share_memory(result, image):
+            result = result.copy()
+        return as_result(result)
+
+    def iter_apply(self, images: Iterable[np.ndarray], backend: str = 'thread', max_workers: Optional[int] = None,
+                   max_in_flight: Optional[int] = None) -> Iterator[ImageBatchResult]:
+        """
+        تطبيق الوصفة على سلسلة صور وإرجاع النتائج تدريجياً بترتيب الإدخال
+
+        الصور تقرأ من images عند الحاجة ولا يتجاوز عدد الصور قيد المعالجة
+        max_in_flight، فالذاكرة محدودة مهما طالت السلسلة إذا استهلكت النتائج
+        أولاً بأول. backend أحد parallel_batch.BACKENDS.
+        """
+        return iter_image_batch(_apply_sequence, images, (self,), backend, max_workers, max_in_flight)
+
+    def run(self, images: Iterable[np.ndarray], backend: str = 'thread', max_workers: Optional[int] = None,
+            max_in_flight: Optional[int] = None) -> SequenceResult:
+        """
+        مثل iter_apply لكن تعاد كل النتائج مع أرقام الإنتاجية
+
+        Returns:
+        --------
+        SequenceResult
+            نتيجة لكل صورة (فشل صورة لا يوقف السلسلة) و SequenceStats
+        """
+        start = time.perf_counter()
+        results = list(self.iter_apply(images, backend, max_workers, max_in_flight))
+        elapsed = time.perf_counter() - start
+        return SequenceResult(results, self._stats(results, elapsed))
+
+    def _stats(self, results: List[ImageBatchResult], elapsed: float) -> SequenceStats:
+        done = sum(result.success for result in results)
+        megapixels = done * self.shape[0] * self.shape[1] / 1e6
+        return SequenceStats(
+            images=len(results),
+            failed=len(results) - done,
+            compile_time=self.compile_time,
+            elapsed=elapsed,
+            images_per_second=done / elapsed if elapsed > 0 else 0.0,
+            megapixels_per_second=megapixels / elapsed if elapsed > 0 else 0.0,
+            stages=[stage.name for stage in self.stages]
+        )
+
+
+def _apply_sequence(image: np.ndarray, sequence: TransformSequence) -> np.ndarray:
+    # عامل الدفعة؛ على مستوى الوحدة حتى يمكن تسلسله مع backend='process'
+    return sequence.apply(image)
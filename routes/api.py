@@ -1,4 +1,5 @@
 import os
+import copy
 import cv2
 import numpy as np
 import base64
@@ -7,21 +8,511 @@ from werkzeug.utils import secure_filename
 from PIL import Image
 import io
 import logging
+import uuid
 
 from cv_modules.feature_extraction import AdvancedFeatureExtractor, FeatureType
-from cv_modules.image_filters import AdvancedImageProcessor, FilterType
+from cv_modules.image_filters import AdvancedImageProcessor, FilterType, HistoryEntry, PRECISIONS
 from cv_modules.feature_matching import FeatureMatching, MatchingMethod
 from cv_modules.geometric_transforms import GeometricTransformation, GeometricTransformationType, ColorChannel
 from cv_modules.batch_processor import BatchProcessor, ComparisonProcessor
-from utils.image_utils import allowed_file, save_image, load_image, image_to_base64, base64_to_image
+from cv_modules.shared_buffer import freeze, roi_of
+from utils.image_utils import allowed_file, save_image, load_image, base64_to_image, content_hash, browser_mime_type, encode_stats, ENCODE_PRESETS, IMAGE_FORMATS, resize_image
+from utils.responses import EncodedImage, COMPACT_FLOAT_DTYPES, encoded_image, feature_payload, image_response, response_output_options
+from utils.session_store import SessionStore
+from utils.session_backend import MemoryBackend, create_backend
+from utils.result_cache import result_cache, operation_key
 
 api_bp = Blueprint('api', __name__)
 logger = logging.getLogger(__name__)
 
-# Global variables to store processors
-processors = {}
-matchers = {}
-batch_processors = {}
+# Image sessions and matchers share one memory-budgeted LRU store
+sessions = SessionStore()
+
+# Cross-worker state; the in-memory backend keeps sessions in this worker only
+backend = MemoryBackend()
+
+# Which session plane each processor's current image is published as
+SESSION_PLANES = {
+    'filter': 'image_processor',
+    'transform': 'geometric_transformer',
+    'batch': 'batch_processor'
+}
+
+# Where each cached plane's processor keeps its history
+HISTORY_ATTRS = {
+    'filter': 'history',
+    'transform': 'transformation_history'
+}
+
+# Transformation parameters measured in pixels, scaled onto the preview proxy
+PIXEL_PARAMETERS = {
+    'translation': ('tx', 'ty'),
+    'rotation': ('center',),
+    'affine': ('src_points', 'dst_points'),
+    'perspective': ('src_points', 'dst_points'),
+    'crop': ('x', 'y', 'width', 'height'),
+    'resize': ('width', 'height'),
+    'warp_polar': ('center', 'max_radius', 'dsize')
+}
+
+@api_bp.record_once
+def configure_sessions(state):
+    """Apply the app's session budget, TTL and backend to the store"""
+    global backend
+    sessions.configure(
+        max_bytes=state.app.config.get('SESSION_MAX_BYTES'),
+        ttl_seconds=state.app.config.get('SESSION_TTL_SECONDS')
+    )
+    backend = create_backend(
+        state.app.config.get('SESSION_BACKEND'),
+        state.app.config.get('SESSION_SHARED_DIR')
+    )
+    result_cache.configure(max_bytes=state.app.config.get('RESULT_CACHE_MAX_BYTES'))
+
+@api_bp.before_request
+def validate_output_options():
+    """Reject invalid output options before any image is processed"""
+    try:
+        response_output_options()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+def new_session_id(prefix):
+    """Generate an id that stays unique after evictions"""
+    return f"{prefix}_{uuid.uuid4().hex[:12]}"
+
+def build_session(image, content_key=None):
+    """Create the processors for one upload around a shared image buffer"""
+    return {
+        'feature_extractor': AdvancedFeatureExtractor(image),
+        'image_processor': AdvancedImageProcessor(image),
+        'geometric_transformer': GeometricTransformation(image),
+        'batch_processor': BatchProcessor(image),
+        'original_image': image,
+        'version': 0,
+        # Result cache key of each plane's current state; the root is the upload's hash
+        'content_key': content_key,
+        'result_keys': {plane: content_key for plane in HISTORY_ATTRS},
+        # Preview edits not yet applied at full resolution, and their proxies
+        'pending': {plane: [] for plane in HISTORY_ATTRS},
+        'previews': {}
+    }
+
+def apply_filter_operation(processor, filter_type, parameters):
+    processor.apply_filter(filter_type, **parameters)
+
+def parse_transform_parameters(parameters):
+    """Copy of request parameters with string channels converted to ColorChannel"""
+    parameters = dict(parameters)
+    if 'channel' in parameters and isinstance(parameters['channel'], str):
+        parameters['channel'] = ColorChannel[parameters['channel'].upper()]
+    return parameters
+
+def apply_transform_operation(transformer, transformation_type, parameters):
+    """Apply one transformation request to a transformer"""
+    # Convert string parameters to appropriate enums if needed
+    parameters = parse_transform_parameters(parameters)
+    
+    if transformation_type == 'color_adjustment':
+        transformer.adjust_color_channel(**parameters)
+    else:
+        transformer.apply_transformation(
+            GeometricTransformationType(transformation_type), 
+            **parameters
+        )
+
+PLANE_OPERATIONS = {
+    'filter': apply_filter_operation,
+    'transform': apply_transform_operation
+}
+
+PLANE_PROCESSORS = {
+    'filter': AdvancedImageProcessor,
+    'transform': GeometricTransformation
+}
+
+# Session entry and constructor of each processor that can be reset to the original
+RESETTABLE_PROCESSORS = {
+    'filter': ('image_processor', AdvancedImageProcessor),
+    'transform': ('geometric_transformer', GeometricTransformation),
+    'features': ('feature_extractor', AdvancedFeatureExtractor)
+}
+
+def reset_result_key(session, plane):
+    session['result_keys'][plane] = session['content_key']
+
+def rebuild_processor(session, name):
+    """Replace a processor with a fresh one on the original image.
+
+    Cached planes also drop their result key and preview edits, so the next
+    download and the next cached operation start from the original again.
+    """
+    attribute, processor_class = RESETTABLE_PROCESSORS[name]
+    session[attribute] = processor_class(session['original_image'])
+    if name in HISTORY_ATTRS:
+        reset_result_key(session, name)
+        discard_previews(session, name)
+
+def run_cached(session, plane, operation, compute, store=True, deferred=False):
+    """Apply an operation to a plane, reusing the result of an identical earlier chain.
+
+    `operation` identifies the step (type and parameters) and `compute`
+    applies it to the plane's processor. On a cache hit the processor's
+    current image and history are set as if `compute` had run. With
+    store=False a computed result is not cached, so a deferred transformer
+    is not forced to render it. Deferred results differ slightly from
+    step-by-step ones, so they are keyed separately, as in BatchProcessor.
+    Returns the result cache key of the new state, or None if the plane is
+    not tracked.
+    """
+    parent_key = session['result_keys'].get(plane)
+    if parent_key is None:
+        compute()
+        return None
+    
+    key = operation_key(parent_key, f'{plane}:deferred' if deferred else plane, *operation)
+    processor = session[SESSION_PLANES[plane]]
+    history = getattr(processor, HISTORY_ATTRS[plane])
+    cached = result_cache.get_result(key)
+    if cached is not None:
+        image, history_entry = cached
+        processor.current_image = image
+        history.append(history_entry)
+    else:
+        compute()
+        if store:
+            result_cache.put_result(key, processor.current_image, history[-1] if history else None)
+    session['result_keys'][plane] = key
+    return key
+
+def scale_crop(parameters, scale, size):
+    """Map a crop rectangle onto a proxy of the given (rows, cols) by its corners.
+
+    Rounding the origin and the size separately can push a crop that fits
+    the full image past the proxy's edge, so the corners are scaled and
+    clamped instead. Crops that do not fit the full image are not clamped,
+    so the proxy rejects them as the full image would.
+    """
+    parameters = dict(parameters)
+    rows, cols = size
+    for start, length, limit in (('x', 'width', cols), ('y', 'height', rows)):
+        begin, extent = parameters.get(start), parameters.get(length)
+        if not all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in (begin, extent)):
+            continue
+        first, last = int(round(begin * scale)), int(round((begin + extent) * scale))
+        # The proxy was truncated from a full size below (limit + 1) / scale
+        if begin >= 0 and extent > 0 and begin + extent < (limit + 1) / scale:
+            first = min(max(first, 0), limit - 1)
+            last = min(max(last, first + 1), limit)
+        parameters[start], parameters[length] = first, last - first
+    return parameters
+
+def scale_parameters(operation_type, parameters, scale, size=None):
+    """Map pixel-valued transformation parameters onto a proxy of the given scale and (rows, cols)"""
+    if operation_type == 'crop' and size is not None:
+        return scale_crop(parameters, scale, size)
+    
+    def scaled(value):
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, int):
+            return max(1, int(round(value * scale))) if value > 0 else int(round(value * scale))
+        if isinstance(value, float):
+            return value * scale
+        if isinstance(value, np.ndarray):
+            return value * scale
+        if isinstance(value, (list, tuple)):
+            return [scaled(item) for item in value]
+        return value
+    
+    names = PIXEL_PARAMETERS.get(operation_type, ())
+    return {key: scaled(value) if key in names else value for key, value in parameters.items()}
+
+def get_preview(session, plane):
+    """Downscaled processor that mirrors a plane's full-resolution state plus pending edits.
+
+    The proxy is built by downscaling the plane's current full-resolution
+    image, so it is cheap to rebuild in any worker. Kernel sizes and other
+    filter parameters are applied unchanged, which makes filter previews
+    an approximation of the full-resolution result.
+    """
+    preview = session['previews'].get(plane)
+    if preview is None:
+        config = current_app.config
+        full_image = session[SESSION_PLANES[plane]].current_image
+        proxy = resize_image(full_image, config.get('PREVIEW_MAX_WIDTH', 800), config.get('PREVIEW_MAX_HEIGHT', 600))
+        preview = {
+            'processor': PLANE_PROCESSORS[plane](proxy),
+            'scale': proxy.shape[1] / full_image.shape[1]
+        }
+        for operation_type, parameters in session['pending'][plane]:
+            apply_preview_operation(preview, plane, operation_type, parameters)
+        session['previews'][plane] = preview
+    return preview
+
+def apply_preview_operation(preview, plane, operation_type, parameters):
+    if plane == 'transform':
+        parameters = scale_parameters(operation_type, parameters, preview['scale'],
+                                      preview['processor'].current_image.shape[:2])
+    PLANE_OPERATIONS[plane](preview['processor'], operation_type, parameters)
+
+def replay_copy(processor, plane):
+    """Copy of a plane's processor whose history, checkpoints and configs are its own"""
+    replay = copy.copy(processor)
+    setattr(replay, HISTORY_ATTRS[plane], list(getattr(processor, HISTORY_ATTRS[plane])))
+    replay.checkpoints = processor.checkpoints.copy()
+    if hasattr(processor, 'filter_configs'):
+        replay.filter_configs = dict(processor.filter_configs)
+    return replay
+
+def flush_previews(session, plane):
+    """Replay a plane's pending preview edits at full resolution.
+
+    Pending transformations are composed and rendered with a single warp;
+    only the final state is cached. The edits are replayed on a copy of the
+    plane's processor, which replaces it only once every edit succeeded, so
+    a failure leaves the plane and its pending edits as they were.
+    """
+    pending = session['pending'][plane]
+    if not pending:
+        return False
+    
+    processor = replay_copy(session[SESSION_PLANES[plane]], plane)
+    working = dict(session, result_keys=dict(session['result_keys']))
+    working[SESSION_PLANES[plane]] = processor
+    deferred = plane == 'transform'
+    if deferred:
+        processor.set_deferred(True)
+    try:
+        for index, (operation_type, parameters) in enumerate(pending):
+            run_cached(working, plane, (operation_type, parameters),
+                       lambda: PLANE_OPERATIONS[plane](processor, operation_type, parameters),
+                       store=not deferred or index == len(pending) - 1, deferred=deferred)
+    finally:
+        if deferred:
+            processor.set_deferred(False)
+    
+    session[SESSION_PLANES[plane]] = processor
+    session['result_keys'][plane] = working['result_keys'][plane]
+    pending.clear()
+    return True
+
+def discard_previews(session, plane):
+    session['pending'][plane] = []
+    session['previews'].pop(plane, None)
+
+def serialize_pending(session, plane):
+    """Pending preview edits in the same shape as the plane's history entries"""
+    type_key = 'filter_type' if plane == 'filter' else 'transformation_type'
+    return [{type_key: operation_type, 'parameters': parameters}
+            for operation_type, parameters in session['pending'][plane]]
+
+def run_plane_operation(image_id, session, plane, operation_type, parameters, preview=False):
+    """Apply a filter or transformation request, at full resolution or on the preview proxy.
+
+    Returns (image, result_key, history); result_key is None for previews,
+    whose results are not cached.
+    """
+    if preview:
+        apply_preview_operation(get_preview(session, plane), plane, operation_type, parameters)
+        session['pending'][plane].append((operation_type, parameters))
+        publish_session(image_id, session)
+        processor = session['previews'][plane]['processor']
+        return processor.current_image, None, serialize_pending(session, plane)
+    
+    processor = session[SESSION_PLANES[plane]]
+    # Pending preview edits come first; the proxy no longer matches afterwards
+    flush_previews(session, plane)
+    session['previews'].pop(plane, None)
+    result_key = run_cached(session, plane, (operation_type, parameters),
+                            lambda: PLANE_OPERATIONS[plane](processor, operation_type, parameters))
+    publish_session(image_id, session, planes=[plane])
+    return processor.current_image, result_key, []
+
+def serialize_filter_history(processor):
+    """Filter history as response entries (enums and arrays are left to the serializer)"""
+    entries = []
+    for entry in processor.get_history():
+        filter_type, params = entry
+        item = {'filter_type': filter_type, 'parameters': params}
+        # How the filter was computed (e.g. the custom kernel path), when recorded
+        if getattr(entry, 'metadata', None):
+            item['metadata'] = entry.metadata
+        entries.append(item)
+    return entries
+
+def serialize_transform_history(transformer):
+    """Transformation history as response entries (enums and arrays are left to the serializer)"""
+    return [
+        {
+            'transformation_type': item['type'],
+            # Channels are named in requests ('red'), so report them by name too
+            'parameters': {
+                key: value.name if isinstance(value, ColorChannel) else value
+                for key, value in item['parameters'].items()
+            }
+        }
+        for item in transformer.get_history()
+    ]
+
+def load_plane(image_id, meta, original, name):
+    """A published plane, or a view of the original when it was published as a crop of it"""
+    roi = meta.get('rois', {}).get(name)
+    if roi is not None:
+        x, y, width, height = roi
+        return freeze(original[y:y+height, x:x+width])
+    return backend.load_plane(image_id, name)
+
+def restore_session(image_id, meta, original=None):
+    """Rebuild a session from the planes and history published by any worker"""
+    if original is None:
+        original = backend.load_original(image_id)
+    if original is None:
+        return None
+    
+    session = build_session(original, meta.get('content_key'))
+    session['version'] = meta.get('version', 0)
+    session['result_keys'].update(meta.get('result_keys', {}))
+    session['pending'].update(meta.get('pending', {}))
+    
+    plane = load_plane(image_id, meta, original, 'filter')
+    if plane is not None:
+        processor = session['image_processor']
+        processor.current_image = plane
+        processor.history = [
+            HistoryEntry(FilterType(entry['filter_type']), entry['parameters'], entry['metadata'])
+            if entry.get('metadata') else (FilterType(entry['filter_type']), entry['parameters'])
+            for entry in meta.get('filter_history', [])
+        ]
+    
+    plane = load_plane(image_id, meta, original, 'transform')
+    if plane is not None:
+        transformer = session['geometric_transformer']
+        transformer.current_image = plane
+        transformer.transformation_history = [
+            {'type': GeometricTransformationType(entry['transformation_type']), 'parameters': entry['parameters']}
+            for entry in meta.get('transform_history', [])
+        ]
+    
+    plane = load_plane(image_id, meta, original, 'batch')
+    if plane is not None:
+        session['batch_processor'].current_image = plane
+    
+    return session
+
+def get_session(image_id):
+    """Find a session in this worker, or restore it from the shared backend"""
+    session = sessions.get(image_id)
+    if not backend.shared or image_id is None:
+        return session
+    
+    meta = backend.load_meta(image_id)
+    if meta is None:
+        # Released or purged by another worker
+        if session is not None:
+            sessions.pop(image_id)
+        return None
+    if session is not None and session['version'] == meta.get('version', 0):
+        return session
+    
+    # Another worker changed (or created) this session; reuse our mapping of the original
+    original = session['original_image'] if session is not None else None
+    session = restore_session(image_id, meta, original)
+    if session is not None:
+        sessions.put(image_id, session)
+    return session
+
+def publish_session(image_id, session, planes=()):
+    """Record a session change locally and, if shared, for other workers"""
+    sessions.touch(image_id, resize=True)
+    if not backend.shared:
+        return
+    
+    # Planes and meta are read, modified and replaced as one step per image
+    with backend.lock(image_id):
+        meta = backend.load_meta(image_id)
+        if meta is None:
+            # Released or purged meanwhile; publishing would leave a session without its original
+            return
+        rois = meta.setdefault('rois', {})
+        for name in planes:
+            current = getattr(session[SESSION_PLANES[name]], 'current_image')
+            # A crop stays a window on the original; publish its rectangle, not its pixels
+            roi = roi_of(current, session['original_image'])
+            rois.pop(name, None)
+            if current is session['original_image']:
+                backend.delete_plane(image_id, name)
+            elif roi is not None:
+                backend.delete_plane(image_id, name)
+                rois[name] = roi
+            else:
+                backend.save_plane(image_id, name, current)
+        
+        meta['version'] = meta.get('version', 0) + 1
+        meta['filter_history'] = serialize_filter_history(session['image_processor'])
+        meta['transform_history'] = serialize_transform_history(session['geometric_transformer'])
+        meta['result_keys'] = session['result_keys']
+        meta['pending'] = session['pending']
+        backend.save_meta(image_id, meta)
+        session['version'] = meta['version']
+
+def find_uploaded_image(content_key):
+    """Return (image_id, original) of a live session decoded from the same bytes"""
+    image_id = sessions.find_content(content_key)
+    if image_id is not None:
+        return image_id, sessions.get(image_id)['original_image']
+    
+    image_id = backend.find_content(content_key)
+    if image_id is not None:
+        original = backend.load_original(image_id)
+        if original is not None:
+            return image_id, original
+    return None
+
+def read_feature_format(data):
+    """Opt-in compact feature encoding: returns (compact, descriptor_dtype)"""
+    feature_format = data.get('feature_format', 'list')
+    if feature_format not in ('list', 'compact'):
+        raise ValueError(f"Unknown feature format: {feature_format}")
+    descriptor_dtype = data.get('descriptor_dtype', 'float32')
+    if descriptor_dtype not in COMPACT_FLOAT_DTYPES:
+        raise ValueError(f"Descriptor dtype must be one of {list(COMPACT_FLOAT_DTYPES)}")
+    return feature_format == 'compact', descriptor_dtype
+
+def upload_preview(image_bytes, filename, image_id):
+    """Reuse the uploaded bytes as the preview when they match the negotiated output"""
+    session = get_session(image_id)
+    return EncodedImage(image=session['original_image'], data=image_bytes,
+                        mime_type=browser_mime_type(filename), cache_key=session['content_key'])
+
+def run_matcher(image1, image2, matching_method, parameters):
+    """Detect and match features between two images"""
+    matcher = FeatureMatching(image1, image2)
+    method = MatchingMethod(matching_method)
+    
+    # Detect features and match
+    matcher.detect_features(method)
+    matcher.match_features(**parameters)
+    return matcher
+
+def get_matcher(matcher_id):
+    """Find a matcher in this worker, or re-run it from its shared description"""
+    matcher = sessions.get(matcher_id)
+    if matcher is not None or not backend.shared or matcher_id is None:
+        return matcher
+    
+    meta = backend.load_meta(matcher_id)
+    if meta is None:
+        return None
+    session1 = get_session(meta['image_id1'])
+    session2 = get_session(meta['image_id2'])
+    if session1 is None or session2 is None:
+        return None
+    
+    matcher = run_matcher(session1['original_image'], session2['original_image'],
+                          meta['matching_method'], meta['parameters'])
+    sessions.put(matcher_id, matcher)
+    return matcher
 
 @api_bp.route('/upload', methods=['POST'])
 def upload_image():
@@ -39,36 +530,50 @@ def upload_image():
             
             # Read image directly from memory
             image_bytes = file.read()
-            image = load_image(image_bytes)
+            
+            # Identical bytes reuse the decoded buffer, but every upload gets its own session
+            content_key = content_hash(image_bytes)
+            existing = find_uploaded_image(content_key)
+            if existing is not None:
+                source_id, image = existing
+            else:
+                source_id, image = None, load_image(image_bytes)
             
             if image is None:
                 return jsonify({'error': 'Invalid image file'}), 400
             
-            # Generate unique ID for this image
-            image_id = f"image_{len(processors)}"
+            # All processors share this buffer as read-only views
+            image = freeze(image)
             
-            # Store processors
-            processors[image_id] = {
-                'feature_extractor': AdvancedFeatureExtractor(image),
-                'image_processor': AdvancedImageProcessor(image),
-                'geometric_transformer': GeometricTransformation(image),
-                'batch_processor': BatchProcessor(image),
-                'original_image': image
-            }
+            # Generate unique ID for this image
+            image_id = new_session_id('image')
             
-            # Store batch processor separately for easier access
-            batch_processors[image_id] = processors[image_id]['batch_processor']
+            if backend.shared:
+                # Publish the decoded original and work on the shared mapping
+                backend.purge_expired(sessions.ttl_seconds)
+                meta = {
+                    'version': 0,
+                    'shape': list(image.shape),
+                    'content_key': content_key
+                }
+                if source_id is not None:
+                    backend.share_original(source_id, image_id, image, meta)
+                else:
+                    backend.save_original(image_id, image, meta)
+                backend.link_content(content_key, image_id)
+                image = backend.load_original(image_id)
             
-            # Convert image to base64 for response
-            image_base64 = image_to_base64(image)
+            # Store processors
+            sessions.put(image_id, build_session(image, content_key), content_key=content_key)
             
-            return jsonify({
+            return image_response({
                 'success': True,
                 'image_id': image_id,
-                'image_data': image_base64,
+                'image_data': upload_preview(image_bytes, filename, image_id),
                 'width': image.shape[1],
                 'height': image.shape[0],
-                'channels': len(image.shape)
+                'channels': len(image.shape),
+                'deduplicated': source_id is not None
             })
         
         return jsonify({'error': 'Invalid file type. Please upload PNG, JPG, or JPEG files.'}), 400
@@ -85,64 +590,20 @@ def extract_features():
         image_id = data.get('image_id')
         feature_type = data.get('feature_type')
         parameters = data.get('parameters', {})
+        compact, descriptor_dtype = read_feature_format(data)
         
-        if image_id not in processors:
+        session = get_session(image_id)
+        if session is None:
             return jsonify({'error': 'Image not found'}), 404
         
-        extractor = processors[image_id]['feature_extractor']
+        extractor = session['feature_extractor']
         result = extractor.extract_features(feature_type, **parameters)
+        sessions.touch(image_id, resize=True)
         
-        # Convert result image to base64
-        result_image_base64 = None
-        if result.image is not None:
-            result_image_base64 = image_to_base64(result.image)
-        
-        # Convert descriptors to list if not None
-        descriptors_list = None
-        if result.descriptors is not None:
-            descriptors_list = result.descriptors.flatten().tolist()
-        
-        # Convert keypoints to serializable format
-        keypoints_data = None
-        if result.keypoints is not None:
-            keypoints_data = [
-                {
-                    'x': kp.pt[0],
-                    'y': kp.pt[1],
-                    'size': kp.size,
-                    'angle': kp.angle,
-                    'response': kp.response,
-                    'octave': kp.octave
-                }
-                for kp in result.keypoints
-            ]
-        
-        # Convert metadata to serializable format
-        serializable_metadata = {}
-        for key, value in result.metadata.items():
-            if isinstance(value, np.ndarray):
-                serializable_metadata[key] = value.tolist()
-            elif isinstance(value, dict):
-                # Handle nested dictionaries - skip complex objects
-                nested_dict = {}
-                for k, v in value.items():
-                    if isinstance(v, (str, int, float, bool)):
-                        nested_dict[k] = v
-                    elif isinstance(v, np.ndarray):
-                        nested_dict[k] = v.tolist()
-                    # Skip other complex objects like KeyPoint
-                serializable_metadata[key] = nested_dict
-            elif isinstance(value, (str, int, float, bool)):
-                serializable_metadata[key] = value
-            # Skip other complex objects
-        
-        return jsonify({
+        # Image, keypoints, descriptors and metadata in the negotiated format
+        return image_response({
             'success': True,
-            'result_image': result_image_base64,
-            'keypoints': keypoints_data,
-            'descriptors': descriptors_list,
-            'features': result.features,
-            'metadata': serializable_metadata
+            **feature_payload(result, compact, descriptor_dtype)
         })
         
     except Exception as e:
@@ -157,29 +618,25 @@ def apply_filter():
         image_id = data.get('image_id')
         filter_type = data.get('filter_type')
         parameters = data.get('parameters', {})
+        # Preview requests run on a downscaled proxy; download_image replays them at full size
+        preview = bool(data.get('preview', False))
         
-        if image_id not in processors:
+        session = get_session(image_id)
+        if session is None:
             return jsonify({'error': 'Image not found'}), 404
         
-        processor = processors[image_id]['image_processor']
-        result_image = processor.apply_filter(filter_type, **parameters)
+        # Identical filter chains on the same upload reuse the earlier result
+        result_image, result_key, pending = run_plane_operation(
+            image_id, session, 'filter', filter_type, parameters, preview=preview)
         
-        # Convert result image to base64
-        result_image_base64 = image_to_base64(result_image)
+        # Encode result image in the negotiated response format
+        result_image_data = encoded_image(result_image, result_key)
         
-        # Convert history to serializable format
-        history = []
-        for filter_type, params in processor.get_history():
-            if hasattr(filter_type, 'value'):
-                filter_name = filter_type.value
-            else:
-                filter_name = str(filter_type)
-            history.append({'filter_type': filter_name, 'parameters': params})
-        
-        return jsonify({
+        return image_response({
             'success': True,
-            'result_image': result_image_base64,
-            'history': history
+            'result_image': result_image_data,
+            'history': serialize_filter_history(session['image_processor']) + pending,
+            'preview': preview
         })
         
     except Exception as e:
@@ -196,33 +653,38 @@ def match_features():
         matching_method = data.get('matching_method', 'FLANN')
         parameters = data.get('parameters', {})
         
-        if image_id1 not in processors or image_id2 not in processors:
+        session1 = get_session(image_id1)
+        session2 = get_session(image_id2)
+        if session1 is None or session2 is None:
             return jsonify({'error': 'One or both images not found'}), 404
         
-        image1 = processors[image_id1]['original_image']
-        image2 = processors[image_id2]['original_image']
+        image1 = session1['original_image']
+        image2 = session2['original_image']
         
-        matcher = FeatureMatching(image1, image2)
-        method = MatchingMethod(matching_method)
-        
-        # Detect features and match
-        matcher.detect_features(method)
-        matcher.match_features(**parameters)
+        matcher = run_matcher(image1, image2, matching_method, parameters)
         
         # Draw matches
         matches_image = matcher.draw_matches()
-        matches_image_base64 = image_to_base64(matches_image)
+        matches_image_data = encoded_image(matches_image)
         
         # Get statistics
         stats = matcher.get_match_statistics()
         
         # Store matcher for potential homography calculation
-        matcher_id = f"matcher_{len(matchers)}"
-        matchers[matcher_id] = matcher
+        matcher_id = new_session_id('matcher')
+        sessions.put(matcher_id, matcher)
+        if backend.shared:
+            # Other workers re-run the match from this description when needed
+            backend.save_meta(matcher_id, {
+                'image_id1': image_id1,
+                'image_id2': image_id2,
+                'matching_method': matching_method,
+                'parameters': parameters
+            })
         
-        return jsonify({
+        return image_response({
             'success': True,
-            'matches_image': matches_image_base64,
+            'matches_image': matches_image_data,
             'matcher_id': matcher_id,
             'statistics': stats
         })
@@ -239,10 +701,10 @@ def calculate_homography():
         matcher_id = data.get('matcher_id')
         parameters = data.get('parameters', {})
         
-        if matcher_id not in matchers:
+        matcher = get_matcher(matcher_id)
+        if matcher is None:
             return jsonify({'error': 'Matcher not found'}), 404
         
-        matcher = matchers[matcher_id]
         matcher.calculate_homography(**parameters)
         
         # Convert homography matrix to list
@@ -267,58 +729,23 @@ def apply_transformation():
         image_id = data.get('image_id')
         transformation_type = data.get('transformation_type')
         parameters = data.get('parameters', {})
+        # Preview requests run on a downscaled proxy; download_image replays them at full size
+        preview = bool(data.get('preview', False))
         
-        if image_id not in processors:
+        session = get_session(image_id)
+        if session is None:
             return jsonify({'error': 'Image not found'}), 404
         
-        transformer = processors[image_id]['geometric_transformer']
-        
-        # Convert string parameters to appropriate enums if needed
-        if 'channel' in parameters and isinstance(parameters['channel'], str):
-            parameters['channel'] = ColorChannel[parameters['channel'].upper()]
-        
         # Apply transformation
-        if transformation_type == 'color_adjustment':
-            transformer.adjust_color_channel(**parameters)
-        else:
-            transformer.apply_transformation(
-                GeometricTransformationType(transformation_type), 
-                **parameters
-            )
-        
-        result_image = transformer.get_current_image()
-        result_image_base64 = image_to_base64(result_image)
-        
-        # Convert history to serializable format  
-        history = []
-        for item in transformer.get_history():
-            if isinstance(item, dict):
-                # Handle dict format
-                history_entry = {'transformation_type': str(item.get('type', '')), 'parameters': {}}
-                if 'parameters' in item:
-                    for key, value in item['parameters'].items():
-                        if isinstance(value, np.ndarray):
-                            history_entry['parameters'][key] = value.tolist()
-                        elif isinstance(value, (str, int, float, bool)):
-                            history_entry['parameters'][key] = value
-                        # Skip complex objects
-                history.append(history_entry)
-            elif len(item) >= 2:
-                # Handle tuple format
-                transform_type, params = item[0], item[1] if len(item) > 1 else {}
-                history_entry = {'transformation_type': str(transform_type), 'parameters': {}}
-                if isinstance(params, dict):
-                    for key, value in params.items():
-                        if isinstance(value, np.ndarray):
-                            history_entry['parameters'][key] = value.tolist()
-                        elif isinstance(value, (str, int, float, bool)):
-                            history_entry['parameters'][key] = value
-                history.append(history_entry)
+        result_image, result_key, pending = run_plane_operation(
+            image_id, session, 'transform', transformation_type, parameters, preview=preview)
+        result_image_data = encoded_image(result_image, result_key)
         
-        return jsonify({
+        return image_response({
             'success': True,
-            'result_image': result_image_base64,
-            'history': history
+            'result_image': result_image_data,
+            'history': serialize_transform_history(session['geometric_transformer']) + pending,
+            'preview': preview
         })
         
     except Exception as e:
@@ -333,25 +760,23 @@ def reset_image():
         image_id = data.get('image_id')
         processor_type = data.get('processor_type', 'all')
         
-        if image_id not in processors:
+        session = get_session(image_id)
+        if session is None:
             return jsonify({'error': 'Image not found'}), 404
         
-        if processor_type == 'all' or processor_type == 'filter':
-            processors[image_id]['image_processor'].reset_to_original()
-        
-        if processor_type == 'all' or processor_type == 'transform':
-            processors[image_id]['geometric_transformer'].reset()
+        for name in RESETTABLE_PROCESSORS:
+            if processor_type in ('all', name):
+                rebuild_processor(session, name)
         
-        if processor_type == 'all' or processor_type == 'features':
-            processors[image_id]['feature_extractor'].reset_image()
+        publish_session(image_id, session, planes=['filter', 'transform'])
         
         # Return current image
-        current_image = processors[image_id]['original_image']
-        image_base64 = image_to_base64(current_image)
+        current_image = session['original_image']
+        image_data = encoded_image(current_image, session['content_key'])
         
-        return jsonify({
+        return image_response({
             'success': True,
-            'image_data': image_base64
+            'image_data': image_data
         })
         
     except Exception as e:
@@ -366,31 +791,78 @@ def download_image():
         image_id = data.get('image_id')
         processor_type = data.get('processor_type', 'filter')
         
-        if image_id not in processors:
+        session = get_session(image_id)
+        if session is None:
             return jsonify({'error': 'Image not found'}), 404
         
+        # Preview edits are only applied at full resolution when downloading
+        if processor_type in HISTORY_ATTRS and flush_previews(session, processor_type):
+            publish_session(image_id, session, planes=[processor_type])
+        
+        result_key = None
         if processor_type == 'filter':
-            current_image = processors[image_id]['image_processor'].get_current_image()
+            current_image = session['image_processor'].get_current_image()
+            result_key = session['result_keys']['filter']
         elif processor_type == 'transform':
-            current_image = processors[image_id]['geometric_transformer'].get_current_image()
+            current_image = session['geometric_transformer'].get_current_image()
+            result_key = session['result_keys']['transform']
         elif processor_type == 'features':
-            current_image = processors[image_id]['feature_extractor'].get_current_image()
+            current_image = session['feature_extractor'].get_current_image()
         else:
-            current_image = processors[image_id]['original_image']
+            current_image = session['original_image']
+            result_key = session['content_key']
         
-        # Convert image to base64
-        image_base64 = image_to_base64(current_image)
+        # Encode image in the negotiated response format (cached per state and format)
+        image_data = encoded_image(current_image, result_key)
+        extension = IMAGE_FORMATS[response_output_options()['format']][0]
         
-        return jsonify({
+        return image_response({
             'success': True,
-            'image_data': image_base64,
-            'filename': f'processed_image_{image_id}.png'
+            'image_data': image_data,
+            'filename': f'processed_image_{image_id}{extension}'
         })
         
     except Exception as e:
         logger.error(f"Download error: {str(e)}")
         return jsonify({'error': f'Download failed: {str(e)}'}), 500
 
+@api_bp.route('/release_image', methods=['POST'])
+def release_image():
+    """Drop a client's uploaded image, whichever worker holds it"""
+    try:
+        data = request.get_json()
+        image_id = data.get('image_id')
+        
+        shared = backend.shared and backend.load_meta(image_id) is not None
+        if image_id not in sessions and not shared:
+            return jsonify({'error': 'Image not found'}), 404
+        
+        # Each upload owns its session, so releasing it frees it everywhere;
+        # other workers drop their copy once the shared meta is gone
+        sessions.pop(image_id)
+        backend.delete(image_id)
+        
+        return jsonify({'success': True})
+        
+    except Exception as e:
+        logger.error(f"Release error: {str(e)}")
+        return jsonify({'error': f'Release failed: {str(e)}'}), 500
+
+@api_bp.route('/session_stats', methods=['GET'])
+def session_stats():
+    """Get session store size and eviction counters"""
+    return jsonify(sessions.stats())
+
+@api_bp.route('/encode_stats', methods=['GET'])
+def get_encode_stats():
+    """Get per-format encode timing and output settings"""
+    return jsonify({
+        'default_output': current_app.config.get('IMAGE_OUTPUT'),
+        'presets': ENCODE_PRESETS,
+        'formats': encode_stats.snapshot(),
+        'result_cache': result_cache.stats()
+    })
+
 @api_bp.route('/get_filter_types', methods=['GET'])
 def get_filter_types():
     """Get available filter types"""
@@ -424,59 +896,28 @@ def process_multiple_features():
         data = request.get_json()
         image_id = data.get('image_id')
         feature_tasks = data.get('feature_tasks', [])
+        compact, descriptor_dtype = read_feature_format(data)
         
-        if image_id not in batch_processors:
+        session = get_session(image_id)
+        if session is None:
             return jsonify({'error': 'Image not found'}), 404
         
         if not feature_tasks:
             return jsonify({'error': 'No feature tasks provided'}), 400
         
-        batch_processor = batch_processors[image_id]
+        batch_processor = session['batch_processor']
         results = batch_processor.process_multiple_features(feature_tasks)
         
         # تحويل النتائج إلى تنسيق قابل للإرسال
         serialized_results = {}
         for task_id, result in results.items():
-            if result is not None:
-                # تحويل الصورة إلى base64
-                result_image_base64 = None
-                if result.image is not None:
-                    result_image_base64 = image_to_base64(result.image)
-                
-                # تحويل الواصفات إلى قائمة
-                descriptors_list = None
-                if result.descriptors is not None:
-                    descriptors_list = result.descriptors.flatten().tolist()
-                
-                # تحويل النقاط المميزة
-                keypoints_data = None
-                if result.keypoints is not None:
-                    keypoints_data = [
-                        {
-                            'x': kp.pt[0],
-                            'y': kp.pt[1],
-                            'size': kp.size,
-                            'angle': kp.angle,
-                            'response': kp.response,
-                            'octave': kp.octave
-                        }
-                        for kp in result.keypoints
-                    ]
-                
-                serialized_results[task_id] = {
-                    'result_image': result_image_base64,
-                    'keypoints': keypoints_data,
-                    'descriptors': descriptors_list,
-                    'features': result.features,
-                    'metadata': result.metadata
-                }
-            else:
-                serialized_results[task_id] = None
+            # الصورة والنقاط والواصفات (قوائم، أو مصفوفات مضغوطة عند الطلب)
+            serialized_results[task_id] = feature_payload(result, compact, descriptor_dtype)
         
         # إضافة مقارنة النتائج
         comparison = ComparisonProcessor.compare_feature_results(results)
         
-        return jsonify({
+        return image_response({
             'success': True,
             'results': serialized_results,
             'comparison': comparison,
@@ -495,27 +936,28 @@ def process_multiple_filters():
         image_id = data.get('image_id')
         filter_tasks = data.get('filter_tasks', [])
         
-        if image_id not in batch_processors:
+        session = get_session(image_id)
+        if session is None:
             return jsonify({'error': 'Image not found'}), 404
         
         if not filter_tasks:
             return jsonify({'error': 'No filter tasks provided'}), 400
         
-        batch_processor = batch_processors[image_id]
+        batch_processor = session['batch_processor']
         results = batch_processor.process_multiple_filters(filter_tasks)
         
-        # تحويل النتائج إلى base64
+        # ترميز الصور بتنسيق الاستجابة المتفق عليه
         serialized_results = {}
         for task_id, result_image in results.items():
             if result_image is not None:
-                serialized_results[task_id] = image_to_base64(result_image)
+                serialized_results[task_id] = encoded_image(result_image)
             else:
                 serialized_results[task_id] = None
         
         # إضافة مقارنة النتائج
         comparison = ComparisonProcessor.compare_filter_results(results)
         
-        return jsonify({
+        return image_response({
             'success': True,
             'results': serialized_results,
             'comparison': comparison,
@@ -534,27 +976,28 @@ def process_multiple_transformations():
         image_id = data.get('image_id')
         transform_tasks = data.get('transform_tasks', [])
         
-        if image_id not in batch_processors:
+        session = get_session(image_id)
+        if session is None:
             return jsonify({'error': 'Image not found'}), 404
         
         if not transform_tasks:
             return jsonify({'error': 'No transformation tasks provided'}), 400
         
-        batch_processor = batch_processors[image_id]
+        batch_processor = session['batch_processor']
         results = batch_processor.process_multiple_transformations(transform_tasks)
         
-        # تحويل النتائج إلى base64
+        # ترميز الصور بتنسيق الاستجابة المتفق عليه
         serialized_results = {}
         for task_id, result_image in results.items():
             if result_image is not None:
-                serialized_results[task_id] = image_to_base64(result_image)
+                serialized_results[task_id] = encoded_image(result_image)
             else:
                 serialized_results[task_id] = None
         
         # إضافة مقارنة النتائج
         comparison = ComparisonProcessor.compare_transformation_results(results)
         
-        return jsonify({
+        return image_response({
             'success': True,
             'results': serialized_results,
             'comparison': comparison,
@@ -573,23 +1016,31 @@ def process_filter_chain():
         image_id = data.get('image_id')
         filter_chain = data.get('filter_chain', [])
         apply_to_current = data.get('apply_to_current', True)
+        # 'float32' keeps intermediates unclipped and quantizes once at the end
+        precision = data.get('precision', 'uint8')
         
-        if image_id not in batch_processors:
+        session = get_session(image_id)
+        if session is None:
             return jsonify({'error': 'Image not found'}), 404
         
         if not filter_chain:
             return jsonify({'error': 'No filter chain provided'}), 400
         
-        batch_processor = batch_processors[image_id]
-        result_image = batch_processor.process_filter_chain(filter_chain, apply_to_current)
+        if precision not in PRECISIONS:
+            return jsonify({'error': f'Precision must be one of {", ".join(PRECISIONS)}'}), 400
         
-        result_image_base64 = image_to_base64(result_image)
+        batch_processor = session['batch_processor']
+        result_image = batch_processor.process_filter_chain(filter_chain, apply_to_current, precision)
+        publish_session(image_id, session, planes=['batch'])
         
-        return jsonify({
+        result_image_data = encoded_image(result_image)
+        
+        return image_response({
             'success': True,
-            'result_image': result_image_base64,
+            'result_image': result_image_data,
             'chain_length': len(filter_chain),
-            'applied_to_current': apply_to_current
+            'applied_to_current': apply_to_current,
+            'precision': precision
         })
         
     except Exception as e:
@@ -604,23 +1055,39 @@ def process_transformation_chain():
         image_id = data.get('image_id')
         transform_chain = data.get('transform_chain', [])
         apply_to_current = data.get('apply_to_current', True)
+        precision = data.get('precision', 'uint8')
+        # Compose consecutive geometric steps into a single warp
+        deferred = bool(data.get('deferred', False))
         
-        if image_id not in batch_processors:
+        session = get_session(image_id)
+        if session is None:
             return jsonify({'error': 'Image not found'}), 404
         
         if not transform_chain:
             return jsonify({'error': 'No transformation chain provided'}), 400
         
-        batch_processor = batch_processors[image_id]
-        result_image = batch_processor.process_transformation_chain(transform_chain, apply_to_current)
+        if precision not in PRECISIONS:
+            return jsonify({'error': f'Precision must be one of {", ".join(PRECISIONS)}'}), 400
         
-        result_image_base64 = image_to_base64(result_image)
+        # Channels arrive as names ('red'), as in apply_transformation
+        parsed_chain = [
+            dict(step, parameters=parse_transform_parameters(step.get('parameters', {})))
+            for step in transform_chain
+        ]
         
-        return jsonify({
+        batch_processor = session['batch_processor']
+        result_image = batch_processor.process_transformation_chain(parsed_chain, apply_to_current, precision, deferred)
+        publish_session(image_id, session, planes=['batch'])
+        
+        result_image_data = encoded_image(result_image)
+        
+        return image_response({
             'success': True,
-            'result_image': result_image_base64,
+            'result_image': result_image_data,
             'chain_length': len(transform_chain),
-            'applied_to_current': apply_to_current
+            'applied_to_current': apply_to_current,
+            'precision': precision,
+            'deferred': deferred
         })
         
     except Exception as e:
@@ -634,66 +1101,37 @@ def process_mixed_operations():
         data = request.get_json()
         image_id = data.get('image_id')
         operations = data.get('operations', [])
+        compact, descriptor_dtype = read_feature_format(data)
         
-        if image_id not in batch_processors:
+        session = get_session(image_id)
+        if session is None:
             return jsonify({'error': 'Image not found'}), 404
         
         if not operations:
             return jsonify({'error': 'No operations provided'}), 400
         
-        batch_processor = batch_processors[image_id]
+        batch_processor = session['batch_processor']
         results = batch_processor.process_mixed_operations(operations)
         
         # تحويل نتائج الميزات
         if 'features' in results:
             serialized_features = {}
             for task_id, result in results['features'].items():
-                if result is not None:
-                    result_image_base64 = None
-                    if result.image is not None:
-                        result_image_base64 = image_to_base64(result.image)
-                    
-                    descriptors_list = None
-                    if result.descriptors is not None:
-                        descriptors_list = result.descriptors.flatten().tolist()
-                    
-                    keypoints_data = None
-                    if result.keypoints is not None:
-                        keypoints_data = [
-                            {
-                                'x': kp.pt[0],
-                                'y': kp.pt[1],
-                                'size': kp.size,
-                                'angle': kp.angle,
-                                'response': kp.response,
-                                'octave': kp.octave
-                            }
-                            for kp in result.keypoints
-                        ]
-                    
-                    serialized_features[task_id] = {
-                        'result_image': result_image_base64,
-                        'keypoints': keypoints_data,
-                        'descriptors': descriptors_list,
-                        'features': result.features,
-                        'metadata': result.metadata
-                    }
-                else:
-                    serialized_features[task_id] = None
+                serialized_features[task_id] = feature_payload(result, compact, descriptor_dtype)
             results['features'] = serialized_features
         
-        # تحويل نتائج المرشحات والتحويلات إلى base64
+        # ترميز صور المرشحات والتحويلات بتنسيق الاستجابة المتفق عليه
         for result_type in ['filters', 'transformations']:
             if result_type in results:
                 serialized_results = {}
                 for task_id, result_image in results[result_type].items():
                     if result_image is not None:
-                        serialized_results[task_id] = image_to_base64(result_image)
+                        serialized_results[task_id] = encoded_image(result_image)
                     else:
                         serialized_results[task_id] = None
                 results[result_type] = serialized_results
         
-        return jsonify({
+        return image_response({
             'success': True,
             'results': results,
             'total_operations': len(operations)
@@ -710,18 +1148,17 @@ def reset_batch_processor():
         data = request.get_json()
         image_id = data.get('image_id')
         
-        if image_id not in batch_processors:
+        session = get_session(image_id)
+        if session is None:
             return jsonify({'error': 'Image not found'}), 404
         
-        batch_processor = batch_processors[image_id]
+        batch_processor = session['batch_processor']
         batch_processor.reset_to_original()
         
-        # إعادة تعيين المعالجات العادية أيضاً
-        if image_id in processors:
-            original_image = processors[image_id]['original_image']
-            processors[image_id]['feature_extractor'] = AdvancedFeatureExtractor(original_image)
-            processors[image_id]['image_processor'] = AdvancedImageProcessor(original_image)
-            processors[image_id]['geometric_transformer'] = GeometricTransformation(original_image)
+        # إعادة تعيين المعالجات العادية أيضاً، مع مفاتيح النتائج والمعاينات المعلقة
+        for name in RESETTABLE_PROCESSORS:
+            rebuild_processor(session, name)
+        publish_session(image_id, session, planes=['filter', 'transform', 'batch'])
         
         return jsonify({
             'success': True,
@@ -5,6 +5,7 @@ class CVApp {
         this.currentImageId2 = null;
         this.currentMatcherId = null;
         this.processingHistory = [];
+        this.objectUrls = {};
         
         this.initializeEventListeners();
         this.initializeParameterHandlers();
@@ -17,11 +18,13 @@ class CVApp {
         // Upload area events
         this.setupUploadArea('uploadArea', 'imageInput', (imageData, imageId) => {
             this.handleImageUpload(imageData, imageId, 'originalImage');
+            this.releaseImage(this.currentImageId);
             this.currentImageId = imageId;
             document.getElementById('matchFeaturesBtn').disabled = !this.currentImageId2;
         });
 
         this.setupUploadArea('uploadArea2', 'imageInput2', (imageData, imageId) => {
+            this.releaseImage(this.currentImageId2);
             this.currentImageId2 = imageId;
             document.getElementById('matchFeaturesBtn').disabled = !this.currentImageId;
         });
@@ -63,19 +66,19 @@ class CVApp {
             area.classList.remove('dragover');
             const files = e.dataTransfer.files;
             if (files.length > 0) {
-                this.uploadImage(files[0], callback);
+                this.uploadImage(files[0], callback, areaId);
             }
         });
 
         input.addEventListener('change', (e) => {
             if (e.target.files.length > 0) {
-                this.uploadImage(e.target.files[0], callback);
+                this.uploadImage(e.target.files[0], callback, areaId);
             }
         });
     }
 
     // Upload image to server
-    async uploadImage(file, callback) {
+    async uploadImage(file, callback, areaId) {
         if (!file || !file.type.startsWith('image/')) {
             this.showError('يرجى اختيار ملف صورة صحيح');
             return;
@@ -86,9 +89,7 @@ class CVApp {
 
         try {
             this.showLoading(true);
-            const response = await axios.post('/api/upload', formData, {
-                headers: { 'Content-Type': 'multipart/form-data' }
-            });
+            const response = await this.postBinary('/api/upload', formData, 'upload:' + areaId);
 
             if (response.data.success) {
                 callback(response.data.image_data, response.data.image_id);
@@ -105,6 +106,58 @@ class CVApp {
         }
     }
 
+    // Post a request and receive images as binary parts instead of base64 JSON.
+    // Image parts become object URLs; the previous URLs of the same scope are revoked.
+    async postBinary(url, body, scope = 'processed') {
+        const isForm = body instanceof FormData;
+        const headers = { 'Accept': 'multipart/form-data, application/json;q=0.9' };
+        if (!isForm) headers['Content-Type'] = 'application/json';
+
+        const response = await fetch(url, {
+            method: 'POST',
+            headers: headers,
+            body: isForm ? body : JSON.stringify(body)
+        });
+
+        const contentType = response.headers.get('Content-Type') || '';
+        if (!contentType.startsWith('multipart/form-data')) {
+            const data = await response.json();
+            if (!response.ok) {
+                const error = new Error(data.error || response.statusText);
+                error.response = { data: data };
+                throw error;
+            }
+            return { data: data };
+        }
+
+        const form = await response.formData();
+        (this.objectUrls[scope] || []).forEach(objectUrl => URL.revokeObjectURL(objectUrl));
+        const urls = [];
+        const resolveParts = (value) => {
+            if (Array.isArray(value)) return value.map(resolveParts);
+            if (value && typeof value === 'object') {
+                if (typeof value.$part === 'string') {
+                    const objectUrl = URL.createObjectURL(form.get(value.$part));
+                    urls.push(objectUrl);
+                    return objectUrl;
+                }
+                const resolved = {};
+                Object.keys(value).forEach(key => { resolved[key] = resolveParts(value[key]); });
+                return resolved;
+            }
+            return value;
+        };
+        const data = resolveParts(JSON.parse(form.get('metadata')));
+        this.objectUrls[scope] = urls;
+        return { data: data };
+    }
+
+    // Release the server-side reference to an image that is no longer shown
+    releaseImage(imageId) {
+        if (!imageId) return;
+        axios.post('/api/release_image', { image_id: imageId }).catch(() => {});
+    }
+
     // Handle image upload display
     handleImageUpload(imageData, imageId, targetImageId) {
         const imgElement = document.getElementById(targetImageId);
@@ -124,7 +177,7 @@ class CVApp {
 
         try {
             this.showLoading(true);
-            const response = await axios.post('/api/extract_features', {
+            const response = await this.postBinary('/api/extract_features', {
                 image_id: this.currentImageId,
                 feature_type: featureType,
                 parameters: parameters
@@ -160,10 +213,12 @@ class CVApp {
 
         try {
             this.showLoading(true);
-            const response = await axios.post('/api/apply_filter', {
+            // Edits run on a downscaled proxy; downloads replay them at full resolution
+            const response = await this.postBinary('/api/apply_filter', {
                 image_id: this.currentImageId,
                 filter_type: filterType,
-                parameters: parameters
+                parameters: parameters,
+                preview: true
             });
 
             if (response.data.success) {
@@ -198,7 +253,7 @@ class CVApp {
 
         try {
             this.showLoading(true);
-            const response = await axios.post('/api/match_features', {
+            const response = await this.postBinary('/api/match_features', {
                 image_id1: this.currentImageId,
                 image_id2: this.currentImageId2,
                 matching_method: matchingMethod,
@@ -236,10 +291,11 @@ class CVApp {
 
         try {
             this.showLoading(true);
-            const response = await axios.post('/api/apply_transformation', {
+            const response = await this.postBinary('/api/apply_transformation', {
                 image_id: this.currentImageId,
                 transformation_type: transformationType,
-                parameters: parameters
+                parameters: parameters,
+                preview: true
             });
 
             if (response.data.success) {
@@ -786,10 +842,10 @@ class CVApp {
         }
 
         try {
-            const response = await axios.post('/api/reset_image', {
+            const response = await this.postBinary('/api/reset_image', {
                 image_id: this.currentImageId,
                 processor_type: 'all'
-            });
+            }, 'reset');
 
             if (response.data.success) {
                 document.getElementById('processedImage').src = response.data.image_data;
@@ -818,10 +874,10 @@ class CVApp {
         }
 
         try {
-            const response = await axios.post('/api/download_image', {
+            const response = await this.postBinary('/api/download_image', {
                 image_id: this.currentImageId,
                 processor_type: 'filter'
-            });
+            }, 'download');
 
             if (response.data.success) {
                 // Create download link
@@ -1228,7 +1284,7 @@ class CVApp {
                     break;
             }
 
-            const response = await axios.post(endpoint, requestData);
+            const response = await this.postBinary(endpoint, requestData, 'batch');
             
             if (response.data.success) {
                 this.displayBatchResults(response.data, operationType);
@@ -1260,7 +1316,7 @@ class CVApp {
                 <div class="col-12">
                     <div class="text-center">
                         <h6>النتيجة النهائية</h6>
-                        <img src="data:image/png;base64,${data.result_image}" class="img-fluid rounded" style="max-height: 300px;">
+                        <img src="${data.result_image}" class="img-fluid rounded" style="max-height: 300px;">
                         <p class="text-muted mt-2">تم تطبيق ${data.chain_length} عمليات</p>
                     </div>
                 </div>
@@ -1280,7 +1336,7 @@ class CVApp {
                         <div class="card">
                             <div class="card-body text-center">
                                 <h6 class="card-title">${taskId}</h6>
-                                <img src="data:image/png;base64,${imageData}" class="img-fluid rounded mb-2" style="max-height: 200px;">
+                                <img src="${imageData}" class="img-fluid rounded mb-2" style="max-height: 200px;">
                                 ${this.generateResultInfo(result, operationType)}
                             </div>
                         </div>
@@ -0,0 +1,54 @@
+import io
+import itertools
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app as flask_app  # noqa: E402
+from utils.image_utils import base64_to_image  # noqa: E402
+
+# Distinct images across the whole run, so uploads are never deduplicated by accident
+_seeds = itertools.count()
+
+
+@pytest.fixture
+def client():
+    flask_app.config['TESTING'] = True
+    return flask_app.test_client()
+
+
+@pytest.fixture
+def make_image():
+    """Random BGR image with a fresh seed per call"""
+    def make(height=120, width=160):
+        return np.random.RandomState(next(_seeds)).randint(0, 256, (height, width, 3), np.uint8)
+    return make
+
+
+@pytest.fixture
+def upload(client):
+    def upload(image, filename='image.png'):
+        ok, buffer = cv2.imencode('.png', image)
+        response = client.post('/api/upload', data={'file': (io.BytesIO(buffer.tobytes()), filename)},
+                               content_type='multipart/form-data')
+        assert response.status_code == 200, response.get_json()
+        return response.get_json()
+    return upload
+
+
+@pytest.fixture
+def post(client):
+    def post(endpoint, **payload):
+        return client.post(f'/api/{endpoint}', json=payload)
+    return post
+
+
+@pytest.fixture
+def decode():
+    """Decode an image returned inline in a JSON response"""
+    return base64_to_image
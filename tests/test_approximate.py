@@ -0,0 +1,18 @@
+import cv2
+import numpy as np
+
+from cv_modules.approximate import MIN_GAUSSIAN_FACTOR, approximate_gaussian_blur, gaussian_factor
+
+
+def test_gaussian_factor_skips_small_reductions():
+    # sigma 5 would only allow a factor of 2, which is slower than the exact filter
+    assert gaussian_factor(31, 0) == 1
+    assert gaussian_factor(61, 10) == MIN_GAUSSIAN_FACTOR
+    assert gaussian_factor(193, 32) == 8
+
+
+def test_exact_path_below_threshold():
+    image = np.random.RandomState(0).randint(0, 256, (64, 80, 3), np.uint8)
+    result, factor = approximate_gaussian_blur(image, 31, 0)
+    assert factor == 1
+    assert np.array_equal(result, cv2.GaussianBlur(image, (31, 31), 0))
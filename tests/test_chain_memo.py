@@ -0,0 +1,38 @@
+import numpy as np
+
+from cv_modules.batch_processor import BatchProcessor
+from cv_modules.geometric_transforms import ColorChannel
+from cv_modules.image_filters import AdvancedImageProcessor
+
+
+def filter_step(filter_type, **parameters):
+    return {'filter_type': filter_type, 'parameters': parameters}
+
+
+def test_user_013_changed_mid_chain_step_matches_fresh_run(make_image):
+    image = make_image()
+    chain = [filter_step('gaussian_blur', ksize=5), filter_step('median_blur', ksize=3),
+             filter_step('gamma_correction', gamma=1.4), filter_step('bilateral_filter', d=5)]
+    edited = chain[:2] + [filter_step('gamma_correction', gamma=0.7)] + chain[3:]
+
+    processor = BatchProcessor(image)
+    processor.process_filter_chain(chain, apply_to_current=False)
+    result = processor.process_filter_chain(edited, apply_to_current=False)
+    assert np.array_equal(result, AdvancedImageProcessor(image).apply_filter_chain(edited))
+    # The edited run resumed from the memoized two-step prefix
+    assert processor.chain_memo.stats()['hits'] == 1
+
+
+def test_user_013_transformation_chain_resumes_from_prefix(make_image):
+    image = make_image()
+
+    def chain(angle):
+        return [{'transformation_type': 'translation', 'parameters': {'tx': 10, 'ty': 5}},
+                {'transformation_type': 'color_adjustment', 'parameters': {'channel': ColorChannel.RED, 'value': 30}},
+                {'transformation_type': 'rotation', 'parameters': {'angle': angle}}]
+
+    processor = BatchProcessor(image)
+    processor.process_transformation_chain(chain(10), apply_to_current=False)
+    result = processor.process_transformation_chain(chain(25), apply_to_current=False)
+    assert np.array_equal(result, BatchProcessor(image).process_transformation_chain(chain(25)))
+    assert processor.chain_memo.stats()['hits'] == 1
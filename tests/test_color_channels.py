@@ -0,0 +1,77 @@
+import gc
+
+import numpy as np
+import pytest
+
+from cv_modules.derived_planes import derived_planes
+from cv_modules.geometric_transforms import ColorChannel, GeometricTransformation, color_buffers
+from cv_modules.shared_buffer import OutputBuffers
+
+
+@pytest.mark.parametrize('channel', list(ColorChannel))
+def test_user_023_set_channel_matches_numpy(make_image, channel):
+    image = make_image()
+    expected = np.full_like(image, 77) if channel == ColorChannel.ALL else image.copy()
+    if channel != ColorChannel.ALL:
+        expected[:, :, channel.value] = 77
+    for _ in range(3):
+        # Later rounds write into a reused buffer
+        result = GeometricTransformation(image).set_color_channel(channel, 77).current_image
+        assert np.array_equal(result, expected)
+        assert not result.flags.writeable
+        del result
+
+
+def test_user_023_pool_reuses_dropped_results(make_image):
+    image = make_image()
+    pool = OutputBuffers()
+    first = pool.empty(image.shape, image.dtype)
+    address = first.ctypes.data
+    del first
+    assert pool.empty(image.shape, image.dtype).ctypes.data == address
+    assert pool.stats()['reused'] == 1
+
+
+def test_user_023_pool_skips_referenced_buffers(make_image):
+    image = make_image()
+    pool = OutputBuffers()
+    held = pool.empty(image.shape, image.dtype)
+    view = pool.empty(image.shape, image.dtype)[10:20]
+    fresh = pool.empty(image.shape, image.dtype)
+    assert not np.shares_memory(fresh, held) and not np.shares_memory(fresh, view)
+    assert pool.stats()['reused'] == 0
+
+
+def test_user_023_pool_respects_its_budget(make_image):
+    image = make_image()
+    pool = OutputBuffers(max_bytes=image.nbytes)
+    buffers = [pool.empty(image.shape, image.dtype) for _ in range(3)]
+    assert pool.stats()['buffers'] == 1 and pool.stats()['current_bytes'] == image.nbytes
+    del buffers
+    pool.empty(image.shape[:2], image.dtype)
+    assert pool.stats()['current_bytes'] <= image.nbytes
+
+
+def test_user_023_checkpointed_results_are_not_overwritten(make_image):
+    image = make_image()
+    processor = GeometricTransformation(image)
+    processor.adjust_color_channel(ColorChannel.RED, 40)
+    adjusted = processor.current_image.copy()
+    processor.set_color_channel(ColorChannel.ALL, 0)
+    processor.set_color_channel(ColorChannel.ALL, 255)
+    processor.undo_last_transformation()
+    processor.undo_last_transformation()
+    assert np.array_equal(processor.current_image, adjusted)
+
+
+def test_user_023_reused_buffers_drop_their_derived_planes(make_image):
+    image = make_image()
+    color_buffers.clear()
+    result = GeometricTransformation(image).set_color_channel(ColorChannel.ALL, 10).current_image
+    assert derived_planes.gray(result).max() == 10
+    address = result.ctypes.data
+    del result
+    gc.collect()
+    result = GeometricTransformation(image).set_color_channel(ColorChannel.ALL, 200).current_image
+    assert result.ctypes.data == address
+    assert derived_planes.gray(result).max() == 200
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from cv_modules.geometric_transforms import GeometricTransformation
+from routes import api
+from utils.result_cache import operation_key
+
+
+def translation(tx, ty):
+    return {'transformation_type': 'translation', 'parameters': {'tx': tx, 'ty': ty}}
+
+
+def run_chain(image, chain, deferred):
+    return GeometricTransformation(image).apply_transformation_chain(chain, deferred=deferred).current_image
+
+
+@pytest.mark.parametrize('chain', [
+    [translation(200, 0), translation(-200, 0)],
+    [translation(0, -90), translation(0, 90)],
+    [translation(45, 30), translation(-60, -10), translation(15, -20)],
+])
+def test_deferred_shift_out_and_back_matches_eager(make_image, chain):
+    image = make_image(240, 320)
+    eager = run_chain(image, chain, deferred=False)
+    deferred = run_chain(image, chain, deferred=True)
+    assert np.array_equal(deferred, eager)
+
+
+@pytest.mark.parametrize('chain', [
+    [translation(37, -21), {'transformation_type': 'rotation', 'parameters': {'angle': 17}}],
+    [{'transformation_type': 'rotation', 'parameters': {'angle': 17}}, translation(60, 25)],
+])
+def test_deferred_keeps_eager_border_pixels(make_image, chain):
+    # Values start at 1, so an all-zero pixel can only be border
+    image = np.maximum(make_image(240, 320), 1)
+    eager = run_chain(image, chain, deferred=False)
+    deferred = run_chain(image, chain, deferred=True)
+    eager_border = np.all(eager == 0, axis=2)
+    assert eager_border.any()
+    assert np.all(deferred[eager_border] == 0)
+
+
+def test_deferred_flush_uses_its_own_cache_keys(upload, post, make_image):
+    image_id = upload(make_image())['image_id']
+    parameters = {'tx': 30, 'ty': 0}
+    post('apply_transformation', image_id=image_id, transformation_type='translation',
+         parameters=parameters, preview=True)
+    assert post('download_image', image_id=image_id, processor_type='transform').status_code == 200
+
+    session = api.sessions.get(image_id)
+    eager_key = operation_key(session['content_key'], 'transform', 'translation', parameters)
+    assert session['result_keys']['transform'] != eager_key
+
+
+def step(kind, **parameters):
+    return {'transformation_type': kind, 'parameters': parameters}
+
+
+def smooth_image(rows=240, cols=320):
+    y, x = np.mgrid[0:rows, 0:cols]
+    return np.dstack([(128 + 100 * np.sin(x / 25 + c) * np.cos(y / 19)).astype(np.uint8) for c in range(3)])
+
+
+@pytest.mark.parametrize('chain', [
+    [step('scaling', fx=0.37)],
+    [step('scaling', fx=0.5), step('rotation', angle=17)],
+    [step('resize', width=200, height=100), step('flip', flip_code=1)],
+    [step('rotation', angle=17), step('scaling', fx=0.6, fy=1.2)],
+])
+def test_user_021_deferred_downscales_match_eager(make_image, chain):
+    # Downscales are rendered with cv2.resize, which averages instead of sampling
+    image = make_image(240, 320)
+    assert np.array_equal(run_chain(image, chain, deferred=True), run_chain(image, chain, deferred=False))
+
+
+@pytest.mark.parametrize('fx', [1.3, 1.7, 2.5])
+def test_user_021_deferred_upscale_tolerance(fx):
+    # Worst case is random noise: sample positions rounded to 1/32 px on full-range gradients
+    image = np.random.RandomState(21).randint(0, 256, (240, 320, 3), np.uint8)
+    chain = [step('scaling', fx=fx)]
+    difference = np.abs(run_chain(image, chain, True).astype(int) - run_chain(image, chain, False))
+    assert difference.max() <= 6
+
+
+@pytest.mark.parametrize('chain', [
+    [step('rotation', angle=17), step('scaling', fx=1.5)],
+    [step('resize', width=400, height=300), step('rotation', angle=30)],
+    [step('rotation', angle=17), translation(5.5, 3)],
+])
+def test_user_021_composed_interpolation_tolerance(chain):
+    # One resampling instead of several: close on smooth content, not bit-identical
+    image = smooth_image()
+    eager = run_chain(image, chain, deferred=False).astype(int)
+    deferred = run_chain(image, chain, deferred=True).astype(int)
+    assert eager.shape == deferred.shape
+    assert np.abs(eager - deferred).mean() < 1
@@ -0,0 +1,38 @@
+import cv2
+import numpy as np
+import pytest
+
+from cv_modules.image_filters import AdvancedImageProcessor, FilterType
+
+
+def gaussian_kernel(size, sigma):
+    column = cv2.getGaussianKernel(size, sigma)
+    return (column @ column.T).astype(np.float32)
+
+
+def random_kernel(size, seed=0):
+    kernel = np.random.RandomState(seed).rand(size, size).astype(np.float32)
+    return kernel / kernel.sum()
+
+
+@pytest.mark.parametrize('kernel, delta, path', [
+    (gaussian_kernel(15, 3), 0, 'separable'),
+    (np.outer([1, 2, 1], [-1, 0, 1]).astype(np.float32), 10, 'separable'),
+    (random_kernel(61), 3, 'dft'),
+    (np.float32([[0, -1, 0], [-1, 5, -1], [0, -1, 0]]), 0, 'direct'),
+])
+def test_user_014_custom_kernel_paths_match_filter2d(make_image, kernel, delta, path):
+    image = make_image()
+    processor = AdvancedImageProcessor(image)
+    result = processor.apply_filter('custom', kernel=kernel, delta=delta)
+    assert processor.get_history()[-1].metadata['path'] == path
+    # Separable and DFT paths round differently from filter2D by at most one level
+    expected = cv2.filter2D(image, -1, kernel, delta=delta)
+    assert np.abs(result.astype(int) - expected).max() <= 1
+
+
+def test_user_014_dft_threshold_follows_filter_config(make_image):
+    processor = AdvancedImageProcessor(make_image())
+    processor.set_custom_filter_config(FilterType.CUSTOM.value, {'dft_min_area': 9})
+    processor.apply_filter('custom', kernel=random_kernel(5))
+    assert processor.get_history()[-1].metadata['path'] == 'dft'
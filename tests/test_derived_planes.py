@@ -0,0 +1,39 @@
+import gc
+
+import numpy as np
+
+from cv_modules.derived_planes import DerivedPlanes, derived_planes
+from cv_modules.image_filters import AdvancedImageProcessor
+from cv_modules.shared_buffer import freeze
+
+
+def test_user_016_caller_writes_are_not_served_from_cache():
+    image = np.zeros((50, 50, 3), np.uint8)
+    assert AdvancedImageProcessor(image).apply_filter('threshold', thresh=10).max() == 0
+    # The processor only holds a read-only view; the caller can still write the buffer
+    image[:] = 200
+    assert AdvancedImageProcessor(image).apply_filter('threshold', thresh=10).max() == 255
+
+
+def test_user_016_processor_results_are_cached(make_image):
+    planes = DerivedPlanes()
+    result = AdvancedImageProcessor(make_image()).apply_filter('gaussian_blur', ksize=5)
+    assert not result.flags.writeable
+    first = planes.gray(result)
+    assert planes.gray(result) is first
+    assert planes.stats()['hits'] == 1
+
+
+def test_user_016_planes_are_dropped_with_their_buffer(make_image):
+    planes = DerivedPlanes()
+    image = freeze(make_image())
+    planes.hsv(image)
+    assert planes.stats()['entries'] == 1
+    del image
+    gc.collect()
+    assert planes.stats() == dict(planes.stats(), entries=0, current_bytes=0)
+
+
+def test_user_016_shared_instance_serves_frozen_uploads(make_image):
+    image = freeze(make_image())
+    assert derived_planes.gray(image) is derived_planes.gray(image[:])
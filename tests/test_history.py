@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from cv_modules.geometric_transforms import ColorChannel, GeometricTransformation
+from cv_modules.image_filters import AdvancedImageProcessor
+
+FILTER_CHAIN = [
+    {'filter_type': 'gaussian_blur', 'parameters': {'ksize': 5}},
+    {'filter_type': 'median_blur', 'parameters': {'ksize': 3}},
+    {'filter_type': 'gamma_correction', 'parameters': {'gamma': 1.4}},
+    {'filter_type': 'bilateral_filter', 'parameters': {'d': 5}},
+    {'filter_type': 'laplacian', 'parameters': {'ksize': 3}},
+]
+
+
+def replayed(image, chain):
+    processor = AdvancedImageProcessor(image)
+    for item in chain:
+        processor.apply_filter(item['filter_type'], **item['parameters'])
+    return processor.current_image
+
+
+@pytest.mark.parametrize('step', [4, 2, 0])
+def test_user_012_jump_to_step_matches_replay(make_image, step):
+    image = make_image()
+    processor = AdvancedImageProcessor(image)
+    for item in FILTER_CHAIN:
+        processor.apply_filter(item['filter_type'], **item['parameters'])
+    assert np.array_equal(processor.jump_to_step(step), replayed(image, FILTER_CHAIN[:step]))
+    assert len(processor.get_history()) == step
+
+
+def test_user_012_undo_after_jump_and_new_filters(make_image):
+    image = make_image()
+    processor = AdvancedImageProcessor(image)
+    for item in FILTER_CHAIN:
+        processor.apply_filter(item['filter_type'], **item['parameters'])
+    processor.jump_to_step(1)
+    processor.apply_filter('gamma_correction', gamma=0.5)
+    processor.apply_filter('median_blur', ksize=5)
+    expected = replayed(image, FILTER_CHAIN[:1] + [{'filter_type': 'gamma_correction', 'parameters': {'gamma': 0.5}}])
+    assert np.array_equal(processor.undo_last_filter(), expected)
+
+
+def test_user_012_transformation_undo_matches_replay(make_image):
+    image = make_image()
+    transformer = GeometricTransformation(image)
+    transformer.rotate(17).adjust_color_channel(ColorChannel.RED, 40).translate(12, -7).flip(1)
+    transformer.undo_last_transformation()
+    expected = GeometricTransformation(image).rotate(17).adjust_color_channel(ColorChannel.RED, 40).translate(12, -7)
+    assert np.array_equal(transformer.current_image, expected.current_image)
+
+    transformer.jump_to_step(1)
+    assert np.array_equal(transformer.current_image, GeometricTransformation(image).rotate(17).current_image)
+    assert len(transformer.get_history()) == 1
@@ -0,0 +1,78 @@
+import io
+
+import cv2
+import numpy as np
+import pytest
+
+from routes import api
+
+
+@pytest.mark.parametrize('output', [{'format': 'gif'}, {'quality': 'high'}, {'preset': 'tiny'},
+                                    {'format': 'png', 'compression': 12}])
+def test_invalid_output_options_are_rejected_before_processing(upload, post, make_image, monkeypatch, output):
+    image_id = upload(make_image())['image_id']
+    calls = []
+    monkeypatch.setattr(api, 'get_session', lambda *args: calls.append(args))
+
+    response = post('apply_filter', image_id=image_id, filter_type='gaussian_blur',
+                    parameters={'ksize': 5}, output=output)
+    assert response.status_code == 400
+    assert not calls
+
+
+@pytest.mark.parametrize('output, accept, extension', [
+    ({}, 'application/json', '.png'),
+    ({'format': 'webp'}, 'application/json', '.webp'),
+    ({'preset': 'photo'}, 'application/json', '.jpg'),
+    ({}, 'image/jpeg', '.jpg'),
+])
+def test_download_filename_matches_encoded_format(client, upload, make_image, output, accept, extension):
+    image_id = upload(make_image())['image_id']
+    response = client.post('/api/download_image', json={'image_id': image_id, 'output': output},
+                           headers={'Accept': accept})
+    assert response.status_code == 200
+    if accept == 'application/json':
+        filename = response.get_json()['filename']
+    else:
+        filename = response.headers['X-Image-Metadata']
+    assert f'processed_image_{image_id}{extension}' in filename
+
+
+def test_multipart_response_reports_encode_time(client, upload, make_image):
+    image_id = upload(make_image())['image_id']
+    response = client.post('/api/download_image', json={'image_id': image_id, 'output': {'format': 'webp'}},
+                           headers={'Accept': 'multipart/form-data'})
+    assert response.status_code == 200
+    assert 'encode-webp;dur=' in response.headers['Server-Timing']
+
+
+def post_upload(client, image, headers=None, **fields):
+    ok, buffer = cv2.imencode('.png', image)
+    data = dict(fields, file=(io.BytesIO(buffer.tobytes()), 'image.png'))
+    response = client.post('/api/upload', data=data, content_type='multipart/form-data', headers=headers or {})
+    assert response.status_code == 200
+    return response, buffer.tobytes()
+
+
+def test_user_005_upload_reuses_bytes_that_match_the_output(client, make_image):
+    response, uploaded = post_upload(client, make_image(), headers={'Accept': 'image/png'})
+    assert response.mimetype == 'image/png'
+    assert response.data == uploaded
+
+
+@pytest.mark.parametrize('headers, fields, mimetype', [
+    ({'Accept': 'image/webp'}, {}, 'image/webp'),
+    ({'Accept': 'image/jpeg'}, {}, 'image/jpeg'),
+    ({'Accept': 'image/jpeg'}, {'output_quality': '60'}, 'image/jpeg'),
+])
+def test_user_005_upload_preview_follows_negotiated_output(client, make_image, decode, headers, fields, mimetype):
+    image = make_image()
+    response, uploaded = post_upload(client, image, headers=headers, **fields)
+    assert response.mimetype == mimetype
+    assert response.data != uploaded
+    assert cv2.imdecode(np.frombuffer(response.data, np.uint8), cv2.IMREAD_COLOR).shape == image.shape
+
+
+def test_user_005_json_upload_preview_uses_requested_format(client, make_image):
+    response, _ = post_upload(client, make_image(), output_format='webp')
+    assert response.get_json()['image_data'].startswith('data:image/webp;base64,')
@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from cv_modules.image_filters import AdvancedImageProcessor, ImageProcessingException
+
+CHAIN = [
+    {'filter_type': 'gaussian_blur', 'parameters': {'ksize': 5}},
+    {'filter_type': 'gamma_correction', 'parameters': {'gamma': 1.4}},
+    {'filter_type': 'median_blur', 'parameters': {'ksize': 3}},
+]
+
+
+@pytest.mark.parametrize('backend', ['serial', 'thread', 'process'])
+def test_user_020_batch_backends_match_single_image_chain(make_image, backend):
+    images = [make_image() for _ in range(4)]
+    results = AdvancedImageProcessor(images[0]).batch_process(images, CHAIN, backend=backend, max_workers=2)
+    for result, image in zip(results, images):
+        assert np.array_equal(result, AdvancedImageProcessor(image).apply_filter_chain(CHAIN))
+
+
+def test_user_020_failed_images_are_reported_in_order(make_image):
+    images = [make_image(), np.zeros((0, 0, 3), np.uint8), make_image()]
+    results = AdvancedImageProcessor(images[0]).parallel_batch_process(images, CHAIN, max_workers=2)
+    assert [result.success for result in results] == [True, False, True]
+    with pytest.raises(ImageProcessingException, match='image 1'):
+        AdvancedImageProcessor(images[0]).batch_process(images, CHAIN, max_workers=2)
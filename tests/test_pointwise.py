@@ -0,0 +1,54 @@
+import cv2
+import numpy as np
+import pytest
+
+from cv_modules.geometric_transforms import ColorChannel, GeometricTransformation
+from cv_modules.image_filters import AdvancedImageProcessor
+
+
+def filter_step(filter_type, **parameters):
+    return {'filter_type': filter_type, 'parameters': parameters}
+
+
+def step_by_step(image, chain):
+    processor = AdvancedImageProcessor(image)
+    for item in chain:
+        processor.apply_filter(item['filter_type'], **item['parameters'])
+    return processor.current_image
+
+
+@pytest.mark.parametrize('chain', [
+    [filter_step('gamma_correction', gamma=1.8), filter_step('gamma_correction', gamma=0.6)],
+    [filter_step('gamma_correction', gamma=0.5), filter_step('gamma_correction', gamma=2.2),
+     filter_step('gamma_correction', gamma=1.1)],
+    [filter_step('gamma_correction', gamma=1.4), filter_step('gaussian_blur', ksize=5),
+     filter_step('gamma_correction', gamma=0.8), filter_step('gamma_correction', gamma=1.3)],
+])
+def test_user_011_fused_filter_chain_matches_step_by_step(make_image, chain):
+    image = make_image()
+    processor = AdvancedImageProcessor(image)
+    assert np.array_equal(processor.apply_filter_chain(chain), step_by_step(image, chain))
+    assert len(processor.get_history()) == len(chain)
+
+
+def test_user_011_fused_threshold_chain_on_gray(make_image):
+    image = cv2.cvtColor(make_image(), cv2.COLOR_BGR2GRAY)
+    chain = [filter_step('gamma_correction', gamma=0.7),
+             filter_step('threshold', thresh=90, maxval=200, type=cv2.THRESH_TRUNC),
+             filter_step('threshold', thresh=60, type=cv2.THRESH_BINARY_INV)]
+    assert np.array_equal(AdvancedImageProcessor(image).apply_filter_chain(chain), step_by_step(image, chain))
+
+
+def test_user_011_fused_color_run_matches_step_by_step(make_image):
+    image = make_image()
+    adjustments = [(ColorChannel.RED, 120), (ColorChannel.ALL, -80), (ColorChannel.BLUE, 200), (ColorChannel.RED, -30)]
+    chain = [{'transformation_type': 'color_adjustment', 'parameters': {'channel': channel, 'value': value}}
+             for channel, value in adjustments]
+    fused = GeometricTransformation(image).apply_transformation_chain(chain)
+
+    eager = GeometricTransformation(image)
+    for channel, value in adjustments:
+        eager.adjust_color_channel(channel, value)
+    # Per-step clipping is kept: 120 then -80 on red is not the same as +40
+    assert np.array_equal(fused.current_image, eager.current_image)
+    assert len(fused.get_history()) == len(adjustments)
@@ -0,0 +1,79 @@
+import numpy as np
+
+from cv_modules.geometric_transforms import GeometricTransformation
+from routes import api
+
+
+def test_preview_crop_at_image_corner(upload, post, make_image, decode):
+    image = make_image(1537, 2049)
+    image_id = upload(image)['image_id']
+    crop = {'x': 2048, 'y': 1536, 'width': 1, 'height': 1}
+
+    response = post('apply_transformation', image_id=image_id, transformation_type='crop',
+                    parameters=crop, preview=True)
+    assert response.status_code == 200, response.get_json()
+
+    response = post('download_image', image_id=image_id, processor_type='transform')
+    assert np.array_equal(decode(response.get_json()['image_data']), image[1536:, 2048:])
+
+
+def test_preview_rejects_crop_outside_full_image(upload, post, make_image):
+    image_id = upload(make_image(1537, 2049))['image_id']
+    response = post('apply_transformation', image_id=image_id, transformation_type='crop',
+                    parameters={'x': 2000, 'y': 0, 'width': 60, 'height': 10}, preview=True)
+    assert response.status_code == 500
+
+
+def test_failed_flush_keeps_plane_and_pending_edits(upload, post, make_image, decode, monkeypatch):
+    image = make_image()
+    image_id = upload(image)['image_id']
+    for angle in (10, 20):
+        post('apply_transformation', image_id=image_id, transformation_type='rotation',
+             parameters={'angle': angle}, preview=True)
+
+    apply_transform = api.PLANE_OPERATIONS['transform']
+    calls = []
+
+    def fail_second(processor, operation_type, parameters):
+        calls.append(operation_type)
+        if len(calls) == 2:
+            raise RuntimeError('simulated failure')
+        apply_transform(processor, operation_type, parameters)
+
+    monkeypatch.setitem(api.PLANE_OPERATIONS, 'transform', fail_second)
+    assert post('download_image', image_id=image_id, processor_type='transform').status_code == 500
+    session = api.sessions.get(image_id)
+    assert session['geometric_transformer'].get_history() == []
+    assert len(session['pending']['transform']) == 2
+
+    # The retry applies each edit exactly once
+    monkeypatch.setitem(api.PLANE_OPERATIONS, 'transform', apply_transform)
+    response = post('download_image', image_id=image_id, processor_type='transform')
+    chain = [{'transformation_type': 'rotation', 'parameters': {'angle': angle}} for angle in (10, 20)]
+    expected = GeometricTransformation(image).apply_transformation_chain(chain, deferred=True).current_image
+    assert np.array_equal(decode(response.get_json()['image_data']), expected)
+    assert len(api.sessions.get(image_id)['geometric_transformer'].get_history()) == 2
+
+
+def test_user_008_failed_flush_leaves_live_checkpoints_and_configs(upload, post, make_image, monkeypatch):
+    image_id = upload(make_image())['image_id']
+    session = api.sessions.get(image_id)
+    live = session['image_processor']
+    # Checkpoint every step, so a replay that shared the history would leave one behind
+    live.checkpoints.min_replay_seconds = 0
+    for ksize in (5, 9):
+        post('apply_filter', image_id=image_id, filter_type='gaussian_blur', parameters={'ksize': ksize}, preview=True)
+
+    apply_filter = api.PLANE_OPERATIONS['filter']
+
+    def fail_second(processor, operation_type, parameters):
+        processor.set_custom_filter_config('replay', {'kernel': [[1]]})
+        if len(processor.history) == 1:
+            raise RuntimeError('simulated failure')
+        apply_filter(processor, operation_type, parameters)
+
+    monkeypatch.setitem(api.PLANE_OPERATIONS, 'filter', fail_second)
+    assert post('download_image', image_id=image_id, processor_type='filter').status_code == 500
+    assert session['image_processor'] is live
+    assert live.checkpoints.stats()['checkpoints'] == []
+    assert live.filter_configs == {}
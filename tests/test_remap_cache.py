@@ -0,0 +1,53 @@
+import cv2
+import numpy as np
+import pytest
+
+from cv_modules.geometric_transforms import GeometricTransformation
+from cv_modules.remap_cache import remap_perspective, remap_polar
+
+SOURCE_POINTS = np.float32([[0, 0], [159, 0], [159, 119], [0, 119]])
+TARGET_POINTS = np.float32([[10, 5], [150, 12], [155, 115], [3, 110]])
+
+
+@pytest.mark.parametrize('interpolation', [cv2.INTER_LINEAR, cv2.INTER_NEAREST, cv2.INTER_CUBIC])
+def test_user_022_remap_perspective_matches_warp_perspective(make_image, interpolation):
+    image = make_image()
+    matrix = cv2.getPerspectiveTransform(SOURCE_POINTS, TARGET_POINTS)
+    expected = cv2.warpPerspective(image, matrix, (160, 120), flags=interpolation)
+    # First call builds the tables, the second one reads them from the cache
+    for _ in range(2):
+        assert np.array_equal(remap_perspective(image, matrix, (160, 120), interpolation, min_uses=1), expected)
+
+
+@pytest.mark.parametrize('log_polar', [False, True])
+@pytest.mark.parametrize('inverse, dsize', [(False, None), (False, (90, 200)), (True, (120, 120))])
+def test_user_022_remap_polar_matches_warp_polar(make_image, log_polar, inverse, dsize):
+    image = make_image()
+    flags = cv2.INTER_LINEAR | cv2.WARP_FILL_OUTLIERS
+    flags |= cv2.WARP_POLAR_LOG if log_polar else 0
+    flags |= cv2.WARP_INVERSE_MAP if inverse else 0
+    expected = cv2.warpPolar(image, dsize or (0, 0), (80, 60), 55, flags)
+    for _ in range(2):
+        assert np.array_equal(remap_polar(image, (80, 60), 55, dsize, log_polar, inverse), expected)
+
+
+def test_user_022_repeated_perspective_transform_matches_warp(make_image):
+    image = make_image()
+    matrix = cv2.getPerspectiveTransform(SOURCE_POINTS, TARGET_POINTS)
+    expected = cv2.warpPerspective(image, matrix, (160, 120))
+    for _ in range(3):
+        transformer = GeometricTransformation(image).perspective_transform(SOURCE_POINTS, TARGET_POINTS)
+        assert np.array_equal(transformer.current_image, expected)
+
+
+def test_user_024_crop_is_a_window_on_the_original(make_image):
+    image = make_image()
+    transformer = GeometricTransformation(image).crop(10, 20, 100, 60).crop(5, 5, 50, 30)
+    assert transformer.get_roi() == (15, 25, 50, 30)
+    assert np.shares_memory(transformer.current_image, transformer.original_image)
+    assert np.array_equal(transformer.current_image, image[25:55, 15:65])
+
+    # Later steps read the window and produce an independent result
+    transformer.flip(1)
+    assert transformer.get_roi() is None
+    assert np.array_equal(transformer.current_image, image[25:55, 15:65][:, ::-1])
@@ -0,0 +1,45 @@
+import numpy as np
+
+from cv_modules.image_filters import AdvancedImageProcessor, FilterType
+
+
+def test_reset_batch_processor_restores_filter_plane(upload, post, make_image, decode):
+    image = make_image()
+    image_id = upload(image)['image_id']
+    blurred = post('apply_filter', image_id=image_id, filter_type='gaussian_blur',
+                   parameters={'ksize': 15}).get_json()['result_image']
+
+    assert post('reset_batch_processor', image_id=image_id).status_code == 200
+
+    response = post('download_image', image_id=image_id, processor_type='filter')
+    downloaded = decode(response.get_json()['image_data'])
+    assert np.array_equal(downloaded, image)
+    assert not np.array_equal(downloaded, decode(blurred))
+
+
+def test_reset_batch_processor_restarts_result_chain(upload, post, make_image, decode):
+    image = make_image()
+    image_id = upload(image)['image_id']
+    blur = dict(image_id=image_id, filter_type='gaussian_blur', parameters={'ksize': 15})
+    post('apply_filter', **blur)
+    post('reset_batch_processor', image_id=image_id)
+    post('apply_filter', **blur)
+
+    # Replaying blur twice from the original walks the cached chain; it must not
+    # find the single-blur result stored under the "blur twice" key
+    post('reset_image', image_id=image_id)
+    once = decode(post('apply_filter', **blur).get_json()['result_image'])
+    twice = decode(post('apply_filter', **blur).get_json()['result_image'])
+    expected = AdvancedImageProcessor(once).apply_filter(FilterType.GAUSSIAN_BLUR, ksize=15)
+    assert np.array_equal(twice, expected)
+
+
+def test_reset_batch_processor_discards_pending_previews(upload, post, make_image, decode):
+    image = make_image()
+    image_id = upload(image)['image_id']
+    post('apply_transformation', image_id=image_id, transformation_type='rotation',
+         parameters={'angle': 30}, preview=True)
+    post('reset_batch_processor', image_id=image_id)
+
+    response = post('download_image', image_id=image_id, processor_type='transform')
+    assert np.array_equal(decode(response.get_json()['image_data']), image)
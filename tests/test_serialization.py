@@ -0,0 +1,23 @@
+import json
+
+import numpy as np
+
+from app import app as flask_app
+from utils.responses import encoded_image, image_response
+from utils.serialization import dumps
+
+
+def test_ascii_dumps_escapes_non_ascii_text():
+    payload = {'name': 'صورة', 'emoji': '\U0001F600', 'value': np.float32(1.5)}
+    text = dumps(payload, ensure_ascii=True)
+    assert text.isascii()
+    assert json.loads(text) == {'name': 'صورة', 'emoji': '\U0001F600', 'value': 1.5}
+
+
+def test_image_metadata_header_is_latin1_safe():
+    image = np.zeros((8, 8, 3), np.uint8)
+    with flask_app.test_request_context('/', headers={'Accept': 'image/png'}):
+        response = image_response({'image_data': encoded_image(image), 'message': 'تم التطبيق'})
+    header = response.headers['X-Image-Metadata']
+    header.encode('latin-1')
+    assert json.loads(header)['message'] == 'تم التطبيق'
@@ -0,0 +1,114 @@
+import threading
+
+import numpy as np
+import pytest
+
+from routes import api
+from utils.session_backend import create_backend
+from utils.session_store import SessionStore
+
+
+@pytest.fixture
+def shared_backend(tmp_path, monkeypatch):
+    backend = create_backend('shared', str(tmp_path))
+    monkeypatch.setattr(api, 'backend', backend)
+    return backend
+
+
+def test_deduplicated_upload_gets_its_own_session(upload, post, make_image, decode):
+    image = make_image()
+    first = upload(image)
+    post('apply_filter', image_id=first['image_id'], filter_type='gaussian_blur', parameters={'ksize': 15})
+
+    second = upload(image)
+    assert second['deduplicated']
+    assert second['image_id'] != first['image_id']
+
+    # The decoded buffer is shared, the processors and their history are not
+    originals = [api.sessions.get(upload_['image_id'])['original_image'] for upload_ in (first, second)]
+    assert np.shares_memory(*originals)
+    response = post('download_image', image_id=second['image_id'], processor_type='filter')
+    assert np.array_equal(decode(response.get_json()['image_data']), image)
+
+
+def test_deduplicated_upload_shares_the_original_file(shared_backend, upload, post, make_image, decode):
+    image = make_image()
+    first = upload(image)
+    second = upload(image)
+    assert second['deduplicated'] and second['image_id'] != first['image_id']
+
+    # Releasing the first upload must not take the second one's original with it
+    assert post('release_image', image_id=first['image_id']).status_code == 200
+    api.sessions.pop(second['image_id'])
+    response = post('download_image', image_id=second['image_id'], processor_type='filter')
+    assert np.array_equal(decode(response.get_json()['image_data']), image)
+
+
+def test_release_from_another_worker(shared_backend, upload, post, make_image):
+    image_id = upload(make_image())['image_id']
+    # A worker that never saw the upload can still release it
+    local = api.sessions.pop(image_id)
+    assert post('release_image', image_id=image_id).status_code == 200
+    assert shared_backend.load_meta(image_id) is None
+
+    # The worker that uploaded it drops its copy on the next lookup
+    api.sessions.put(image_id, local)
+    assert post('download_image', image_id=image_id).status_code == 404
+    assert image_id not in api.sessions
+
+
+def test_budget_evicts_least_recently_used():
+    store = SessionStore(max_bytes=3000, ttl_seconds=0)
+    for key in 'abc':
+        store.put(key, np.zeros(1000, np.uint8))
+    store.get('a')
+    store.put('d', np.zeros(1000, np.uint8))
+    assert store.keys() == ['c', 'a', 'd']
+    assert store.current_bytes <= store.max_bytes
+
+
+def test_release_keeps_the_shared_buffer_of_other_uploads(upload, post, make_image, decode):
+    image = make_image()
+    first, second = upload(image), upload(image)
+    response = post('release_image', image_id=first['image_id'])
+    assert response.get_json() == {'success': True}
+    assert first['image_id'] not in api.sessions
+
+    response = post('download_image', image_id=second['image_id'], processor_type='filter')
+    assert np.array_equal(decode(response.get_json()['image_data']), image)
+
+
+def test_session_stats_do_not_expose_image_ids(client, upload, make_image):
+    image_id = upload(make_image())['image_id']
+    response = client.get('/api/session_stats')
+    assert response.status_code == 200
+    assert image_id not in response.get_data(as_text=True)
+    stats = response.get_json()
+    assert stats['entries'] >= 1 and stats['largest_sizes'] == sorted(stats['largest_sizes'], reverse=True)
+
+
+def test_concurrent_publishes_keep_every_version(shared_backend, upload, make_image):
+    image_id = upload(make_image())['image_id']
+    session = api.sessions.get(image_id)
+    threads, rounds = 8, 10
+
+    def publish():
+        # Each thread stands in for a worker with its own copy of the session
+        own = dict(session)
+        for _ in range(rounds):
+            api.publish_session(image_id, own, planes=['filter'])
+
+    workers = [threading.Thread(target=publish) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert shared_backend.load_meta(image_id)['version'] == threads * rounds
+
+
+def test_publish_does_not_resurrect_released_session(shared_backend, upload, post, make_image):
+    image_id = upload(make_image())['image_id']
+    session = api.sessions.get(image_id)
+    assert post('release_image', image_id=image_id).status_code == 200
+    api.publish_session(image_id, session, planes=['filter'])
+    assert shared_backend.load_meta(image_id) is None
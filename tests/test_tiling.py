@@ -0,0 +1,42 @@
+import cv2
+import numpy as np
+import pytest
+
+from cv_modules.image_filters import AdvancedImageProcessor
+from cv_modules.morphology import decomposed_morphology, decomposition, structuring_element
+
+
+def run(image, tiled, filter_type, **parameters):
+    processor = AdvancedImageProcessor(image)
+    # Every image counts as large, so even the small fixtures run in strips
+    processor.set_tiling(tiled, min_pixels=0, max_workers=4)
+    return processor.apply_filter(filter_type, **parameters)
+
+
+@pytest.mark.parametrize('filter_type, parameters', [
+    ('median_blur', {'ksize': 7}),
+    ('bilateral_filter', {'d': 9}),
+    ('morphological', {'operation': cv2.MORPH_GRADIENT, 'kernel_size': 5, 'iterations': 2}),
+    ('morphological', {'operation': cv2.MORPH_OPEN, 'kernel_size': 51, 'kernel_shape': cv2.MORPH_CROSS}),
+])
+def test_user_015_tiled_filters_are_bit_identical(make_image, filter_type, parameters):
+    image = make_image(240, 320)
+    assert np.array_equal(run(image, True, filter_type, **parameters), run(image, False, filter_type, **parameters))
+
+
+@pytest.mark.parametrize('kernel_shape, kernel_size, iterations', [
+    (cv2.MORPH_RECT, 101, 1),
+    (cv2.MORPH_RECT, 35, 4),
+    (cv2.MORPH_CROSS, 51, 2),
+])
+@pytest.mark.parametrize('operation', [
+    cv2.MORPH_ERODE, cv2.MORPH_DILATE, cv2.MORPH_OPEN, cv2.MORPH_CLOSE,
+    cv2.MORPH_GRADIENT, cv2.MORPH_TOPHAT, cv2.MORPH_BLACKHAT,
+])
+def test_user_019_morphology_decomposition_is_bit_identical(make_image, kernel_shape, kernel_size,
+                                                            iterations, operation):
+    image = make_image(240, 320)
+    assert decomposition(kernel_shape, kernel_size, iterations, operation, image.dtype) is not None
+    expected = cv2.morphologyEx(image, operation, structuring_element(kernel_shape, kernel_size),
+                                iterations=iterations)
+    assert np.array_equal(decomposed_morphology(image, operation, kernel_shape, kernel_size, iterations), expected)
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from cv_modules.geometric_transforms import ColorChannel, GeometricTransformation
+from cv_modules.transform_sequence import TransformSequence
+
+
+def step(transformation_type, **parameters):
+    return {'transformation_type': transformation_type, 'parameters': parameters}
+
+
+def eager(image, chain):
+    return GeometricTransformation(image).apply_transformation_chain(chain).current_image
+
+
+@pytest.mark.parametrize('chain', [
+    [step('translation', tx=200, ty=0), step('translation', tx=-200, ty=0)],
+    [step('translation', tx=40, ty=-30), step('color_adjustment', channel=ColorChannel.RED, value=25),
+     step('translation', tx=-40, ty=30), step('crop', x=10, y=20, width=100, height=60)],
+    [step('flip', flip_code=1), step('translation', tx=0, ty=70), step('translation', tx=0, ty=-70)],
+])
+def test_sequence_matches_eager_chain(make_image, chain):
+    images = [make_image(240, 320) for _ in range(3)]
+    sequence = TransformSequence(chain, images[0].shape)
+    result = sequence.run(images, backend='serial')
+    assert result.stats.failed == 0
+    for item, image in zip(result.results, images):
+        assert np.array_equal(item.image, eager(image, chain))
+
+
+def test_sequence_keeps_eager_border_pixels(make_image):
+    chain = [step('translation', tx=37, ty=-21), step('rotation', angle=17)]
+    images = [np.maximum(make_image(240, 320), 1) for _ in range(2)]
+    result = TransformSequence(chain, images[0].shape).run(images, backend='thread', max_workers=2)
+    for item, image in zip(result.results, images):
+        eager_border = np.all(eager(image, chain) == 0, axis=2)
+        assert eager_border.any()
+        assert np.all(item.image[eager_border] == 0)
+
+
+def test_sequence_reports_mismatched_images_in_order(make_image):
+    chain = [step('rotation', angle=5)]
+    images = [make_image(240, 320), make_image(100, 100), make_image(240, 320)]
+    result = TransformSequence(chain, images[0].shape).run(images, backend='thread', max_workers=2)
+    assert [item.index for item in result.results] == [0, 1, 2]
+    assert [item.success for item in result.results] == [True, False, True]
+    assert result.stats.failed == 1
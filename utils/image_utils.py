@@ -3,17 +3,47 @@ import numpy as np
 import base64
 from PIL import Image
 import io
+import time
+import hashlib
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'bmp', 'tiff'}
 
+# Output formats for encoded results: name -> (OpenCV extension, MIME type)
+IMAGE_FORMATS = {
+    'png': ('.png', 'image/png'),
+    'jpeg': ('.jpg', 'image/jpeg'),
+    'webp': ('.webp', 'image/webp')
+}
+
+# Named output settings; 'lossless-fast' trades file size for the quickest encode
+ENCODE_PRESETS = {
+    'lossless-fast': {'format': 'png', 'compression': 1},
+    'lossless-small': {'format': 'png', 'compression': 9},
+    'preview': {'format': 'webp', 'quality': 80},
+    'photo': {'format': 'jpeg', 'quality': 90}
+}
+
+# Upload formats that browsers can display directly, without re-encoding
+BROWSER_MIME_TYPES = {'png': 'image/png', 'jpg': 'image/jpeg', 'jpeg': 'image/jpeg', 'bmp': 'image/bmp'}
+
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def content_hash(image_bytes):
+    """Hash uploaded bytes to identify identical images"""
+    return hashlib.blake2b(image_bytes, digest_size=20).hexdigest()
+
+def browser_mime_type(filename):
+    """MIME type of an upload browsers can display as-is, or None"""
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return BROWSER_MIME_TYPES.get(extension)
+
 def load_image(image_bytes):
     """Load image from bytes"""
     try:
@@ -35,14 +65,109 @@ def save_image(image, filepath):
         logger.error(f"Error saving image: {str(e)}")
         return False
 
-def image_to_base64(image):
+class EncodeStats:
+    """Thread-safe per-format encode timing, used to tune latency against bandwidth"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._formats = {}
+
+    def record(self, image_format, seconds, nbytes, pixels):
+        with self._lock:
+            stats = self._formats.setdefault(image_format, {
+                'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0, 'total_bytes': 0, 'total_pixels': 0
+            })
+            stats['count'] += 1
+            stats['total_seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+            stats['total_bytes'] += nbytes
+            stats['total_pixels'] += pixels
+
+    def snapshot(self):
+        with self._lock:
+            report = {}
+            for image_format, stats in self._formats.items():
+                count = stats['count']
+                report[image_format] = {
+                    'count': count,
+                    'avg_ms': stats['total_seconds'] * 1000 / count,
+                    'max_ms': stats['max_seconds'] * 1000,
+                    'avg_bytes': stats['total_bytes'] / count,
+                    'bytes_per_pixel': stats['total_bytes'] / max(stats['total_pixels'], 1),
+                    'megapixels_per_second': stats['total_pixels'] / 1e6 / max(stats['total_seconds'], 1e-9)
+                }
+            return report
+
+    def reset(self):
+        with self._lock:
+            self._formats.clear()
+
+encode_stats = EncodeStats()
+
+def resolve_encode_options(requested=None, defaults=None):
+    """Merge requested output options over server defaults, expanding presets"""
+    options = {'format': 'png', 'quality': None, 'compression': None}
+    for source in (defaults, requested):
+        if not source:
+            continue
+        preset = source.get('preset')
+        if preset:
+            if preset not in ENCODE_PRESETS:
+                raise ValueError(f"Unknown output preset: {preset}")
+            options.update(ENCODE_PRESETS[preset])
+        for key in ('format', 'quality', 'compression'):
+            if source.get(key) is not None:
+                options[key] = source[key]
+
+    options['format'] = str(options['format']).lower().replace('jpg', 'jpeg')
+    if options['format'] not in IMAGE_FORMATS:
+        raise ValueError(f"Unsupported output format: {options['format']}")
+    if options['quality'] is not None:
+        options['quality'] = int(options['quality'])
+        # WebP treats quality above 100 as lossless
+        max_quality = 101 if options['format'] == 'webp' else 100
+        if not 1 <= options['quality'] <= max_quality:
+            raise ValueError(f"Quality must be between 1 and {max_quality}")
+    if options['compression'] is not None:
+        options['compression'] = int(options['compression'])
+        if not 0 <= options['compression'] <= 9:
+            raise ValueError("PNG compression must be between 0 and 9")
+    return options
+
+def encode_image(image, image_format='png', quality=None, compression=None, timings=None):
+    """Encode OpenCV image to bytes, returns (bytes, mime_type)
+
+    The encode time is recorded in encode_stats and, if a `timings` dict is
+    given, added to its entry for the format.
+    """
+    extension, mime_type = IMAGE_FORMATS[image_format]
+    params = []
+    if image_format == 'png' and compression is not None:
+        params = [cv2.IMWRITE_PNG_COMPRESSION, compression]
+    elif image_format == 'jpeg' and quality is not None:
+        params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+    elif image_format == 'webp' and quality is not None:
+        params = [cv2.IMWRITE_WEBP_QUALITY, quality]
+
+    start = time.perf_counter()
+    success, buffer = cv2.imencode(extension, image, params)
+    elapsed = time.perf_counter() - start
+    if not success:
+        raise ValueError(f"Failed to encode image as {image_format}")
+
+    encode_stats.record(image_format, elapsed, buffer.size, image.shape[0] * image.shape[1])
+    if timings is not None:
+        timings[image_format] = timings.get(image_format, 0.0) + elapsed
+    return buffer.tobytes(), mime_type
+
+def image_to_base64(image, image_format='png', quality=None, compression=None):
     """Convert OpenCV image to base64 string"""
     try:
-        # Encode image to PNG format
-        _, buffer = cv2.imencode('.png', image)
+        # Encode image (PNG by default)
+        buffer, mime_type = encode_image(image, image_format, quality, compression)
         # Convert to base64
         image_base64 = base64.b64encode(buffer).decode('utf-8')
-        return f"data:image/png;base64,{image_base64}"
+        return f"data:{mime_type};base64,{image_base64}"
     except Exception as e:
         logger.error(f"Error converting image to base64: {str(e)}")
         return None
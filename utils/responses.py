@@ -0,0 +1,331 @@
+import time
+import uuid
+import base64
+import logging
+
+import numpy as np
+from flask import Response, current_app, jsonify, request
+
+from utils.image_utils import IMAGE_FORMATS, encode_image, resolve_encode_options
+from utils.result_cache import result_cache
+from utils.serialization import add_server_timing, feature_result_fields
+from cv_modules.feature_extraction import FeatureResult
+
+logger = logging.getLogger(__name__)
+
+# Raw image types a client can ask for with the Accept header
+BINARY_IMAGE_TYPES = {
+    'image/png': 'png',
+    'image/webp': 'webp',
+    'image/jpeg': 'jpeg'
+}
+MULTIPART_TYPE = 'multipart/form-data'
+
+# Metadata larger than this does not fit comfortably in a response header
+MAX_METADATA_HEADER = 8 * 1024
+
+# Float descriptor precisions available in the compact feature format
+COMPACT_FLOAT_DTYPES = {'float32': np.float32, 'float16': np.float16}
+
+# Columns of the compact keypoint format: (name, getter, dtype)
+KEYPOINT_COLUMNS = (
+    ('x', lambda kp: kp.pt[0], np.float32),
+    ('y', lambda kp: kp.pt[1], np.float32),
+    ('size', lambda kp: kp.size, np.float32),
+    ('angle', lambda kp: kp.angle, np.float32),
+    ('response', lambda kp: kp.response, np.float32),
+    ('octave', lambda kp: kp.octave, np.int32)
+)
+
+# Per-request output settings, also accepted as `output_<name>` form/query fields
+OUTPUT_OPTION_KEYS = ('format', 'quality', 'compression', 'preset')
+
+
+class EncodedImage:
+    """Placeholder for an image in an API payload.
+
+    The responder decides how it is delivered: a base64 data URL inside
+    JSON, the body of a raw image response, or one part of a multipart
+    envelope. Already-encoded bytes (e.g. an uploaded PNG) can be passed
+    as `data` with their `mime_type` to skip encoding when they already
+    satisfy the resolved options; with an `image` as well, anything else is
+    re-encoded from it.
+
+    `options` is the dict returned by `resolve_encode_options`; `timings`
+    collects encode durations per format for the Server-Timing header.
+    Images with a `cache_key` (see utils.result_cache) are encoded once
+    per output format and served from the result cache afterwards.
+    """
+
+    __slots__ = ('image', 'data', 'mime_type', 'cache_key')
+
+    def __init__(self, image=None, data=None, mime_type=None, cache_key=None):
+        self.image = image
+        self.data = data
+        self.mime_type = mime_type
+        self.cache_key = cache_key
+
+    def reusable(self, options):
+        """Whether the pre-encoded bytes can be sent for these options"""
+        if self.data is None:
+            return False
+        if self.image is None:
+            return True
+        if self.mime_type != IMAGE_FORMATS[options['format']][1]:
+            return False
+        # PNG compression only changes the size; a requested quality needs a re-encode
+        return options['format'] == 'png' or options['quality'] is None
+
+    def encode(self, options, timings=None):
+        """Return (bytes, mime_type), reusing pre-encoded bytes when they fit the options"""
+        if self.reusable(options):
+            return self.data, self.mime_type
+        if self.cache_key is not None:
+            cached = result_cache.get_encoded(self.cache_key, options)
+            if cached is not None:
+                return cached
+        data, mime_type = encode_image(self.image, options['format'], options['quality'],
+                                       options['compression'], timings)
+        if self.cache_key is not None:
+            result_cache.put_encoded(self.cache_key, options, data, mime_type)
+        return data, mime_type
+
+    def to_data_url(self, options, timings=None):
+        data, mime_type = self.encode(options, timings)
+        return f"data:{mime_type};base64,{base64.b64encode(data).decode('utf-8')}"
+
+
+class EncodedArray:
+    """Placeholder for a numpy array sent as raw little-endian bytes.
+
+    Inside JSON it becomes `{"dtype", "shape", "encoding": "base64", "data"}`;
+    in a multipart envelope the bytes are an `application/octet-stream`
+    part and the metadata holds `{"$part", "dtype", "shape"}`. Either way
+    a client can rebuild it with `np.frombuffer(data, dtype).reshape(shape)`.
+    """
+
+    __slots__ = ('array',)
+
+    def __init__(self, array):
+        array = np.asarray(array)
+        self.array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder('<'))
+
+    def describe(self):
+        return {'dtype': self.array.dtype.str, 'shape': list(self.array.shape)}
+
+    def encode(self, options=None, timings=None):
+        return self.array.tobytes(), 'application/octet-stream'
+
+    def to_json(self):
+        return dict(self.describe(), encoding='base64',
+                    data=base64.b64encode(self.array.tobytes()).decode('ascii'))
+
+
+def encoded_array(array):
+    """Mark an array for compact binary delivery (None passes through)"""
+    if array is None:
+        return None
+    return EncodedArray(array)
+
+
+def encoded_image(image, cache_key=None):
+    """Mark an image for delivery in the negotiated format (None passes through)"""
+    if image is None:
+        return None
+    return EncodedImage(image=image, cache_key=cache_key)
+
+
+def feature_payload(result, compact=False, descriptor_dtype='float32'):
+    """Response fields of a FeatureResult (None passes through).
+
+    By default keypoints and descriptors are left to the JSON serializer
+    (one dict per keypoint, a flat descriptor list). In compact mode
+    descriptors become a typed array - uint8 for ORB, float32 or float16
+    for SIFT - and keypoints become columnar arrays.
+    """
+    if result is None:
+        return None
+    fields = feature_result_fields(result)
+    fields['result_image'] = encoded_image(result.image)
+    if compact:
+        descriptors = result.descriptors
+        if descriptors is not None and descriptors.dtype.kind == 'f':
+            descriptors = descriptors.astype(COMPACT_FLOAT_DTYPES[descriptor_dtype], copy=False)
+        fields['descriptors'] = encoded_array(descriptors)
+        if result.keypoints is not None:
+            count = len(result.keypoints)
+            fields['keypoints'] = {'count': count}
+            for name, getter, dtype in KEYPOINT_COLUMNS:
+                column = np.fromiter((getter(kp) for kp in result.keypoints), dtype, count)
+                fields['keypoints'][name] = encoded_array(column)
+    return fields
+
+
+def requested_output_options():
+    """Output options sent with the request.
+
+    JSON bodies use an `output` object, e.g. `{"output": {"format": "webp",
+    "quality": 80}}` or `{"output": {"preset": "lossless-fast"}}`; uploads
+    and GET requests use `output_format`, `output_quality`, ... fields.
+    """
+    data = request.get_json(silent=True) if request.is_json else None
+    if isinstance(data, dict) and isinstance(data.get('output'), dict):
+        return data['output']
+    source = request.form if request.form else request.args
+    options = {key: source.get(f'output_{key}') for key in OUTPUT_OPTION_KEYS}
+    return {key: value for key, value in options.items() if value not in (None, '')}
+
+
+def output_options(image_format=None):
+    """Resolve encode options: server default, then request, then Accept type"""
+    options = resolve_encode_options(requested_output_options(), current_app.config.get('IMAGE_OUTPUT'))
+    if image_format is not None and image_format != options['format']:
+        # The Accept type wins; quality and compression are re-validated for it
+        options = resolve_encode_options({'format': image_format, 'quality': options['quality'],
+                                          'compression': options['compression']})
+    return options
+
+
+def response_output_options(image_format=None):
+    """Encode options for this request's images, after content negotiation.
+
+    Raises ValueError for invalid options, so views can reject them before
+    doing any work.
+    """
+    mode = negotiate_response_mode()
+    if mode in ('json', 'multipart'):
+        return output_options(image_format)
+    return output_options(image_format or mode)
+
+
+def _server_timing(response, timings):
+    for image_format, seconds in timings.items():
+        add_server_timing(response, f'encode-{image_format}', seconds)
+    return response
+
+
+def negotiate_response_mode():
+    """Pick 'json', 'multipart' or a raw image format from the Accept header"""
+    offers = ['application/json', MULTIPART_TYPE] + list(BINARY_IMAGE_TYPES)
+    best = request.accept_mimetypes.best_match(offers, default='application/json')
+    if best == MULTIPART_TYPE:
+        return 'multipart'
+    return BINARY_IMAGE_TYPES.get(best, 'json')
+
+
+def _replace_images(value, replace):
+    if isinstance(value, (EncodedImage, EncodedArray)):
+        return replace(value)
+    if isinstance(value, FeatureResult):
+        return _replace_images(feature_payload(value), replace)
+    if isinstance(value, dict):
+        return {key: _replace_images(item, replace) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_replace_images(item, replace) for item in value]
+    return value
+
+
+def _collect_images(payload):
+    """Swap every image and array for a part reference, returning (metadata, parts)"""
+    parts = []
+
+    def to_reference(item):
+        if isinstance(item, EncodedArray):
+            name = f'array_{len(parts)}'
+            parts.append((name, item))
+            return dict(item.describe(), **{'$part': name})
+        name = f'image_{len(parts)}'
+        parts.append((name, item))
+        return {'$part': name}
+
+    return _replace_images(payload, to_reference), parts
+
+
+def _inline(item, options, timings):
+    if isinstance(item, EncodedArray):
+        return item.to_json()
+    return item.to_data_url(options, timings)
+
+
+def _json_response(payload, options, status):
+    timings = {}
+    response = jsonify(_replace_images(payload, lambda item: _inline(item, options, timings)))
+    response.status_code = status
+    return _server_timing(response, timings)
+
+
+def _raw_image_response(metadata, image, options, status):
+    timings = {}
+    data, mime_type = image.encode(options, timings)
+    start = time.perf_counter()
+    # Header values are latin-1, so anything beyond ASCII is sent as \u escapes
+    metadata_json = current_app.json.dumps(metadata, ensure_ascii=True)
+    serialize_seconds = time.perf_counter() - start
+    response = Response(data, status=status, mimetype=mime_type)
+    response.headers['X-Image-Metadata'] = metadata_json
+    return add_server_timing(_server_timing(response, timings), 'serialize', serialize_seconds)
+
+
+def _multipart_response(metadata, parts, options, status):
+    boundary = f'cv-{uuid.uuid4().hex}'
+    start = time.perf_counter()
+    metadata_json = current_app.json.dumps(metadata)
+    serialize_seconds = time.perf_counter() - start
+
+    # Parts are encoded before the headers go out so their time can be reported;
+    # the encoded bytes are still written straight to the body, without base64
+    timings = {}
+    encoded = [(name, image, image.encode(options, timings)) for name, image in parts]
+
+    def generate():
+        # Metadata first so clients can lay out results while images stream in
+        yield (f'--{boundary}\r\n'
+               f'Content-Disposition: form-data; name="metadata"\r\n'
+               f'Content-Type: application/json\r\n\r\n').encode('utf-8')
+        yield metadata_json.encode('utf-8')
+        yield b'\r\n'
+        for name, image, (data, mime_type) in encoded:
+            extension = 'bin' if isinstance(image, EncodedArray) else mime_type.split('/')[-1]
+            yield (f'--{boundary}\r\n'
+                   f'Content-Disposition: form-data; name="{name}"; filename="{name}.{extension}"\r\n'
+                   f'Content-Type: {mime_type}\r\n'
+                   f'Content-Length: {len(data)}\r\n\r\n').encode('utf-8')
+            yield data
+            yield b'\r\n'
+        yield f'--{boundary}--\r\n'.encode('utf-8')
+
+    response = Response(generate(), status=status, mimetype=f'{MULTIPART_TYPE}; boundary={boundary}')
+    return add_server_timing(_server_timing(response, timings), 'serialize', serialize_seconds)
+
+
+def image_response(payload, status=200, image_format=None):
+    """Send a payload containing EncodedImage values in the negotiated format.
+
+    - JSON (default): images become base64 data URLs, as before.
+    - `Accept: image/webp` (or png/jpeg): the single image is the response
+      body and the remaining payload goes in the `X-Image-Metadata` header.
+    - `Accept: multipart/form-data`: a streamed envelope whose `metadata`
+      part is JSON with `{"$part": name}` references to the image parts.
+
+    Images are encoded with the server's IMAGE_OUTPUT settings unless the
+    request overrides them (see `requested_output_options`); an explicit
+    image type in Accept always wins for the format. Encode time is
+    reported per format in a `Server-Timing` header.
+    """
+    mode = negotiate_response_mode()
+    options = response_output_options(image_format)
+    if mode == 'json':
+        return _json_response(payload, options, status)
+
+    metadata, parts = _collect_images(payload)
+    if mode == 'multipart':
+        return _multipart_response(metadata, parts, options, status)
+
+    # A raw body can only carry one image and a header-sized metadata block
+    if (len(parts) == 1 and isinstance(parts[0][1], EncodedImage)
+            and len(current_app.json.dumps(metadata, ensure_ascii=True)) <= MAX_METADATA_HEADER):
+        return _raw_image_response(metadata, parts[0][1], options, status)
+
+    if request.accept_mimetypes[MULTIPART_TYPE]:
+        return _multipart_response(metadata, parts, options, status)
+    return _json_response(payload, options, status)
@@ -0,0 +1,149 @@
+import json
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from enum import Enum
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # 256MB per worker
+
+
+def _normalize(value):
+    if isinstance(value, Enum):
+        return value.name
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def operation_key(parent_key, *operation):
+    """Derive the key of the state reached by applying one operation.
+
+    Keys form a chain: the root is the content hash of the uploaded bytes
+    and every step hashes the previous key with the normalized operation,
+    so two sessions that applied the same operations to the same upload
+    reach the same key regardless of their image ids.
+    """
+    payload = json.dumps(operation, sort_keys=True, default=_normalize)
+    return hashlib.blake2b(f'{parent_key}|{payload}'.encode('utf-8'), digest_size=20).hexdigest()
+
+
+def options_key(options):
+    """Hashable form of the encode options returned by resolve_encode_options"""
+    return (options['format'], options['quality'], options['compression'])
+
+
+class ResultCache:
+    """Thread-safe, size-bounded LRU cache of operation results.
+
+    Each entry is keyed by an `operation_key` and may hold the result
+    image, the history entry the processor recorded for it, and the
+    encoded bytes of that image per output format. Entries are sized by
+    their image buffer plus encoded bytes, and the least recently used
+    ones are evicted once the total exceeds `max_bytes`.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._current_bytes = 0
+        self._evictions = 0
+        self._hits = 0
+        self._misses = 0
+        self._encode_hits = 0
+        self._encode_misses = 0
+
+    def configure(self, max_bytes=None):
+        with self._lock:
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            self._enforce_budget()
+
+    def get_result(self, key):
+        """Return (image, history_entry) for a key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry['image'] is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._entries.move_to_end(key)
+            return entry['image'], entry['history_entry']
+
+    def put_result(self, key, image, history_entry=None):
+        """Remember the image (and history entry) an operation produced"""
+        with self._lock:
+            entry = self._entry(key)
+            if entry['image'] is None:
+                entry['image'] = image
+                entry['history_entry'] = history_entry
+                self._resize(entry, image.nbytes)
+
+    def get_encoded(self, key, options):
+        """Return cached (bytes, mime_type) of a result, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            encoded = entry['encoded'].get(options_key(options)) if entry is not None else None
+            if encoded is None:
+                self._encode_misses += 1
+                return None
+            self._encode_hits += 1
+            self._entries.move_to_end(key)
+            return encoded
+
+    def put_encoded(self, key, options, data, mime_type):
+        with self._lock:
+            entry = self._entry(key)
+            encoded_key = options_key(options)
+            if encoded_key not in entry['encoded']:
+                entry['encoded'][encoded_key] = (data, mime_type)
+                self._resize(entry, len(data))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'current_bytes': self._current_bytes,
+                'max_bytes': self.max_bytes,
+                'evictions': self._evictions,
+                'hits': self._hits,
+                'misses': self._misses,
+                'encode_hits': self._encode_hits,
+                'encode_misses': self._encode_misses
+            }
+
+    def _entry(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = {'image': None, 'history_entry': None, 'encoded': {}, 'size': 0}
+            self._entries[key] = entry
+        self._entries.move_to_end(key)
+        return entry
+
+    def _resize(self, entry, added_bytes):
+        entry['size'] += added_bytes
+        self._current_bytes += added_bytes
+        self._enforce_budget()
+
+    def _enforce_budget(self):
+        # The newest entry may go too, if it alone exceeds the budget
+        while self._entries and self._current_bytes > self.max_bytes:
+            key, entry = self._entries.popitem(last=False)
+            self._current_bytes -= entry['size']
+            self._evictions += 1
+            logger.debug(f"Result {key} evicted ({entry['size']} bytes)")
+
+
+result_cache = ResultCache()
@@ -0,0 +1,151 @@
+import re
+import json
+import time
+import logging
+from enum import Enum
+
+import cv2
+import numpy as np
+from flask.json.provider import DefaultJSONProvider
+
+from cv_modules.feature_extraction import FeatureResult
+
+try:
+    import orjson
+except ImportError:  # optional, the standard library encoder is used instead
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+if orjson is not None:
+    # Dataclasses (FeatureResult) go through json_default so their images are left out
+    ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATACLASS
+    ORJSON_SORTED_OPTIONS = ORJSON_OPTIONS | orjson.OPT_SORT_KEYS
+
+
+_NON_ASCII = re.compile(r'[^\x00-\x7f]')
+
+
+def _escape_non_ascii(match):
+    # JSON \u escapes are UTF-16 code units, so characters outside the BMP become surrogate pairs
+    encoded = match.group().encode('utf-16-be')
+    return ''.join(f'\\u{encoded[i]:02x}{encoded[i + 1]:02x}' for i in range(0, len(encoded), 2))
+
+
+def keypoint_to_dict(keypoint):
+    return {
+        'x': keypoint.pt[0],
+        'y': keypoint.pt[1],
+        'size': keypoint.size,
+        'angle': keypoint.angle,
+        'response': keypoint.response,
+        'octave': keypoint.octave
+    }
+
+
+def _is_plain(value):
+    if value is None or isinstance(value, (str, int, float, bool, Enum, np.generic)):
+        return True
+    if isinstance(value, (list, tuple)):
+        return all(_is_plain(item) for item in value)
+    return False
+
+
+def feature_metadata(metadata):
+    """Feature metadata without the locals() captures of the extractors.
+
+    The extractors record `locals()` as their parameters, which drags in
+    the grayscale image, the descriptors again and detector objects; only
+    plain values are kept from nested dicts.
+    """
+    clean = {}
+    for key, value in (metadata or {}).items():
+        if isinstance(value, dict):
+            clean[key] = {name: item for name, item in value.items() if _is_plain(item)}
+        elif _is_plain(value) or isinstance(value, np.ndarray):
+            clean[key] = value
+    return clean
+
+
+def feature_result_fields(result):
+    """JSON fields of a FeatureResult, except its image"""
+    return {
+        'keypoints': result.keypoints,
+        'descriptors': result.descriptors.ravel() if result.descriptors is not None else None,
+        'features': result.features,
+        'metadata': feature_metadata(result.metadata)
+    }
+
+
+def json_default(value):
+    """Serialize the numpy, OpenCV and result types used across the API"""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, cv2.KeyPoint):
+        return keypoint_to_dict(value)
+    if isinstance(value, FeatureResult):
+        return feature_result_fields(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(obj, sort_keys=False, indent=False, ensure_ascii=False):
+    """Serialize to a JSON string with the fastest available encoder.
+
+    orjson always emits UTF-8; pass `ensure_ascii=True` where the text must
+    be ASCII, e.g. in an HTTP header, to escape everything else as `\\uXXXX`.
+    """
+    if orjson is not None:
+        options = ORJSON_SORTED_OPTIONS if sort_keys else ORJSON_OPTIONS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        text = orjson.dumps(obj, default=json_default, option=options).decode('utf-8')
+        if ensure_ascii and not text.isascii():
+            text = _NON_ASCII.sub(_escape_non_ascii, text)
+        return text
+    return json.dumps(obj, default=json_default, sort_keys=sort_keys, indent=2 if indent else None,
+                      ensure_ascii=ensure_ascii)
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def add_server_timing(response, metric, seconds):
+    """Append a metric to the response's Server-Timing header"""
+    entry = f'{metric};dur={seconds * 1000:.1f}'
+    existing = response.headers.get('Server-Timing')
+    response.headers['Server-Timing'] = f'{existing}, {entry}' if existing else entry
+    return response
+
+
+class NumpyJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by `dumps`, so views can return results as-is.
+
+    Every JSON response gets a `serialize` entry in its Server-Timing header.
+    """
+
+    def dumps(self, obj, **kwargs):
+        # Flask only passes layout options; anything else goes to the standard encoder
+        if orjson is not None and set(kwargs) <= {'separators', 'indent', 'ensure_ascii'}:
+            return dumps(obj, sort_keys=self.sort_keys, indent=bool(kwargs.get('indent')),
+                         ensure_ascii=bool(kwargs.get('ensure_ascii')))
+        kwargs.setdefault('default', json_default)
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        start = time.perf_counter()
+        response = super().response(*args, **kwargs)
+        return add_server_timing(response, 'serialize', time.perf_counter() - start)
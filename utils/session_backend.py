@@ -0,0 +1,248 @@
+import os
+import json
+import time
+import fcntl
+import shutil
+import tempfile
+import logging
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+from utils.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+
+def default_shared_dir():
+    """Pick a RAM-backed directory for shared sessions when available"""
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, 'cv_sessions')
+
+
+class MemoryBackend:
+    """Backend that keeps nothing outside the worker process.
+
+    Sessions only live in the worker's own SessionStore, which is the
+    original single-worker behaviour.
+    """
+
+    shared = False
+
+    def save_original(self, session_id, image, meta):
+        pass
+
+    def share_original(self, source_id, session_id, image, meta):
+        pass
+
+    def load_original(self, session_id):
+        return None
+
+    def save_plane(self, session_id, name, image):
+        pass
+
+    def load_plane(self, session_id, name):
+        return None
+
+    def delete_plane(self, session_id, name):
+        pass
+
+    def load_meta(self, session_id):
+        return None
+
+    def lock(self, session_id):
+        return nullcontext()
+
+    def save_meta(self, session_id, meta):
+        pass
+
+    def delete(self, session_id):
+        pass
+
+    def link_content(self, content_key, session_id):
+        pass
+
+    def find_content(self, content_key):
+        return None
+
+    def purge_expired(self, ttl_seconds):
+        return 0
+
+
+class SharedMemmapBackend:
+    """Backend that shares decoded images between worker processes.
+
+    Every session is a directory holding `.npy` planes and a small
+    `meta.json` index entry. Planes are opened with `np.load(mmap_mode='r')`,
+    so any worker maps the same physical pages (RAM-backed under /dev/shm)
+    without decoding or copying the image. Writes go to a temporary file
+    followed by `os.replace`, so readers never observe a partial file.
+    """
+
+    shared = True
+
+    def __init__(self, directory=None):
+        self.directory = directory or default_shared_dir()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _session_dir(self, session_id):
+        # Session ids are generated server-side, but never trust them as paths
+        safe_id = os.path.basename(str(session_id))
+        if not safe_id or safe_id in ('.', '..'):
+            raise ValueError(f"Invalid session id: {session_id}")
+        return os.path.join(self.directory, safe_id)
+
+    def _replace_file(self, path, write):
+        directory = os.path.dirname(path)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def save_original(self, session_id, image, meta):
+        """Write the decoded original and create the index entry"""
+        os.makedirs(self._session_dir(session_id), exist_ok=True)
+        self.save_plane(session_id, 'original', image)
+        self.save_meta(session_id, meta)
+
+    def share_original(self, source_id, session_id, image, meta):
+        """Create a session on another session's original without copying it.
+
+        The original is hard-linked, so both sessions map the same pages but
+        either can be deleted or purged on its own. If the link fails (e.g.
+        the source was purged meanwhile) the already mapped image is saved.
+        """
+        os.makedirs(self._session_dir(session_id), exist_ok=True)
+        source = os.path.join(self._session_dir(source_id), 'original.npy')
+        target = os.path.join(self._session_dir(session_id), 'original.npy')
+        try:
+            os.link(source, target)
+        except OSError:
+            self.save_plane(session_id, 'original', image)
+        self.save_meta(session_id, meta)
+
+    def load_original(self, session_id):
+        return self.load_plane(session_id, 'original')
+
+    def save_plane(self, session_id, name, image):
+        """Publish a named image plane for other workers"""
+        path = os.path.join(self._session_dir(session_id), f'{name}.npy')
+        self._replace_file(path, lambda f: np.save(f, np.ascontiguousarray(image), allow_pickle=False))
+
+    def load_plane(self, session_id, name):
+        """Map a named plane read-only, or return None if it does not exist"""
+        path = os.path.join(self._session_dir(session_id), f'{name}.npy')
+        try:
+            return np.load(path, mmap_mode='r', allow_pickle=False)
+        except FileNotFoundError:
+            return None
+
+    def delete_plane(self, session_id, name):
+        """Drop a plane, e.g. after its processor was reset to the original"""
+        path = os.path.join(self._session_dir(session_id), f'{name}.npy')
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def load_meta(self, session_id):
+        path = os.path.join(self._session_dir(session_id), 'meta.json')
+        try:
+            with open(path, 'r') as f:
+                meta = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        # The index file's mtime doubles as the last access time for purging
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return meta
+
+    def save_meta(self, session_id, meta):
+        os.makedirs(self._session_dir(session_id), exist_ok=True)
+        path = os.path.join(self._session_dir(session_id), 'meta.json')
+        payload = dumps(meta).encode('utf-8')
+        self._replace_file(path, lambda f: f.write(payload))
+
+    @contextmanager
+    def lock(self, session_id):
+        """Hold an exclusive lock on one session across workers.
+
+        Wrap every read-modify-write of a session's meta in this, so two
+        workers cannot both read version N and write N + 1. A deleted
+        session has nothing to protect and is not recreated.
+        """
+        path = os.path.join(self._session_dir(session_id), 'meta.lock')
+        try:
+            f = open(path, 'a')
+        except FileNotFoundError:
+            yield
+            return
+        with f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def delete(self, session_id):
+        shutil.rmtree(self._session_dir(session_id), ignore_errors=True)
+
+    def _content_path(self, content_key):
+        return os.path.join(self.directory, 'content', os.path.basename(str(content_key)))
+
+    def link_content(self, content_key, session_id):
+        """Index a session by the hash of the bytes it was decoded from"""
+        path = self._content_path(content_key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        payload = str(session_id).encode('utf-8')
+        self._replace_file(path, lambda f: f.write(payload))
+
+    def find_content(self, content_key):
+        """Return the session decoded from these bytes, dropping stale links"""
+        path = self._content_path(content_key)
+        try:
+            with open(path, 'r') as f:
+                session_id = f.read().strip()
+        except FileNotFoundError:
+            return None
+        if self.load_meta(session_id) is None:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            return None
+        return session_id
+
+    def purge_expired(self, ttl_seconds):
+        """Delete sessions whose index entry has not been read for ttl_seconds"""
+        if not ttl_seconds:
+            return 0
+        deadline = time.time() - ttl_seconds
+        purged = 0
+        for session_id in os.listdir(self.directory):
+            meta_path = os.path.join(self.directory, session_id, 'meta.json')
+            try:
+                if os.path.getmtime(meta_path) < deadline:
+                    self.delete(session_id)
+                    purged += 1
+            except OSError:
+                continue
+        if purged:
+            logger.info(f"Purged {purged} expired shared sessions")
+        return purged
+
+
+def create_backend(name, directory=None):
+    """Create a session backend from its configured name"""
+    if name in (None, '', 'memory'):
+        return MemoryBackend()
+    if name == 'shared':
+        return SharedMemmapBackend(directory)
+    raise ValueError(f"Unknown session backend: {name}")
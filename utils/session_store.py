@@ -0,0 +1,228 @@
+import time
+import threading
+import logging
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1GB per worker
+DEFAULT_TTL_SECONDS = 60 * 60
+
+
+def _array_owner(array):
+    """Return the ndarray that actually owns the memory of a view"""
+    while isinstance(array.base, np.ndarray):
+        array = array.base
+    return array
+
+
+def estimate_nbytes(obj, _seen=None, _depth=0):
+    """Estimate the pixel memory held by an object graph.
+
+    Walks dicts, sequences and plain objects and sums the size of every
+    distinct ndarray buffer, so views sharing one buffer are counted once.
+    """
+    if _seen is None:
+        _seen = set()
+    if _depth > 6 or obj is None or isinstance(obj, (str, bytes, int, float, bool)):
+        return 0
+
+    if isinstance(obj, np.ndarray):
+        owner = _array_owner(obj)
+        if id(owner) in _seen:
+            return 0
+        _seen.add(id(owner))
+        # Memory-mapped planes live in the shared backend, not in this worker
+        if isinstance(owner, np.memmap):
+            return 0
+        return owner.nbytes
+
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    if isinstance(obj, dict):
+        children = obj.values()
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        children = obj
+    elif hasattr(obj, '__dict__'):
+        children = vars(obj).values()
+    else:
+        return 0
+
+    return sum(estimate_nbytes(child, _seen, _depth + 1) for child in children)
+
+
+class SessionStore:
+    """Thread-safe LRU store with a byte budget and an idle TTL.
+
+    Every entry is sized with `estimate_nbytes` when it is stored and again
+    whenever `touch(key, resize=True)` is called after the value was mutated.
+    The least recently used entries are evicted once the total size exceeds
+    `max_bytes`, and entries idle for longer than `ttl_seconds` expire.
+
+    Entries can also be registered under a content key (e.g. a hash of the
+    uploaded bytes) so identical uploads can find the buffer already decoded.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._content_index = {}
+        self._lock = threading.RLock()
+        self._current_bytes = 0
+        self._lru_evictions = 0
+        self._ttl_evictions = 0
+        self._hits = 0
+        self._misses = 0
+
+    def configure(self, max_bytes=None, ttl_seconds=None):
+        """Update the budget and TTL, evicting immediately if needed"""
+        with self._lock:
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            if ttl_seconds is not None:
+                self.ttl_seconds = ttl_seconds
+            self._expire()
+            self._enforce_budget()
+
+    def put(self, key, value, content_key=None):
+        """Store a value and evict older entries to stay within budget"""
+        size = estimate_nbytes(value)
+        with self._lock:
+            if key in self._entries:
+                old_entry = self._remove(key)
+                content_key = content_key or old_entry['content_key']
+            self._entries[key] = {
+                'value': value,
+                'size': size,
+                'last_access': time.monotonic(),
+                'content_key': content_key
+            }
+            self._current_bytes += size
+            if content_key is not None:
+                self._content_index[content_key] = key
+            self._expire()
+            self._enforce_budget(protect=key)
+        return value
+
+    def get(self, key, default=None):
+        """Return a value and mark it as most recently used"""
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return default
+            self._hits += 1
+            entry['last_access'] = time.monotonic()
+            self._entries.move_to_end(key)
+            return entry['value']
+
+    def touch(self, key, resize=False):
+        """Refresh an entry's access time and optionally re-measure its size"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            entry['last_access'] = time.monotonic()
+            self._entries.move_to_end(key)
+            if resize:
+                size = estimate_nbytes(entry['value'])
+                self._current_bytes += size - entry['size']
+                entry['size'] = size
+                self._enforce_budget(protect=key)
+            return True
+
+    def find_content(self, content_key):
+        """Return the key stored under a content key, if it is still alive"""
+        with self._lock:
+            self._expire()
+            key = self._content_index.get(content_key)
+            if key is None:
+                return None
+            self._entries[key]['last_access'] = time.monotonic()
+            self._entries.move_to_end(key)
+            return key
+
+    def pop(self, key, default=None):
+        """Remove an entry and return its value"""
+        with self._lock:
+            if key not in self._entries:
+                return default
+            return self._remove(key)['value']
+
+    def __contains__(self, key):
+        with self._lock:
+            self._expire()
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries.keys())
+
+    @property
+    def current_bytes(self):
+        return self._current_bytes
+
+    def stats(self, largest=5):
+        """Return current size, budget and eviction counters.
+
+        Only aggregates are reported; keys are session ids that grant access
+        to a client's image, so they never leave the store.
+        """
+        with self._lock:
+            self._expire()
+            sizes = sorted((entry['size'] for entry in self._entries.values()), reverse=True)
+            return {
+                'entries': len(self._entries),
+                'current_bytes': self._current_bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds,
+                'lru_evictions': self._lru_evictions,
+                'ttl_evictions': self._ttl_evictions,
+                'hits': self._hits,
+                'misses': self._misses,
+                'largest_sizes': sizes[:largest]
+            }
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._current_bytes -= entry['size']
+        if entry['content_key'] is not None and self._content_index.get(entry['content_key']) == key:
+            del self._content_index[entry['content_key']]
+        return entry
+
+    def _expire(self):
+        if not self.ttl_seconds:
+            return
+        deadline = time.monotonic() - self.ttl_seconds
+        # Entries are kept in access order, so the idle ones are at the front
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry['last_access'] >= deadline:
+                break
+            self._remove(key)
+            self._ttl_evictions += 1
+            logger.info(f"Session {key} expired after {self.ttl_seconds}s idle")
+
+    def _enforce_budget(self, protect=None):
+        if not self.max_bytes:
+            return
+        for key in list(self._entries.keys()):
+            if self._current_bytes <= self.max_bytes:
+                break
+            if key == protect:
+                continue
+            entry = self._remove(key)
+            self._lru_evictions += 1
+            logger.info(f"Session {key} evicted ({entry['size']} bytes) to stay within {self.max_bytes} bytes")
+        if self._current_bytes > self.max_bytes:
+            logger.warning(f"Session {protect} alone exceeds the session budget of {self.max_bytes} bytes")